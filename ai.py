@@ -0,0 +1,412 @@
+# ai.py
+"""
+Máy chơi caro phía server.
+
+Engine tìm nước đi bằng alpha-beta (negamax) lặp sâu dần: chỉ xét các ô trống
+gần quân đã đánh, chấm điểm thế cờ bằng bảng mẫu của patterns.py, có bảng
+chuyển vị (transposition table) khóa theo băm Zobrist với số mục giới hạn. Thắng/thua/hòa dùng đúng luật của BitBoard
+(đủ quân liên tiếp và không bị chặn 2 đầu).
+
+BotClient chơi như một client bình thường qua một đầu socketpair, nên server
+(luồng hay asyncio) ghép nó vào trận giống hệt người chơi thật.
+"""
+import random
+import selectors
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+from framing import RECV_SIZE, LineReader
+from game_logic import DEFAULT_SIZE, EMPTY, WIN_LENGTH, Board, BitBoard, apply_move
+from patterns import PatternEvaluator
+
+Level = namedtuple("Level", "depth time_limit width")
+
+# depth: độ sâu tối đa, time_limit: giây cho mỗi nước, width: số nước xét ở mỗi nút
+LEVELS = {
+    "easy": Level(depth=2, time_limit=0.3, width=6),
+    "normal": Level(depth=4, time_limit=1.0, width=10),
+    "hard": Level(depth=6, time_limit=3.0, width=14),
+}
+DEFAULT_LEVEL = "normal"
+
+WIN_SCORE = 10 ** 9
+TT_CAPACITY = 200_000
+NEIGHBOR_RADIUS = 2
+POOL_SLACK = 1.0  # chờ process pool quá time_limit chừng này giây thì máy tự tìm nước
+GAME_OVER = ("OPPONENT_LEFT", "WIN", "LOSE", "DRAW")  # dòng kết thúc ván của máy
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+# --- Băm Zobrist ---
+
+_ZOBRIST = {}
+
+def zobrist_table(size):
+    """Số ngẫu nhiên 64 bit cho mỗi (ký hiệu, ô); seed cố định nên mọi tiến trình giống nhau."""
+    table = _ZOBRIST.get(size)
+    if table is None:
+        rng = random.Random(0x5EED + size)
+        table = _ZOBRIST[size] = {sym: [rng.getrandbits(64) for _ in range(size * size)]
+                                  for sym in ('X', 'O')}
+    return table
+
+# Trộn vào khóa để cùng thế cờ nhưng khác bên đi là hai mục khác nhau
+SIDE_KEY = {'X': 0, 'O': random.Random(0x51DE).getrandbits(64)}
+
+
+class TranspositionTable:
+    """
+    Bảng chuyển vị có giới hạn: đầy thì bỏ mục được thêm vào sớm nhất;
+    mục cùng khóa chỉ bị thay bởi kết quả tìm sâu hơn hoặc bằng.
+    """
+    __slots__ = ("capacity", "entries")
+
+    def __init__(self, capacity=TT_CAPACITY):
+        self.capacity = capacity
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, depth, score, flag, move):
+        entries = self.entries
+        old = entries.get(key)
+        if old is not None:
+            if old[0] > depth:
+                return
+        elif len(entries) >= self.capacity:
+            del entries[next(iter(entries))]
+        entries[key] = (depth, score, flag, move)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# --- Ô lân cận ---
+
+_NEIGHBORS = {}
+
+def _neighbors(size):
+    """Với mỗi ô: các ô trong bán kính NEIGHBOR_RADIUS quanh nó."""
+    neighbors = _NEIGHBORS.get(size)
+    if neighbors is None:
+        r = NEIGHBOR_RADIUS
+        neighbors = _NEIGHBORS[size] = [
+            tuple(nx * size + ny
+                  for nx in range(max(0, x - r), min(size, x + r + 1))
+                  for ny in range(max(0, y - r), min(size, y + r + 1))
+                  if (nx, ny) != (x, y))
+            for x in range(size) for y in range(size)
+        ]
+    return neighbors
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Engine:
+    """Thế cờ của máy cộng với PatternEvaluator (điểm góc nhìn X, cập nhật dần)."""
+
+    def __init__(self, size=DEFAULT_SIZE, win_length=WIN_LENGTH, tt=None, book=None):
+        self.size = size
+        self.win_length = win_length
+        self.board = Board(size)
+        self.bits = BitBoard(size, win_length)
+        self.zobrist = zobrist_table(size)
+        self.neighbors = _neighbors(size)
+        self.eval = PatternEvaluator(size, win_length)
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.book = book  # opening_book.OpeningBook hoặc None
+        self.hash = 0
+        self.stones = []
+        self.nodes = 0
+        self.deadline = None
+        self.root_move = None
+
+    def reset(self):
+        self.board.reset()
+        self.bits.reset()
+        self.eval.reset()
+        self.hash = 0
+        self.stones.clear()
+
+    # --- Cập nhật thế cờ ---
+
+    def place(self, x, y, sym):
+        c = x * self.size + y
+        ok, _ = apply_move(self.board, x, y, sym)
+        if not ok:
+            return False
+        self.bits.apply_move(x, y, sym)
+        self.eval.place(x, y, sym)
+        self.hash ^= self.zobrist[sym][c]
+        self.stones.append(c)
+        return True
+
+    def undo(self, x, y, sym):
+        c = x * self.size + y
+        self.board.cells[c] = EMPTY
+        self.bits.remove(x, y)
+        self.eval.remove(x, y)
+        self.hash ^= self.zobrist[sym][c]
+        self.stones.remove(c)
+
+    # --- Sinh và sắp xếp nước đi ---
+
+    def candidates(self):
+        """Các ô trống trong bán kính NEIGHBOR_RADIUS quanh quân đã đánh."""
+        if not self.stones:
+            return [(self.size // 2) * self.size + self.size // 2]
+        cells = self.board.cells
+        seen = set()
+        for s in self.stones:
+            for c in self.neighbors[s]:
+                if cells[c] == EMPTY:
+                    seen.add(c)
+        return list(seen)
+
+    def _gain(self, c):
+        """Giá trị của ô c cho cả hai bên: điểm khi mình đánh vào + khi đối thủ đánh vào."""
+        x, y = divmod(c, self.size)
+        return self.eval.threat(x, y)
+
+    def ordered_moves(self, width, first=None):
+        moves = sorted(self.candidates(), key=self._gain, reverse=True)[:width]
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        elif first is not None and self.board.cells[first] == EMPTY:
+            moves.insert(0, first)
+        return moves
+
+    # --- Tìm kiếm ---
+
+    def negamax(self, depth, alpha, beta, sym, ply, width):
+        self.nodes += 1
+        if self.nodes & 63 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        key = self.hash ^ SIDE_KEY[sym]
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.get(key)
+        if entry is not None:
+            e_depth, e_score, e_flag, tt_move = entry
+            if e_depth >= depth and ply > 0:
+                if e_flag == EXACT:
+                    return e_score
+                if e_flag == LOWER:
+                    alpha = max(alpha, e_score)
+                else:
+                    beta = min(beta, e_score)
+                if alpha >= beta:
+                    return e_score
+
+        if depth == 0:
+            score = self.eval.score
+            return score if sym == 'X' else -score
+
+        opp = 'O' if sym == 'X' else 'X'
+        size = self.size
+        best, best_move = -WIN_SCORE * 2, None
+        for c in self.ordered_moves(width, tt_move):
+            x, y = divmod(c, size)
+            self.place(x, y, sym)
+            try:
+                if self.bits.check_win(x, y):
+                    score = WIN_SCORE - ply
+                elif self.bits.is_full():
+                    score = 0
+                else:
+                    score = -self.negamax(depth - 1, -beta, -alpha, opp, ply + 1, width)
+            finally:
+                self.undo(x, y, sym)
+            if score > best:
+                best, best_move = score, c
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_move is None:
+            return 0  # không còn nước: hòa
+
+        flag = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+        self.tt.store(key, depth, best, flag, best_move)
+        if ply == 0:
+            self.root_move = best_move
+        return best
+
+    def best_move(self, sym, level=LEVELS[DEFAULT_LEVEL]):
+        """Nước đi tốt nhất tìm được trong giới hạn độ sâu và thời gian của level."""
+        if self.book is not None:
+            move = self.book.lookup(self.board, sym, self.win_length)
+            if move is not None:
+                return move
+
+        start = time.perf_counter()
+        self.deadline = start + level.time_limit
+        self.nodes = 0
+
+        moves = self.ordered_moves(level.width)
+        best = moves[0]
+        for depth in range(1, level.depth + 1):
+            try:
+                score = self.negamax(depth, -WIN_SCORE * 2, WIN_SCORE * 2, sym, 0, level.width)
+            except SearchTimeout:
+                break
+            best = self.root_move
+            if abs(score) >= WIN_SCORE - 100:
+                break  # đã thấy thắng/thua bắt buộc, tìm sâu hơn không đổi kết quả
+        return divmod(best, self.size)
+
+
+# --- Máy chơi như một client ---
+
+class BotClient:
+    """
+    Đọc lệnh server như client_gui/client và trả lời bằng nước đi của Engine.
+    Có `service` (analysis.AnalysisService) thì việc tìm nước chạy ở process
+    pool, luồng của bot chỉ chờ kết quả nên không giữ GIL của server. Trong
+    lúc chờ, bot vẫn nghe server: ván kết thúc (đối thủ rời đi, hết giờ, mất
+    kết nối) thì job bị hủy; pool chậm quá hạn thì bot tự tìm nước.
+    """
+
+    def __init__(self, sock, level=LEVELS[DEFAULT_LEVEL], service=None, book=None):
+        self.sock = sock
+        self.level = level
+        self.service = service
+        self.book = book
+        self.engine = None
+        self.symbol = None
+        self.reader = LineReader()
+        self.over = False  # ván kết thúc trong lúc chờ pool: dòng kết thúc nằm trong reader
+        self.wake, self.waker = socket.socketpair()  # job xong đánh thức luồng của bot
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.sock, selectors.EVENT_READ)
+        self.sel.register(self.wake, selectors.EVENT_READ)
+
+    def think(self):
+        """Nước đi của máy, hoặc None nếu ván đã kết thúc trong lúc tìm."""
+        start = time.perf_counter()
+        move = self.search()
+        if move is not None:
+            metrics.bot_search.observe(time.perf_counter() - start)
+        return move
+
+    def search(self):
+        engine = self.engine
+        if self.service is not None:
+            limit = self.level.time_limit + POOL_SLACK
+            future = self.service.submit(engine.board, self.symbol, engine.win_length, self.level,
+                                         deadline=time.time() + limit)
+            move = self.wait(future, limit)
+            if self.over:
+                return None
+            if move is not None:
+                return move
+        return engine.best_move(self.symbol, self.level)
+
+    def wake_up(self, future):
+        try:
+            self.waker.send(b"\0")
+        except OSError:
+            pass  # bot đã kết thúc trước khi job xong
+
+    def wait(self, future, timeout):
+        """
+        Chờ kết quả của job tối đa timeout giây mà vẫn đọc các dòng server gửi
+        vào self.reader. Quá hạn, hoặc gặp dòng kết thúc ván hay mất kết nối
+        (self.over), thì hủy job và trả về None; job đang chạy dở tự dừng ở
+        hạn chót của nó.
+        """
+        end = time.monotonic() + timeout
+        future.add_done_callback(self.wake_up)
+        while not future.done():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in self.sel.select(remaining):
+                if key.fileobj is self.wake:
+                    self.wake.recv(RECV_SIZE)
+                    continue
+                data = self.sock.recv(RECV_SIZE)
+                if not data:
+                    self.over = True  # readline() của vòng lặp chính cũng sẽ thấy EOF
+                    break
+                self.reader.feed(data)
+                self.over = any(line.split(" ", 1)[0] in GAME_OVER for line in self.reader.lines)
+            if self.over:
+                break
+        if not future.done():
+            future.cancel()
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None  # pool hỏng hoặc đã tắt: tự tìm
+
+    def send(self, msg):
+        self.sock.sendall((msg + "\n").encode())
+
+    def run(self):
+        reader = self.reader
+        try:
+            while True:
+                self.over = False
+                line = reader.readline(self.sock)
+                if line is None:
+                    break
+                parts = line.split()
+                if not parts:
+                    continue
+                cmd = parts[0]
+
+                if cmd == "START":
+                    self.symbol = parts[1]
+                    size = int(parts[2]) if len(parts) >= 4 else DEFAULT_SIZE
+                    win_length = int(parts[3]) if len(parts) >= 4 else WIN_LENGTH
+                    if self.engine is None or (self.engine.size, self.engine.win_length) != (size, win_length):
+                        self.engine = Engine(size, win_length, book=self.book)
+                elif cmd == "RESET":
+                    self.engine.reset()
+                elif cmd == "OPPONENT":
+                    opp = 'O' if self.symbol == 'X' else 'X'
+                    self.engine.place(int(parts[1]), int(parts[2]), opp)
+                elif cmd == "YOUR":
+                    move = self.think()
+                    if move is None:
+                        continue  # ván đã kết thúc: xử lý các dòng vừa đọc được
+                    x, y = move
+                    self.engine.place(x, y, self.symbol)
+                    self.send(f"MOVE {x} {y}")
+                elif cmd == "INVALID":
+                    # Bàn của máy lệch với server: không nên xảy ra, rời trận cho an toàn
+                    self.send("EXIT")
+                    break
+                elif cmd in ("WIN", "LOSE", "DRAW"):
+                    self.send("REMATCH")
+                elif cmd == "OPPONENT_LEFT":
+                    break
+        except OSError:
+            pass
+        finally:
+            self.sel.close()
+            self.wake.close()
+            self.waker.close()
+            self.sock.close()
+
+
+def start_bot(level=DEFAULT_LEVEL, service=None, book=None):
+    """Chạy một máy chơi trong luồng riêng; trả về đầu socket phía server."""
+    server_side, bot_side = socket.socketpair()
+    bot = BotClient(bot_side, LEVELS[level], service, book)
+    threading.Thread(target=bot.run, daemon=True).start()
+    return server_side
@@ -0,0 +1,158 @@
+# analysis.py
+"""
+Dịch vụ phân tích thế cờ chạy trong một process pool (concurrent.futures).
+
+Tìm nước đi là việc nặng CPU: chạy ngay trong luồng của handle_match (hay
+trong event loop) sẽ giữ GIL và làm chậm mọi trận khác. Ở đây mỗi yêu cầu
+"nước tốt nhất cho thế cờ này" được gói thành một job nhỏ gửi sang tiến
+trình con:
+
+- thế cờ mã hóa gọn 2 bit mỗi ô (Board.pack, bàn 15x15 chỉ 57 byte),
+- mỗi job có hạn chót (deadline, theo đồng hồ thực nên dùng được giữa các
+  tiến trình); job hết hạn trước khi chạy thì trả về None,
+- Future của job hủy được (cancel) khi người chơi rời trận hoặc ván kết thúc,
+- kết quả được lưu đệm theo băm Zobrist của thế cờ, nên các thế khai cuộc
+  lặp lại được trả lời ngay, không phải tìm lại; thế cờ có trong sách khai
+  cuộc (opening_book.py) thì không cần gửi job nào.
+
+Bot (ai.BotClient) và lệnh HINT của người chơi đều dùng dịch vụ này.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import opening_book
+from ai import LEVELS, SIDE_KEY, Engine, zobrist_table
+from game_logic import EMPTY, WIN_LENGTH, Board
+
+HINT_LEVEL = "normal"
+CACHE_SIZE = 50_000
+DEADLINE_SLACK = 2.0  # thời gian chờ trong hàng đợi của pool được cộng thêm vào hạn chót
+
+
+# --- Khóa thế cờ ---
+
+def position_key(board, sym):
+    """Băm Zobrist của thế cờ (cùng bảng với ai.Engine) trộn với bên sắp đi."""
+    zobrist = zobrist_table(board.size)
+    key = SIDE_KEY[sym]
+    for i, v in enumerate(board.cells):
+        if v != EMPTY:
+            key ^= zobrist[chr(v)][i]
+    return key
+
+
+# --- Phía tiến trình con ---
+
+_ENGINES = {}  # mỗi tiến trình con giữ một Engine cho mỗi luật, bảng chuyển vị dùng lại giữa các job
+
+def analyse(job):
+    """Chạy trong tiến trình con: job = (size, win_length, bàn đã mã hóa, bên đi, level, deadline)."""
+    size, win_length, data, sym, level, deadline = job
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return None  # đã quá hạn khi tới lượt chạy
+
+    engine = _ENGINES.get((size, win_length))
+    if engine is None:
+        engine = _ENGINES[size, win_length] = Engine(size, win_length)
+    engine.reset()
+    for c, v in enumerate(Board.unpack(size, data).cells):
+        if v != EMPTY:
+            engine.place(c // size, c % size, chr(v))
+    if engine.bits.is_full():
+        return None
+    return engine.best_move(sym, level._replace(time_limit=min(level.time_limit, remaining)))
+
+
+# --- Phía server ---
+
+def result_of(future):
+    """Nước đi (x, y) của một job đã xong, hoặc None nếu job bị hủy, lỗi hay quá hạn."""
+    if future.cancelled() or future.exception() is not None:
+        return None
+    return future.result()
+
+
+class AnalysisService:
+    """Gửi job sang process pool; lưu đệm kết quả theo băm thế cờ (LRU)."""
+
+    def __init__(self, workers=None, cache_size=CACHE_SIZE, book=None):
+        self.book = book
+        self.workers = workers or os.cpu_count() or 1
+        # forkserver: không fork thẳng từ một server đang chạy nhiều luồng
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, board, sym, win_length=WIN_LENGTH, level=LEVELS[HINT_LEVEL], deadline=None):
+        """
+        Tìm nước tốt nhất cho `sym` trên `board`; trả về Future cho (x, y) hoặc None.
+        Thế cờ được mã hóa ngay nên có thể sửa `board` sau khi gọi.
+        """
+        move = self.book.lookup(board, sym, win_length) if self.book is not None else None
+        if move is not None:
+            future = Future()
+            future.set_result(move)
+            return future
+
+        key = (position_key(board, sym), board.size, win_length, level)
+        with self.lock:
+            move = self.cache.get(key)
+            if move is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(move)
+                return future
+            self.misses += 1
+
+        if deadline is None:
+            deadline = time.time() + level.time_limit + DEADLINE_SLACK
+        job = (board.size, win_length, board.pack(), sym, level, deadline)
+        future = self.pool.submit(analyse, job)
+        future.add_done_callback(lambda f: self._remember(key, f))
+        return future
+
+    def _remember(self, key, future):
+        move = result_of(future)
+        if move is None:
+            return
+        with self.lock:
+            self.cache[key] = move
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Dịch vụ dùng chung của tiến trình ---
+
+_workers = None
+_service = None
+_service_lock = threading.Lock()
+
+def configure(workers):
+    """Số tiến trình phân tích (None = số CPU, 0 = tắt: bot tự tìm trong luồng của nó, không có HINT)."""
+    global _workers
+    _workers = workers
+
+def default_service():
+    """Dịch vụ của tiến trình hiện tại, tạo khi cần lần đầu (sau khi cluster đã fork worker)."""
+    global _service
+    if _workers == 0:
+        return None
+    with _service_lock:
+        if _service is None:
+            _service = AnalysisService(_workers, book=opening_book.default_book())
+        return _service
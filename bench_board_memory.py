@@ -0,0 +1,99 @@
+# bench_board_memory.py
+"""
+Đo bộ nhớ cho nhiều bàn cờ cùng lúc: list 15 list chuỗi 1 ký tự (cách cũ),
+Board (một bytearray), BitBoard (mặt nạ bit) và cả hai cộng lại như trong
+mỗi Match, so với một bàn list cũ của mỗi trận trước đây.
+
+    python bench_board_memory.py --boards 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from game_logic import Board, BitBoard, apply_move
+
+
+def legacy_board(size=15):
+    return [['.' for _ in range(size)] for _ in range(size)]
+
+
+def fill_legacy(board, moves):
+    for x, y, sym in moves:
+        board[x][y] = sym
+
+
+def fill_board(board, moves):
+    for x, y, sym in moves:
+        apply_move(board, x, y, sym)
+
+
+def fill_bits(board, moves):
+    for x, y, sym in moves:
+        board.apply_move(x, y, sym)
+
+
+def match_boards(size=15):
+    """Hai bàn cờ mỗi Match giữ: Board (các ô) và BitBoard (kiểm tra thắng/hòa)."""
+    return Board(size), BitBoard(size)
+
+
+def fill_match(boards, moves):
+    board, bits = boards
+    for x, y, sym in moves:
+        apply_move(board, x, y, sym)
+        bits.apply_move(x, y, sym)
+
+
+def measure(make, fill, count, moves):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    boards = [make(15) for _ in range(count)]
+    for board in boards:
+        fill(board, moves)
+    dt = time.perf_counter() - t0
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del boards
+    return used, dt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boards", type=int, default=100000)
+    parser.add_argument("--moves", type=int, default=30, help="số quân trên mỗi bàn")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cells = rng.sample([(x, y) for x in range(15) for y in range(15)], args.moves)
+    moves = [(x, y, 'XO'[i % 2]) for i, (x, y) in enumerate(cells)]
+
+    print(f"{args.boards} boards, {args.moves} stones each")
+    for name, make, fill in (("list of lists", legacy_board, fill_legacy),
+                             ("Board", Board, fill_board),
+                             ("BitBoard", BitBoard, fill_bits),
+                             ("Match boards", match_boards, fill_match)):
+        used, dt = measure(make, fill, args.boards, moves)
+        print(f"{name:>14}: {used / 2**20:8.1f} MiB total "
+              f"{used / args.boards:8.0f} B/board {dt:6.2f}s")
+        if name == "list of lists":
+            legacy = used
+    print(f"per match: Board + BitBoard {used / args.boards:.0f} B "
+          f"vs list of lists {legacy / args.boards:.0f} B ({used / legacy:.0%})")
+
+    # Chơi lại: reset() tại chỗ so với cấp phát bàn mới
+    board = Board()
+    t0 = time.perf_counter()
+    for _ in range(args.boards):
+        board.reset()
+    reset = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(args.boards):
+        legacy_board()
+    fresh = time.perf_counter() - t0
+    print(f"rematch: Board.reset() {args.boards / reset:10.0f}/s, "
+          f"new list board {args.boards / fresh:10.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
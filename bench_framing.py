@@ -0,0 +1,82 @@
+# bench_framing.py
+"""
+Đo số thông điệp tách được mỗi giây: LineReader so với cách cũ
+(decode + split trên từng mảnh recv, vốn làm hỏng lệnh bị cắt ngang).
+
+    python bench_framing.py --messages 200000
+"""
+import argparse
+import random
+import time
+
+from framing import LineReader
+
+
+def make_stream(count, seed=1):
+    rng = random.Random(seed)
+    msgs = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            msgs.append(f"MOVE {rng.randrange(15)} {rng.randrange(15)}")
+        elif kind == 1:
+            msgs.append("YOUR TURN")
+        elif kind == 2:
+            msgs.append(f"OPPONENT {rng.randrange(15)} {rng.randrange(15)}")
+        else:
+            msgs.append("CHAT " + "hello " * rng.randrange(1, 6))
+    data = ("\n".join(msgs) + "\n").encode()
+    return msgs, data
+
+
+def chunks(data, seed=2, lo=1, hi=1024):
+    """Cắt luồng byte thành các mảnh ngẫu nhiên như TCP có thể trả về."""
+    rng = random.Random(seed)
+    out = []
+    i = 0
+    while i < len(data):
+        n = rng.randint(lo, hi)
+        out.append(data[i:i + n])
+        i += n
+    return out
+
+
+def naive(parts):
+    got = []
+    for data in parts:
+        for line in data.decode(errors="replace").strip().split("\n"):
+            if line.strip():
+                got.append(line)
+    return got
+
+
+def framed(parts):
+    reader = LineReader()
+    lines = reader.lines
+    got = []
+    for data in parts:
+        if reader.feed(data):
+            got.extend(lines)
+            lines.clear()
+    return got
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    msgs, data = make_stream(args.messages)
+    parts = chunks(data)
+    print(f"{len(msgs)} messages, {len(data)} bytes in {len(parts)} chunks")
+
+    for name, fn in (("naive split", naive), ("LineReader", framed)):
+        t0 = time.perf_counter()
+        got = fn(parts)
+        dt = time.perf_counter() - t0
+        ok = "ok" if got == msgs else f"CORRUPT ({sum(a != b for a, b in zip(got, msgs))} bad)"
+        print(f"{name:>12}: {len(got) / dt:12.0f} msg/s  {ok}")
+
+
+if __name__ == "__main__":
+    main()
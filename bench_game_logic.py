@@ -0,0 +1,65 @@
+# bench_game_logic.py
+"""
+So sánh BitBoard với check_win/is_full trên Board (bytearray).
+
+Kiểm thử vi sai giữa hai cách cài đặt (nhiều cỡ bàn và số quân thắng) nằm
+trong tests/test_game_logic.py.
+
+    python bench_game_logic.py --games 2000
+"""
+import argparse
+import random
+import time
+
+from game_logic import Board, BitBoard, apply_move, check_win, is_full
+
+
+def random_games(count, size=15, seed=0):
+    """Mỗi ván là dãy (x, y, symbol); thỉnh thoảng cùng một bên đánh hai lần liền."""
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    games = []
+    for _ in range(count):
+        rng.shuffle(cells)
+        n = rng.randint(1, len(cells))
+        games.append([(x, y, 'XO'[i % 2] if rng.random() < 0.8 else rng.choice('XO'))
+                      for i, (x, y) in enumerate(cells[:n])])
+    return games
+
+
+def time_list(games, size=15):
+    t0 = time.perf_counter()
+    for moves in games:
+        board = Board(size)
+        for x, y, sym in moves:
+            apply_move(board, x, y, sym)
+            check_win(board, x, y)
+            is_full(board)
+    return time.perf_counter() - t0
+
+
+def time_bits(games, size=15):
+    t0 = time.perf_counter()
+    for moves in games:
+        bits = BitBoard(size)
+        for x, y, sym in moves:
+            bits.apply_move(x, y, sym)
+            bits.check_win(x, y)
+            bits.is_full()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    args = parser.parse_args()
+
+    games = random_games(args.games)
+    total = sum(len(g) for g in games)
+    for name, fn in (("Board", time_list), ("BitBoard", time_bits)):
+        dt = fn(games)
+        print(f"{name:>10}: {total / dt:12.0f} moves/s (apply + check_win + is_full)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# bench_gui.py
+"""
+Đo chi phí vẽ của client_gui không cần màn hình (SDL dummy video driver):
+cách cũ (vẽ lại toàn bộ khung rồi flip, 60 khung/giây) so với Renderer
+(lớp nền/lưới/quân cờ vẽ sẵn, chỉ vẽ và cập nhật các vùng đổi, ngủ khi rảnh).
+
+- thời gian một khung (trung bình, p99) khi không có gì đổi, khi có nước đi,
+  khi có dòng chat;
+- CPU của vòng lặp chính (thời gian CPU / thời gian thực) trong vài giây
+  chờ đối thủ và vài giây chơi (luồng giả lập mạng đi một nước mỗi --interval
+  giây).
+
+Trước khi đo, mỗi khung của Renderer được so từng điểm ảnh với cách vẽ cũ.
+
+    python bench_gui.py --moves 120 --seconds 3
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import threading
+import time
+
+import pygame
+
+import client_gui as gui
+from bench_matchmaking import percentile
+from bench_server import scripted_moves
+from client_state import ClientState, PLACE, SAID
+
+
+def full_redraw(screen, font_game, font_chat, state):
+    """Cách vẽ trước Renderer: vẽ lại mọi thứ mỗi khung rồi flip."""
+    screen.fill(gui.COLOR_BG)
+    if state.last_move:
+        pygame.draw.rect(screen, gui.COLOR_HIGHLIGHT, gui.cell_rect(*state.last_move))
+    if state.hint:
+        pygame.draw.rect(screen, gui.COLOR_HINT, gui.cell_rect(*state.hint), 3)
+    size, cell, margin = gui.GRID_SIZE, gui.CELL_SIZE, gui.MARGIN
+    for i in range(size + 1):
+        pygame.draw.line(screen, gui.COLOR_GRID,
+            (margin + i * cell, margin), (margin + i * cell, margin + size * cell), 2)
+        pygame.draw.line(screen, gui.COLOR_GRID,
+            (margin, margin + i * cell), (margin + size * cell, margin + i * cell), 2)
+    for r in range(size):
+        for c in range(size):
+            center = (margin + c * cell + cell // 2, margin + r * cell + cell // 2)
+            if state.board[r][c] == 'X': gui.draw_X(screen, center)
+            elif state.board[r][c] == 'O': gui.draw_O(screen, center)
+
+    pygame.draw.rect(screen, gui.COLOR_INFO_BG, (0, gui.SCREEN_HEIGHT - gui.INFO_HEIGHT, gui.BOARD_WIDTH, gui.INFO_HEIGHT))
+    pygame.draw.line(screen, gui.COLOR_GRID,
+        (0, gui.SCREEN_HEIGHT - gui.INFO_HEIGHT), (gui.BOARD_WIDTH, gui.SCREEN_HEIGHT - gui.INFO_HEIGHT), 1)
+    txt = font_game.render(state.status, True, gui.COLOR_TEXT)
+    screen.blit(txt, txt.get_rect(center=(gui.BOARD_WIDTH // 2, gui.SCREEN_HEIGHT - gui.INFO_HEIGHT // 2)))
+
+    pygame.draw.rect(screen, gui.COLOR_CHAT_BG, (gui.BOARD_WIDTH, 0, gui.CHAT_WIDTH, gui.SCREEN_HEIGHT))
+    pygame.draw.line(screen, gui.COLOR_BORDER, (gui.BOARD_WIDTH, 0), (gui.BOARD_WIDTH, gui.SCREEN_HEIGHT), 2)
+    screen.blit(font_game.render("CHAT ROOM", True, gui.COLOR_X), (gui.BOARD_WIDTH + 20, 10))
+    y = 50
+    for line in state.chat.view():
+        color = gui.COLOR_X if line.startswith("Me:") else gui.COLOR_O
+        screen.blit(font_chat.render(line, True, color), (gui.BOARD_WIDTH + 10, y))
+        y += gui.CHAT_LINE_HEIGHT
+    input_rect = (gui.BOARD_WIDTH + 10, gui.SCREEN_HEIGHT - 40, gui.CHAT_WIDTH - 20, 30)
+    pygame.draw.rect(screen, gui.COLOR_INPUT_BG, input_rect)
+    pygame.draw.rect(screen, gui.COLOR_BORDER, input_rect, 1)
+    screen.blit(font_chat.render(gui.input_text, True, gui.COLOR_TEXT), (input_rect[0] + 5, input_rect[1] + 5))
+    pygame.display.flip()
+
+
+def new_game(renderer, wake=None):
+    """Trạng thái mới (đã START, là X) cho renderer; vẽ lại toàn bộ ở khung sau."""
+    state = ClientState(gui.GRID_SIZE, wake=wake)
+    state.apply(("START", "X", str(gui.GRID_SIZE), "5"))
+    renderer.state = state
+    renderer.invalidate()
+    return state
+
+
+def script(moves, chat_every):
+    """Các bước của một ván: (loại khung, sự kiện áp dụng trước khung đó)."""
+    steps = []
+    for i, (r, c) in enumerate(moves):
+        events = []
+        if i % 2 == 0:
+            if i % 5 == 0:
+                events += [("YOUR", "TURN"), ("HINT", str(r), str(c))]
+            events.append((PLACE, r, c))
+        else:
+            events.append(("OPPONENT", str(r), str(c)))
+        steps.append(("move", events))
+        if i % chat_every == 0:
+            steps.append(("chat", [(SAID, f"move {i}, nice one") if i % 2 else ("CHAT", f"move {i}, nice one")]))
+        steps.append(("idle", []))
+    return steps
+
+
+def check(screen, renderer, font_game, font_chat, steps):
+    """Mỗi khung của Renderer phải giống hệt cách vẽ cũ."""
+    state = new_game(renderer)
+    for n, (kind, events) in enumerate(steps):
+        for event in events:
+            state.apply(event)
+        renderer.draw()
+        new = pygame.image.tobytes(screen, "RGB")
+        full_redraw(screen, font_game, font_chat, state)
+        if pygame.image.tobytes(screen, "RGB") != new:
+            raise SystemExit(f"frame {n} ({kind}) differs from the full redraw")
+
+
+def frame_times(renderer, draw, steps):
+    state = new_game(renderer)
+    draw(state)
+    times = {"idle": [], "move": [], "chat": []}
+    clock = time.perf_counter
+    for kind, events in steps:
+        for event in events:
+            state.post(event)
+        t0 = clock()
+        state.apply_pending()
+        draw(state)
+        times[kind].append(clock() - t0)
+    return times
+
+
+def cpu_use(renderer, loop, seconds, interval, moves):
+    """Tỉ lệ CPU của vòng lặp trong `seconds` giây; interval: luồng giả lập mạng đi một nước mỗi chừng này giây."""
+    state = new_game(renderer, wake=gui.notify)
+    stop = threading.Event()
+
+    def network():
+        for i, (r, c) in enumerate(moves):
+            if stop.wait(interval):
+                return
+            state.post(("OPPONENT", str(r), str(c)))
+
+    if interval:
+        threading.Thread(target=network, daemon=True).start()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    frames = loop(state, wall0 + seconds)
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    stop.set()
+    return cpu / wall, frames / wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--moves", type=int, default=120)
+    parser.add_argument("--chat-every", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0, help="thời gian đo CPU mỗi trường hợp")
+    parser.add_argument("--interval", type=float, default=0.5, help="giây giữa hai nước đi khi đo CPU")
+    args = parser.parse_args()
+
+    pygame.init()
+    font_game = pygame.font.SysFont("Consolas", 22, bold=True)
+    font_chat = pygame.font.SysFont("Arial", 16)
+    screen = pygame.display.set_mode((gui.SCREEN_WIDTH, gui.SCREEN_HEIGHT))
+    renderer = gui.Renderer(screen, font_game, font_chat, ClientState(gui.GRID_SIZE))
+    moves = scripted_moves(args.moves)
+    steps = script(moves, args.chat_every)
+
+    check(screen, renderer, font_game, font_chat, steps)
+    print(f"{len(steps)} frames identical to the full redraw ({gui.GRID_SIZE}x{gui.GRID_SIZE}, "
+          f"{gui.SCREEN_WIDTH}x{gui.SCREEN_HEIGHT})")
+
+    full = lambda state: full_redraw(screen, font_game, font_chat, state)
+    for name, draw in (("full redraw", full), ("dirty rects", lambda state: renderer.draw())):
+        times = frame_times(renderer, draw, steps)
+        print(f"{name:>12}: " + "  ".join(
+            f"{kind} {sum(t) / len(t) * 1e3:6.3f} ms (p99 {percentile(t, 99) * 1e3:6.3f})"
+            for kind, t in times.items()))
+
+    def old_loop(state, deadline):
+        clock = pygame.time.Clock()
+        frames = 0
+        while time.perf_counter() < deadline:
+            pygame.event.get()
+            state.apply_pending()
+            full(state)
+            clock.tick(gui.FPS)
+            frames += 1
+        return frames
+
+    def new_loop(state, deadline):
+        clock = pygame.time.Clock()
+        frames = 0
+        idle = False
+        while time.perf_counter() < deadline:
+            events = gui.next_events(idle)
+            state.apply_pending()
+            idle = not renderer.draw() and not events
+            if not idle:
+                clock.tick(gui.FPS)
+                frames += 1
+        return frames
+
+    for case, interval in (("waiting", 0), (f"move/{args.interval:g}s", args.interval)):
+        for name, loop in (("full redraw", old_loop), ("dirty rects", new_loop)):
+            cpu, fps = cpu_use(renderer, loop, args.seconds, interval, moves)
+            print(f"{case:>12} {name}: CPU {cpu:6.1%}, {fps:5.1f} frames drawn/s")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_matchmaking.py
+"""
+Đo ghép cặp với nhiều người chờ: độ trễ ghép (thời gian mô phỏng), độ chênh
+hệ số của các cặp, và thời gian CPU của mỗi lượt ghép. So với hàng đợi cũ
+(list, pop(0), ghép theo thứ tự đến bất kể hệ số).
+
+    python bench_matchmaking.py --players 100000
+    python bench_matchmaking.py --players 100000 --burst   # cả 100k vào hàng cùng lúc
+"""
+import argparse
+import random
+import time
+
+from matchmaking import BASE_WINDOW, MAX_WINDOW, TICK, WIDEN_RATE, Queue
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def arrivals(players, seconds, burst, seed=0):
+    """Danh sách (thời điểm vào hàng, hệ số) theo thời gian mô phỏng."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(players):
+        at = 0.0 if burst else rng.uniform(0, seconds)
+        rating = min(3000.0, max(0.0, rng.gauss(1500, 300)))
+        out.append((at, rating))
+    out.sort(key=lambda a: a[0])  # cùng thời điểm (--burst): giữ thứ tự ngẫu nhiên của hệ số
+    return out
+
+
+def run_queue(players, tick):
+    queue = Queue()
+    waits, diffs, tick_times = [], [], []
+    i = 0
+    now = 0.0
+    while i < len(players) or len(queue) > 1:
+        now += tick
+        while i < len(players) and players[i][0] <= now:
+            at, rating = players[i]
+            queue.add(i, rating, now=at)
+            i += 1
+        t0 = time.perf_counter()
+        pairs = queue.pair(now)
+        tick_times.append(time.perf_counter() - t0)
+        for a, b in pairs:
+            waits.append(now - a.since)
+            waits.append(now - b.since)
+            diffs.append(abs(a.rating - b.rating))
+        oldest = queue.oldest()
+        if i == len(players) and oldest is not None and \
+                BASE_WINDOW + WIDEN_RATE * (now - oldest.since) > MAX_WINDOW:
+            break  # cửa sổ đã rộng hết cỡ: những người còn lại không ghép được với nhau
+    return waits, diffs, tick_times, len(queue)
+
+
+def run_fifo(players):
+    """Hàng đợi cũ: mỗi người đến là ghép ngay với người chờ lâu nhất (list.pop(0))."""
+    waiting = []
+    diffs = []
+    t0 = time.perf_counter()
+    for _, rating in players:
+        waiting.append(rating)
+    # Đo đúng chi phí pop(0) khi hàng dài: dồn hết vào trước rồi ghép
+    while len(waiting) >= 2:
+        a = waiting.pop(0)
+        b = waiting.pop(0)
+        diffs.append(abs(a - b))
+    return diffs, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--seconds", type=float, default=60.0, help="người chơi đến rải đều trong chừng này giây")
+    parser.add_argument("--burst", action="store_true", help="mọi người vào hàng cùng lúc")
+    parser.add_argument("--tick", type=float, default=TICK)
+    args = parser.parse_args()
+
+    players = arrivals(args.players, args.seconds, args.burst)
+    mode = "at once" if args.burst else f"over {args.seconds:g}s"
+    print(f"{args.players} players arriving {mode}, pairing every {args.tick:g}s")
+
+    waits, diffs, tick_times, left = run_queue(players, args.tick)
+    total = sum(tick_times)
+    print(f"   buckets: wait p50 {percentile(waits, 50):5.2f}s  p90 {percentile(waits, 90):5.2f}s  "
+          f"p99 {percentile(waits, 99):5.2f}s  max {max(waits):6.2f}s")
+    print(f"            rating gap p50 {percentile(diffs, 50):4.0f}  p90 {percentile(diffs, 90):4.0f}  "
+          f"p99 {percentile(diffs, 99):4.0f}  ({left} left unpaired)")
+    print(f"            {len(tick_times)} ticks, {total:.3f}s CPU "
+          f"(mean {total / len(tick_times) * 1e3:.2f} ms, max {max(tick_times) * 1e3:.2f} ms per tick, "
+          f"{len(diffs) / total:.0f} pairs/s)")
+
+    diffs, elapsed = run_fifo(players)
+    print(f"  fifo list: rating gap p50 {percentile(diffs, 50):4.0f}  p90 {percentile(diffs, 90):4.0f}  "
+          f"p99 {percentile(diffs, 99):4.0f}  draining {args.players} with pop(0): {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# bench_patterns.py
+"""
+Đo tốc độ đánh giá thế cờ (số thế cờ/giây) của patterns.PatternEvaluator:
+
+- quét thẳng: duyệt mọi cửa sổ trên bàn, tính điểm từng cửa sổ (không bảng tra),
+- bảng tra, từ đầu: PatternEvaluator.from_board cho mỗi thế cờ,
+- bảng tra, cập nhật dần: đặt rồi gỡ một quân như trong cây tìm kiếm của ai.py.
+
+Trước khi đo, kiểm tra ba cách cho cùng điểm trên mọi thế cờ.
+
+    python bench_patterns.py --positions 500 --size 15 --win 5
+"""
+import argparse
+import random
+import time
+
+from game_logic import WIN_LENGTH
+from patterns import O, WALL, X, PatternEvaluator, _side_value, pattern_table
+from vector_eval import random_position
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+CELL = {ord('.'): 0, ord('X'): X, ord('O'): O}
+
+
+def scan_score(board, win_length):
+    """Điểm (góc nhìn X) tính thẳng từ bàn cờ, mỗi cửa sổ một lần."""
+    size = board.size
+    cells = board.cells
+
+    def at(x, y):
+        if 0 <= x < size and 0 <= y < size:
+            return CELL[cells[x * size + y]]
+        return WALL
+
+    score = 0
+    for dx, dy in DIRECTIONS:
+        for x in range(size):
+            for y in range(size):
+                # Cửa sổ bắt đầu ở (x, y) phải nằm trọn trong bàn
+                ex, ey = x + (win_length - 1) * dx, y + (win_length - 1) * dy
+                if not (0 <= ex < size and 0 <= ey < size):
+                    continue
+                window = [at(x + k * dx, y + k * dy) for k in range(-1, win_length + 1)]
+                score += (_side_value(window, X, O, win_length) -
+                          _side_value(window, O, X, win_length))
+    return score
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=500)
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--win", type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    size, win_length = args.size, args.win
+    boards = [random_position(rng, size, rng.randint(1, size * size // 2))
+              for _ in range(args.positions)]
+
+    t0 = time.perf_counter()
+    pattern_table(win_length)
+    print(f"pattern table for {win_length} in a row: {time.perf_counter() - t0:.3f}s")
+
+    t0 = time.perf_counter()
+    expected = [scan_score(b, win_length) for b in boards]
+    scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    evaluators = [PatternEvaluator.from_board(b, win_length) for b in boards]
+    scratch = time.perf_counter() - t0
+    assert [ev.score for ev in evaluators] == expected, "table disagrees with scan"
+
+    # Cập nhật dần: mỗi thế cờ thử một nước ở mọi ô trống (đặt, đọc điểm, gỡ)
+    ev = PatternEvaluator(size, win_length)
+    count = 0
+    t0 = time.perf_counter()
+    for board, base in zip(boards, evaluators):
+        ev.codes[:] = base.codes
+        ev.score = base.score
+        sym = 'XO'[board.cells.count(ord('.')) % 2]
+        for c, v in enumerate(board.cells):
+            if v == ord('.'):
+                x, y = divmod(c, size)
+                ev.place(x, y, sym)
+                ev.score  # thế cờ mới đã có điểm
+                ev.remove(x, y)
+                count += 1
+        assert ev.score == base.score
+    incremental = time.perf_counter() - t0
+
+    print(f"{args.positions} positions {size}x{size}, {win_length} in a row: results match")
+    print(f"{'scan every window':>24}: {args.positions / scan:12.0f} positions/s")
+    print(f"{'table, from scratch':>24}: {args.positions / scratch:12.0f} positions/s")
+    print(f"{'table, incremental':>24}: {count / incremental:12.0f} positions/s (place + remove)")
+
+
+if __name__ == "__main__":
+    main()
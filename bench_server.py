@@ -0,0 +1,130 @@
+# bench_server.py
+"""
+Đo tải server: số kết nối/giây và số nước đi/giây ở từng chế độ.
+
+    python bench_server.py --pairs 200 --moves 40 --mode thread async
+    python bench_server.py --mode async --workers 1 2 4
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from game_logic import Board, apply_move, check_win
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def scripted_moves(count, seed=1):
+    """Dãy nước đi ngẫu nhiên nhưng không ai thắng, để ván kéo dài đúng `count` nước."""
+    rng = random.Random(seed)
+    board = Board(size=15)
+    cells = [(x, y) for x in range(15) for y in range(15)]
+    rng.shuffle(cells)
+    moves = []
+    for x, y in cells:
+        if len(moves) == count:
+            break
+        sym = 'X' if len(moves) % 2 == 0 else 'O'
+        apply_move(board, x, y, sym)
+        if check_win(board, x, y):
+            board.cells[x * 15 + y] = ord('.')
+            continue
+        moves.append((x, y))
+    return moves
+
+
+async def player(port, moves, started, stats):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"PLAY\n")
+    mine = None
+    turn = 0
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        parts = line.decode().split()
+        if not parts:
+            continue
+        cmd = parts[0]
+        if cmd == "START":
+            mine = moves[0::2] if parts[1] == 'X' else moves[1::2]
+            started.append(time.perf_counter())
+        elif cmd == "YOUR":
+            if turn < len(mine):
+                x, y = mine[turn]
+                turn += 1
+                writer.write(f"MOVE {x} {y}\n".encode())
+                stats["moves"] += 1
+            else:
+                writer.write(b"EXIT\n")
+                break
+        elif cmd in ("OPPONENT_LEFT", "WIN", "LOSE", "DRAW"):
+            break
+    writer.close()
+
+
+async def run_clients(port, pairs, moves):
+    stats = {"moves": 0}
+    started = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(player(port, moves, started, stats) for _ in range(pairs * 2)))
+    t1 = time.perf_counter()
+    connect_time = max(started) - t0 if started else float("nan")
+    return len(started) / connect_time, stats["moves"] / (t1 - t0)
+
+
+def wait_listening(port, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def bench_mode(mode, pairs, moves, workers=0):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "server.py", str(port), "--host", "127.0.0.1",
+                             "--mode", mode, "--workers", str(workers)],
+                            stdout=subprocess.DEVNULL)
+    try:
+        wait_listening(port)  # kết nối thăm dò đóng ngay khi bắt tay nên không vào hàng đợi
+        conns, mps = asyncio.run(run_clients(port, pairs, moves))
+    finally:
+        proc.terminate()
+        proc.wait()
+    return conns, mps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--moves", type=int, default=40)
+    parser.add_argument("--mode", nargs="+", default=["thread", "async"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0],
+                        help="số worker cho chế độ nhiều tiến trình (0 = một tiến trình)")
+    args = parser.parse_args()
+
+    moves = scripted_moves(args.moves)
+    print(f"{args.pairs} matches x {len(moves)} moves")
+    for workers in args.workers:
+        for mode in args.mode:
+            conns, mps = bench_mode(mode, args.pairs, moves, workers)
+            label = f"{mode} x{workers}" if workers else mode
+            print(f"{label:>10}: {conns:10.0f} connections/s {mps:10.0f} moves/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# bench_spectators.py
+"""
+Đo một trận đông khán giả: 10k khán giả (WATCH) cùng xem một trận trên máy.
+
+Hai người chơi đi vài nước khi chưa có ai xem, sau đó toàn bộ khán giả vào
+xem và hai người đi tiếp. Đo: thời gian để mọi khán giả nhận ảnh chụp, độ
+trễ từ lúc gửi MOVE tới khi từng khán giả nhận PLACED, độ trễ nước đi của
+người chơi khi có và không có khán giả, số byte mỗi khán giả nhận được.
+Một số khán giả (--stalled) không bao giờ đọc, để thấy người chơi không bị
+chậm theo họ. Hai người chơi chạy ở tiến trình riêng: nếu chung event loop với
+hàng nghìn khán giả, dòng OPPONENT phải chờ client xử lý xong các PLACED đến
+cùng lúc và số đo là của client chứ không phải của server.
+
+    python bench_spectators.py --viewers 10000
+    python bench_spectators.py --viewers 10000 --mode async --interval 0.05
+"""
+import argparse
+import asyncio
+import base64
+import multiprocessing
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from bench_matchmaking import percentile
+from bench_server import free_port, scripted_moves, wait_listening
+from game_logic import Board
+
+
+class Spectator(asyncio.Protocol):
+    """Một khán giả: đếm nước đã thấy, ghi lúc nhận mỗi PLACED (so với lúc gửi MOVE khi xong)."""
+
+    def __init__(self, bench, watch):
+        self.bench = bench
+        self.watch = watch
+        self.buf = b""
+        self.seen = 0       # số quân trên bàn theo những gì đã nhận
+        self.boards = 0
+        self.bytes = 0
+        self.joined = bench.loop.create_future()
+        self.closed = bench.loop.create_future()
+
+    def connection_made(self, transport):
+        # Gửi ngay: quá HANDSHAKE_TIMEOUT mà chưa có lệnh thì server coi là người chơi cũ
+        transport.write(self.watch)
+
+    def data_received(self, data):
+        now = time.perf_counter()
+        self.bytes += len(data)
+        lines = (self.buf + data).split(b"\n")
+        self.buf = lines.pop()
+        bench = self.bench
+        for line in lines:
+            if line.startswith(b"PLACED"):
+                bench.arrivals.append((self.seen, now))
+                self.seen += 1
+            elif line.startswith(b"BOARD"):
+                # Ảnh chụp (khi vào xem, hoặc sau khi bị tụt lại quá MAX_BACKLOG dòng)
+                _, _, size, _, _, packed = line.split()
+                cells = Board.unpack(int(size), base64.b64decode(packed)).cells
+                self.seen = len(cells) - cells.count(ord('.'))
+                self.boards += 1
+                if not self.joined.done():
+                    self.joined.set_result(now)
+
+    def connection_lost(self, exc):
+        self.closed.set_result(None)  # trận xong: server gửi CLOSED rồi đóng kết nối
+
+
+class Players:
+    """Hai người chơi đi lần lượt các nước của `moves`; chạy trong tiến trình riêng (play())."""
+
+    def __init__(self, port, moves, warmup, interval, pipe):
+        self.loop = asyncio.get_running_loop()
+        self.port = port
+        self.moves = moves
+        self.warmup = warmup
+        self.interval = interval
+        self.pipe = pipe
+        self.match_id = None
+        self.sent = []          # thời điểm gửi từng nước
+        self.player_lat = []    # MOVE -> OPPONENT của người chơi kia
+        self.quiet = []         # như trên, trước khi khán giả vào
+
+    async def player(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b"PLAY\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            parts = line.decode().split()
+            if not parts:
+                continue
+            cmd = parts[0]
+            if cmd == "MATCH" and self.match_id is None:
+                self.match_id = parts[1]
+                self.pipe.send(self.match_id)
+            elif cmd == "OPPONENT":
+                self.player_lat.append(time.perf_counter() - self.sent[-1])
+            elif cmd == "YOUR":
+                n = len(self.sent)
+                if n == len(self.moves):
+                    writer.write(b"EXIT\n")
+                    break
+                if n == self.warmup:
+                    # Báo tiến trình chính cho khán giả vào, chờ tới khi họ vào hết
+                    await asyncio.sleep(self.interval * 2)
+                    self.pipe.send(None)
+                    await self.loop.run_in_executor(None, self.pipe.recv)
+                    self.quiet, self.player_lat = self.player_lat, []
+                await asyncio.sleep(self.interval)
+                x, y = self.moves[n]
+                self.sent.append(time.perf_counter())
+                writer.write(f"MOVE {x} {y}\n".encode())
+            elif cmd in ("OPPONENT_LEFT", "WIN", "LOSE", "DRAW"):
+                break
+        writer.close()
+
+    async def run(self):
+        await asyncio.gather(self.player(), self.player())
+        self.pipe.send((self.sent, self.quiet, self.player_lat))
+
+
+def play(port, moves, warmup, interval, pipe):
+    async def main():
+        await Players(port, moves, warmup, interval, pipe).run()
+    asyncio.run(main())
+
+
+class Bench:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.arrivals = []      # (số thứ tự nước, lúc nhận PLACED) của từng khán giả
+        self.sent = []
+        self.latencies = []     # MOVE -> PLACED của từng khán giả
+        self.player_lat = []
+
+
+async def run(port, viewers, stalled, moves, warmup, interval, batch):
+    bench = Bench()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+    pipe, child = context.Pipe()
+    players = context.Process(target=play, args=(port, moves, warmup, interval, child))
+    players.start()
+    recv = lambda: bench.loop.run_in_executor(None, pipe.recv)
+    match_id = await recv()
+    await recv()  # người chơi đã đi xong warmup nước
+
+    # Khán giả vào theo từng đợt `batch` kết nối (hàng chờ accept của server có hạn)
+    t0 = time.perf_counter()
+    watch = f"WATCH {match_id}\n".encode()
+    specs = []
+    for i in range(0, viewers, batch):
+        conns = [bench.loop.create_connection(lambda: Spectator(bench, watch), "127.0.0.1", port)
+                 for _ in range(min(batch, viewers - i))]
+        specs += [protocol for _, protocol in await asyncio.gather(*conns)]
+    stuck = []
+    for _ in range(stalled):
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+        s.connect(("127.0.0.1", port))
+        s.sendall(watch)
+        stuck.append(s)
+    joined = await asyncio.gather(*(p.joined for p in specs))
+    join_time = max(joined) - t0
+
+    pipe.send(None)
+    bench.sent, quiet, bench.player_lat = await recv()
+    players.join()
+    await asyncio.wait([p.closed for p in specs], timeout=30)
+    for s in stuck:
+        s.close()
+    bench.latencies = [now - bench.sent[i] for i, now in bench.arrivals]
+    return bench, specs, quiet, join_time
+
+
+def bench_mode(mode, args, moves):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "server.py", str(port), "--host", "127.0.0.1",
+                             "--mode", mode, "--bot-after", "0", "--analysis-workers", "0"],
+                            stdout=subprocess.DEVNULL)
+    try:
+        wait_listening(port)
+        bench, specs, quiet, join_time = asyncio.run(
+            run(port, args.viewers, args.stalled, moves, args.warmup, args.interval, args.batch))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    live = len(moves) - args.warmup
+    complete = sum(1 for p in specs if p.seen == len(moves))
+    resyncs = sum(p.boards - 1 for p in specs)
+    per_viewer = sum(p.bytes for p in specs) / len(specs)
+    board = Board(15)
+    full = len(f"BOARD 1 15 5 X {base64.b64encode(board.pack()).decode()}\n") * (live + 1)
+    lat = bench.latencies
+    print(f"{mode:>7}: {len(specs)} spectators (+{args.stalled} stalled) joined in {join_time:.2f}s, "
+          f"{complete} saw all {len(moves)} moves, {resyncs} resyncs")
+    print(f"         fan-out MOVE -> PLACED: p50 {percentile(lat, 50) * 1e3:6.1f} ms  "
+          f"p99 {percentile(lat, 99) * 1e3:6.1f} ms  max {max(lat) * 1e3:6.1f} ms "
+          f"({len(lat)} deliveries)")
+    print(f"         player MOVE -> OPPONENT: p50 {percentile(quiet, 50) * 1e3:6.1f} ms without spectators, "
+          f"{percentile(bench.player_lat, 50) * 1e3:6.1f} ms with (p99 {percentile(bench.player_lat, 99) * 1e3:.1f} ms)")
+    print(f"         {per_viewer:.0f} B per spectator for snapshot + {live} moves "
+          f"(full board every move: {full} B)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, default=10_000)
+    parser.add_argument("--stalled", type=int, default=100, help="khán giả không bao giờ đọc")
+    parser.add_argument("--moves", type=int, default=60)
+    parser.add_argument("--warmup", type=int, default=10, help="số nước đi trước khi khán giả vào")
+    parser.add_argument("--interval", type=float, default=0.1, help="người chơi nghĩ chừng này giây mỗi nước")
+    parser.add_argument("--batch", type=int, default=100, help="số khán giả kết nối cùng lúc")
+    parser.add_argument("--mode", nargs="+", default=["thread", "async"])
+    args = parser.parse_args()
+
+    # Mỗi khán giả một fd ở cả hai phía (server là tiến trình con, thừa hưởng giới hạn)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = args.viewers + args.stalled + 256
+    if soft < want <= hard or (hard == resource.RLIM_INFINITY and soft < want):
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+    moves = scripted_moves(args.moves)
+    print(f"one match, {len(moves)} moves every {args.interval:g}s, {args.viewers} spectators "
+          f"watching after move {args.warmup}")
+    for mode in args.mode:
+        bench_mode(mode, args, moves)
+
+
+if __name__ == "__main__":
+    main()
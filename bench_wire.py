@@ -0,0 +1,133 @@
+# bench_wire.py
+"""
+So sánh giao thức nhị phân (wire.py) với dòng chữ trên cùng một trận thật:
+số byte mỗi chiều, chi phí mã hóa phía server và chi phí giải mã (tách lệnh)
+ở phía nhận.
+
+Trận được ghi lại bằng Match (không cần mạng): các nước đi kịch bản, chat
+xen kẽ, một lần mất kết nối rồi quay lại (SYNC), cuối cùng EXIT. Trước khi
+đo, mọi khung nhị phân được kiểm tra là giải mã ra đúng lệnh của dòng chữ.
+
+    python bench_wire.py --moves 120 --rounds 200
+"""
+import argparse
+import base64
+import time
+
+import wire
+from bench_framing import chunks
+from bench_server import scripted_moves
+from framing import LineReader
+from match import Match
+
+
+def record(moves, chat_every=10):
+    """-> (các dòng server gửi, các dòng client gửi) của một trận."""
+    to_client = []
+    to_server = []
+    match = Match("X", "O", lambda peer, msg: to_client.append(msg), size=15, win_length=5)
+
+    def client(player, msg):
+        to_server.append(msg)
+        match.handle(player, msg)
+
+    match.start()
+    for i, (x, y) in enumerate(moves):
+        player = "XO"[i % 2]
+        if i % chat_every == 0:
+            client(player, f"CHAT good luck, move {i} coming up")
+        client(player, f"MOVE {x} {y}")
+        if i == len(moves) // 2:
+            # Mất kết nối giữa ván rồi quay lại: ván tiếp tục bằng SYNC
+            game = match.snapshot()
+            match = Match("X", "O", lambda peer, msg: to_client.append(msg), size=15, win_length=5)
+            match.resume(game)
+    client("X", "EXIT")
+    return to_client, to_server
+
+
+def normalized(parts):
+    """Lệnh đã tách -> dạng so sánh được với line.split() (SYNC: bàn cờ về base64)."""
+    if parts[0] == "SYNC":
+        parts = parts[:4] + (base64.b64encode(parts[4]).decode(),)
+    return wire.text(parts).split()
+
+
+def check(msgs):
+    reader = wire.FrameReader()
+    reader.feed(b"".join(map(wire.encode, msgs)))
+    got = list(reader.lines)
+    bad = [(m, g) for m, g in zip(msgs, got) if normalized(g) != m.split()]
+    if len(got) != len(msgs) or bad:
+        raise SystemExit(f"binary frames do not round-trip: {bad[:3]}")
+
+
+def best_of(fn, rounds, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / rounds
+
+
+def text_decode(parts):
+    reader = LineReader()
+    lines = reader.lines
+    for data in parts:
+        reader.feed(data)
+        while lines:
+            lines.popleft().split()
+
+
+def binary_decode(parts):
+    reader = wire.FrameReader()
+    lines = reader.lines
+    for data in parts:
+        reader.feed(data)
+        lines.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--moves", type=int, default=120)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    fixed = dict(wire._FIXED)  # chỉ các lệnh không tham số, trước khi nhớ khung tọa độ nào
+    to_client, to_server = record(scripted_moves(args.moves))
+    check(to_client)
+    check(to_server)
+    print(f"one match: {args.moves} moves, {len(to_client)} server->client and "
+          f"{len(to_server)} client->server messages")
+
+    for direction, msgs in (("server->client", to_client), ("client->server", to_server)):
+        text = b"".join(map(wire.encode_line, msgs))
+        binary = b"".join(map(wire.encode, msgs))
+        print(f"{direction}: text {len(text):6d} B, binary {len(binary):6d} B "
+              f"({len(binary) / len(text):.0%})")
+
+    def cold():
+        wire._FIXED.clear()
+        wire._FIXED.update(fixed)
+        return [wire.encode(m) for m in to_client]
+
+    n = len(to_client)
+    for name, encode in (("text", lambda: [wire.encode_line(m) for m in to_client]),
+                         ("binary", lambda: [wire.encode(m) for m in to_client]),
+                         ("binary, no cached frames", cold)):
+        dt = best_of(encode, args.rounds)
+        print(f"encode {name:>6}: {dt / n * 1e9:6.0f} ns/message")
+
+    # Giải mã như phía nhận: luồng byte bị cắt thành các mảnh recv ngẫu nhiên
+    streams = {"text": b"".join(map(wire.encode_line, to_client)),
+               "binary": b"".join(map(wire.encode, to_client))}
+    for name, decode in (("text", text_decode), ("binary", binary_decode)):
+        parts = chunks(streams[name], lo=1, hi=256)
+        dt = best_of(lambda: decode(parts), args.rounds)
+        print(f"decode {name:>6}: {dt / n * 1e9:6.0f} ns/message ({len(parts)} recv chunks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# chat.py
+"""
+Chat trong trận: lịch sử có giới hạn, giới hạn tốc độ gửi, xem lại theo trang.
+
+Phía server, mỗi trận có một Room:
+
+- mỗi kết nối có một xô token (TokenBucket): RATE dòng/giây, dồn tối đa BURST
+  dòng. Dòng vượt giới hạn bị bỏ, người gửi được báo SLOW_NOTICE một lần cho
+  mỗi đợt bị chặn. Dòng dài hơn MAX_TEXT ký tự bị cắt;
+- HISTORY dòng gần nhất nằm trong một vòng đệm (deque có maxlen), đánh số
+  tăng dần, dòng cũ hơn bị bỏ.
+
+Dòng chat được chuyển cho đối thủ như trước (CHAT <chữ>). Cả loạt dòng đến
+trong một lần đọc được gửi bằng một lần ghi (outbox.py).
+
+Xem lại theo trang (client gửi trong trận):
+
+    HISTORY [trước seq] [số dòng]      0 / bỏ trống: từ dòng mới nhất
+
+    HISTORY <seq> <X|O> <chữ>          mỗi dòng một thông điệp, cũ trước
+    HISTORY END <seq>                  seq để xin trang cũ hơn (0 = hết)
+
+Phía client, ChatLog chỉ giữ các dòng đang hiện và các trang đã xin khi đang
+cuộn lên; cuộn về cuối thì các trang cũ được bỏ.
+
+Đo chi phí một dòng chat và một trang:
+
+    python chat.py
+"""
+import argparse
+import time
+from collections import deque
+from itertools import islice
+
+RATE = 2.0           # dòng/giây mỗi kết nối (0 = không giới hạn)
+BURST = 5            # số dòng gửi dồn được một lúc
+HISTORY_LINES = 64   # số dòng giữ lại mỗi trận (phía server)
+MAX_TEXT = 200       # ký tự mỗi dòng
+PAGE_LINES = 20      # số dòng mỗi trang mặc định
+PAGE_MAX = 50        # số dòng tối đa mỗi trang
+VISIBLE_LINES = 18   # số dòng khung chat của client_gui
+
+SLOW_NOTICE = "CHAT [System]: You are sending messages too fast"
+
+
+class TokenBucket:
+    """Xô token: đầy `burst`, mỗi giây thêm `rate` token, mỗi dòng tốn một token."""
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = now
+
+    def allow(self, now):
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < 1.0:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1.0
+        return True
+
+
+class Room:
+    """Chat của một trận (phía server). Người chơi là khóa bất kỳ (socket, writer)."""
+
+    def __init__(self, rate=RATE, burst=BURST, history=HISTORY_LINES, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.history = deque(maxlen=history)  # (seq, ký hiệu, chữ); seq liên tiếp
+        self.seq = 0
+        self.buckets = {}
+        self.warned = set()  # đã báo SLOW_NOTICE trong đợt bị chặn này
+
+    def say(self, player, sym, text):
+        """Một dòng của `player` -> chữ để chuyển cho đối thủ, hoặc None nếu họ gửi quá nhanh."""
+        if self.rate > 0:
+            now = self.clock()
+            bucket = self.buckets.get(player)
+            if bucket is None:
+                bucket = self.buckets[player] = TokenBucket(self.rate, self.burst, now)
+            if not bucket.allow(now):
+                return None
+            self.warned.discard(player)
+        text = text[:MAX_TEXT]
+        self.seq += 1
+        self.history.append((self.seq, sym, text))
+        return text
+
+    def throttled(self, player):
+        """Dòng của `player` vừa bị bỏ: True nếu chưa báo cho họ trong đợt này."""
+        if player in self.warned:
+            return False
+        self.warned.add(player)
+        return True
+
+    def page(self, before=0, count=PAGE_LINES):
+        """
+        -> (tối đa count dòng có seq < before, cũ trước; seq để xin trang tiếp, 0 = hết).
+        before 0: các dòng mới nhất.
+        """
+        history = self.history
+        count = max(1, min(count, PAGE_MAX))
+        if not history:
+            return [], 0
+        first = history[0][0]
+        end = len(history) if before <= 0 else max(0, min(len(history), before - first))
+        start = max(0, end - count)
+        entries = list(islice(history, start, end))
+        return entries, (entries[0][0] if start > 0 else 0)
+
+    def page_lines(self, args):
+        """Các dòng trả lời `HISTORY [before] [count]`."""
+        try:
+            before = int(args[0]) if len(args) > 0 else 0
+            count = int(args[1]) if len(args) > 1 else PAGE_LINES
+        except ValueError:
+            before, count = 0, PAGE_LINES
+        entries, more = self.page(before, count)
+        lines = [f"HISTORY {seq} {sym} {text}" for seq, sym, text in entries]
+        lines.append(f"HISTORY END {more}")
+        return lines
+
+
+_limits = (RATE, BURST, HISTORY_LINES)
+
+def configure(rate, burst=BURST, history=HISTORY_LINES):
+    """Giới hạn cho các trận mới: dòng/giây (0 = tắt), số dòng dồn, số dòng lịch sử."""
+    global _limits
+    _limits = (rate, burst, history)
+
+def new_room():
+    return Room(*_limits)
+
+
+# --- Phía client ---
+
+class ChatLog:
+    """
+    Các dòng chat đang hiện ở client ("Me: ..."/"Opp: ..."). Mặc định hiện
+    `visible` dòng mới nhất (vòng đệm, dòng cũ bị bỏ). Cuộn lên (scroll > 0)
+    thì hiện các trang lịch sử xin từ server (HISTORY); cuộn về cuối thì bỏ
+    các trang đó.
+    """
+
+    def __init__(self, visible=VISIBLE_LINES, scrollback=HISTORY_LINES):
+        self.visible = visible
+        self.live = deque(maxlen=visible)
+        self.pages = deque(maxlen=scrollback)  # cũ trước
+        self.incoming = []      # trang đang nhận
+        self.scroll = 0         # số dòng đã cuộn lên (0 = đang xem dòng mới nhất)
+        self.loaded = False     # đã nhận trang đầu
+        self.more = 0           # seq để xin trang cũ hơn (0 = hết)
+        self.requested = False  # đang chờ một trang
+
+    def add(self, line):
+        self.live.append(line)
+
+    def __len__(self):
+        return len(self.live)
+
+    def view(self):
+        """Các dòng khung chat đang hiện."""
+        if not self.scroll:
+            return tuple(self.live)
+        end = max(0, len(self.pages) - self.scroll + 1)
+        return tuple(islice(self.pages, max(0, end - self.visible), end))
+
+    def scroll_by(self, lines):
+        """Cuộn lên (lines > 0) hoặc xuống; về tới cuối thì bỏ các trang lịch sử."""
+        scroll = max(0, self.scroll + lines)
+        if scroll and self.loaded:
+            scroll = min(scroll, max(1, len(self.pages) - self.visible + 1))
+        elif scroll:
+            scroll = 1  # chưa có trang nào: chờ trang đầu
+        else:
+            self.pages.clear()
+            self.loaded = False
+            self.more = 0
+        self.scroll = scroll
+
+    def next_request(self):
+        """seq cho lệnh HISTORY cần gửi (0 = trang mới nhất), hoặc None; gọi sau scroll_by()."""
+        if not self.scroll or self.requested:
+            return None
+        if not self.loaded:
+            self.requested = True
+            return 0
+        if self.more and len(self.pages) - self.scroll + 1 - self.visible <= 0:
+            self.requested = True  # đã cuộn tới dòng cũ nhất đang có
+            return self.more
+        return None
+
+    def page_line(self, line):
+        self.incoming.append(line)
+
+    def page_end(self, more):
+        """Nhận xong một trang: thêm vào trước các trang đã có."""
+        lines, self.incoming = self.incoming, []
+        self.requested = False
+        if not self.scroll:
+            return  # đã cuộn về cuối trước khi trang tới
+        self.pages.extendleft(reversed(lines))
+        self.loaded = True
+        self.more = more
+
+
+# --- Đo chi phí ---
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.rounds
+    clock = time.perf_counter
+
+    room = Room(rate=0)
+    t0 = clock()
+    for i in range(n):
+        room.say("a", "X", "hello there, good game")
+    print(f"say (no limit):    {(clock() - t0) / n * 1e9:6.0f} ns/line, "
+          f"{len(room.history)} of {room.seq} lines kept")
+
+    t0 = clock()
+    for i in range(n // 10):
+        room.page_lines([str(room.seq - 10), str(PAGE_LINES)])
+    print(f"HISTORY page:      {(clock() - t0) / (n // 10) * 1e6:6.2f} us/page of {PAGE_LINES}")
+
+    spam = Room(rate=RATE, burst=BURST)
+    t0 = clock()
+    allowed = sum(spam.say("a", "X", "spam") is not None for _ in range(n))
+    dt = clock() - t0
+    print(f"say (spam, {RATE:g}/s): {dt / n * 1e9:6.0f} ns/line, {allowed} of {n} allowed in {dt:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,23 @@
+import base64
 import socket
 import sys
 import os 
+import time
+import reconnect
+from client_state import ClientState, TEXTS, PLACE, LOST
+from framing import LineReader
+from game_logic import Board
+
+# Dòng trạng thái của client console (client_state.py dùng bộ chữ của client GUI)
+CONSOLE_TEXTS = dict(TEXTS, **{
+    "START": "Game started! You are '{sym}'.",
+    "rules": " {size}x{size} board, {k} in a row wins.",
+    "SYNC": "Reconnected! You are '{sym}'.",
+    "YOUR": "It's your turn.",
+    "OPPONENT": "Opponent moved to ({x}, {y})",
+    "INVALID": "Invalid move: {reason}. Your last move was reverted.",
+    PLACE: "Move sent, waiting for opponent...",
+})
 
 
 def clear_screen():
@@ -33,155 +50,248 @@ def redraw_screen(board, message=""):
     print_board(board)
     print("\n") 
 
-def get_move_and_send(s, board, my_symbol):
+def request_hint(s, reader):
+    """Gửi HINT rồi chờ server trả lời; các dòng khác đến trong lúc chờ được giữ lại cho vòng lặp chính."""
+    others = []
+    try:
+        s.sendall(b"HINT\n")
+        while True:
+            line = reader.readline(s)
+            if line is None:
+                return None
+            parts = line.split()
+            if parts and parts[0] == "HINT" and len(parts) == 3:
+                return int(parts[1]), int(parts[2])
+            if parts and parts[0] == "CHAT" and "Hints are not available" in line:
+                return None
+            others.append(line)
+            if parts and parts[0] == "OPPONENT_LEFT":
+                return None
+    except OSError:
+        return None
+    finally:
+        reader.lines.extendleft(reversed(others))
+
+def get_move_and_send(s, state, reader=None):
     """
     Loops until the user enters valid syntax AND valid board coordinates.
+    Typing "hint" asks the server for a suggested move.
     """
+    board = state.board
     size = len(board) 
     
     while True:
         try:
-            move = input("Enter move (row col): ")
+            move = input("Enter move (row col, or 'hint'): ")
+            if move.strip().lower() == "hint" and reader is not None:
+                hint = request_hint(s, reader)
+                if hint:
+                    print(f"[HINT]: Try {hint[0]} {hint[1]}")
+                else:
+                    print("[HINT]: No hint available right now.")
+                continue
             x, y = map(int, move.strip().split())
 
             if not (0 <= x < size and 0 <= y < size):
                 print(f"[INPUT ERROR]: Coordinates must be between 0 and {size-1}. Try again.")
                 continue 
 
-            previous_value = board[x][y]
-
-            if previous_value != '.':
+            if board[x][y] != '.':
                 print("[INPUT ERROR]: Cell is already occupied. Try again.")
                 continue
 
             # Gửi lệnh định dạng đơn giản tới server: "MOVE x y"
             # (Server chịu trách nhiệm kiểm tra hợp lệ/kiểm tra luật)
-            s.sendall(f"MOVE {x} {y}\n".encode())
+            try:
+                s.sendall(f"MOVE {x} {y}\n".encode())
+            except OSError:
+                pass  # mất kết nối: vòng lặp chính kết nối lại, SYNC đưa bàn cờ về đúng trạng thái
             
             # Optimistic update: cập nhật bàn cờ bên client ngay lập tức
             # để người chơi thấy kết quả ngay, trước khi server xác nhận.
-            # Nếu server trả INVALID, chúng ta sẽ hoàn tác lại (revert).
-            board[x][y] = my_symbol
-            
-            # Trả về tọa độ và giá trị trước đó để có thể hoàn tác khi cần
-            return x, y, previous_value 
+            # Nếu server trả INVALID, state tự hoàn tác lại (revert).
+            state.apply((PLACE, x, y))
+            return x, y
         
         except ValueError: 
             print("[INPUT ERROR]: Please enter two NUMBERS separated by a space. Try again.")
 
+RESULT_TEXT = {"X_WIN": "X wins!", "O_WIN": "O wins!", "DRAW": "Game is a draw.",
+               "ABANDONED": "Game abandoned.", "X_WIN_TIME": "X wins on time!",
+               "O_WIN_TIME": "O wins on time!"}
+
+def spectate(s, match_id):
+    """Xem trực tiếp một trận (WATCH): ảnh chụp BOARD rồi từng nước PLACED, không đi quân."""
+    s.sendall(f"WATCH {match_id}\n".encode())
+    reader = LineReader()
+    board = []
+    status_message = f"Watching match {match_id}..."
+    while True:
+        line = reader.readline(s)
+        if line is None:
+            print("Disconnected from server.")
+            return
+        parts = line.split()
+        if not parts:
+            continue
+        cmd = parts[0]
+
+        if cmd == "BOARD":
+            # BOARD <mã> <n> <k> <tới lượt> <bàn cờ>: ván mới hoặc ảnh chụp khi vừa vào xem
+            size = int(parts[2])
+            cells = Board.unpack(size, base64.b64decode(parts[5])).cells
+            board = [[chr(v) for v in cells[r * size:(r + 1) * size]] for r in range(size)]
+            status_message = f"Watching match {parts[1]}: {parts[4]} to move."
+        elif cmd == "PLACED" and board:
+            sym, x, y = parts[1], int(parts[2]), int(parts[3])
+            board[x][y] = sym
+            status_message = f"{sym} moved to ({x}, {y})"
+        elif cmd == "RESULT":
+            status_message = RESULT_TEXT.get(parts[1], parts[1])
+        elif cmd == "CLOSED":
+            print("\n================\n  Match is over. \n================\n")
+            return
+        elif cmd == "INVALID":
+            print(f"Cannot watch match {match_id}: {' '.join(parts[1:])}")
+            return
+        redraw_screen(board, status_message)
+
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python client.py <host> <port>")
+    if len(sys.argv) not in (3, 4, 5):
+        print("Usage: [CARO_NAME=<name>] [CARO_WATCH=<match>] python client.py <host> <port> [size [win_length]]")
         return
 
     host = sys.argv[1]
     port = int(sys.argv[2])
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else 15
 
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((host, port))
 
-    my_symbol = None
-    # Khởi tạo bàn 15x15 với '.' biểu thị ô trống
-    board = [['.' for _ in range(15)] for _ in range(15)]
-    last_move_info = None
-    
-    status_message = "Connecting to server..." 
+    match_id = os.environ.get("CARO_WATCH")
+    if match_id:
+        # Chỉ xem: mã trận lấy từ log server hoặc từ dòng MATCH người chơi nhận được
+        try:
+            spectate(s, match_id)
+        finally:
+            s.close()
+        return
+
+    handshake = []
+    name = os.environ.get("CARO_NAME")
+    if name:
+        # Chơi có tính hệ số Elo: được ghép với người gần hệ số (matchmaking.py)
+        handshake.append(f"NAME {name}")
+    if len(sys.argv) > 3:
+        # Chọn luật trước khi vào hàng đợi: chỉ ghép với người chọn cùng luật
+        handshake.append(f"SIZE {' '.join(sys.argv[3:])}")
+    if handshake:
+        s.sendall(("\n".join(handshake + ["PLAY"]) + "\n").encode())
+
+    # Bàn cờ, lượt đi, nước chưa xác nhận...: cùng một client_state.ClientState như client GUI.
+    # Client console chỉ có một luồng nên áp dụng thẳng từng lệnh, không qua hàng đợi.
+    state = ClientState(size, texts=CONSOLE_TEXTS)
+    reader = LineReader()
+    resume_deadline = None  # đang kết nối lại: hạn chót (time.monotonic())
 
     try:
         while True:
-            # Nhận dữ liệu từ server. Lưu ý: đây đọc tối đa 1024 byte mỗi lần
-            data = s.recv(1024).decode().strip()
-            if not data:
-                print("Disconnected from server.")
-                break
-
-            for line in data.split('\n'):
-                parts = line.strip().split()
-                if not parts:
-                    continue
-
-                cmd = parts[0]
-
-                if cmd == "START":
-                    # START <symbol>: server thông báo ký hiệu của client ('X' hoặc 'O')
-                    my_symbol = parts[1]
-                    status_message = f"Game started! You are '{my_symbol}'."
-                    redraw_screen(board, status_message) 
-
-                elif cmd == "YOUR":
-                    # Đến lượt client: hiển thị trạng thái và gọi hàm nhập nước đi
-                    status_message = "It's your turn."
-                    redraw_screen(board, status_message) 
-                    
-                    # Hàm trả về (x, y, previous_value) để có thể revert nếu INVALID
-                    last_move_info = get_move_and_send(s, board, my_symbol)
-                    
-                    status_message = "Move sent, waiting for opponent..."
-                    redraw_screen(board, status_message) 
-
-                elif cmd == "OPPONENT":
-                    # OPPONENT x y: server thông báo nước đi của đối thủ
-                    x, y = int(parts[1]), int(parts[2])
-                    opp_symbol = 'O' if my_symbol == 'X' else 'X'
-                    board[x][y] = opp_symbol 
-                    
-                    status_message = f"Opponent moved to ({x}, {y})"
-                    redraw_screen(board, status_message) 
-
-                elif cmd == "INVALID":
-                    # INVALID <reason>: server từ chối nước đi vừa gửi.
-                    # Lý do có thể là vi phạm luật hoặc trùng ô do cạnh tranh đồng thời.
-                    invalid_reason = ' '.join(parts[1:])
-                    
-                    # Nếu trước đó chúng ta đã làm optimistic update, hoàn tác lại
-                    if last_move_info:
-                        lx, ly, previous_value = last_move_info
-                        board[lx][ly] = previous_value 
-                        last_move_info = None
-                    
-                    status_message = f"Invalid move: {invalid_reason}. Your last move was reverted."
-                    redraw_screen(board, status_message) 
-                    
-                    # Yêu cầu người chơi nhập lại ngay lập tức (vẫn lượt của họ)
-                    status_message = "It's still your turn. Please enter a valid move."
-                    print(f"\n[STATUS]: {status_message}\n") 
-                    
-                    last_move_info = get_move_and_send(s, board, my_symbol)
-                    
-                    status_message = "New move sent, waiting for opponent..."
-                    redraw_screen(board, status_message) 
-
-                elif cmd == "WIN":
-                    clear_screen() 
-                    print_board(board)
-                    print("\n================\n    You win!    \n================\n")
-                    return 
-
-                elif cmd == "LOSE":
-                    clear_screen() 
-                    print_board(board)
-                    print("\n================\n    You lose!   \n================\n")
+            # Nhận từng dòng lệnh hoàn chỉnh; LineReader tự ghép các mảnh TCP
+            try:
+                line = reader.readline(s)
+            except OSError:
+                line = None
+            if line is None or (resume_deadline and line == reconnect.UNKNOWN_SESSION):
+                if state.session is None:
+                    print("Disconnected from server.")
+                    break
+                # Mất kết nối giữa ván: server giữ chỗ một lúc, quay lại bằng token
+                if resume_deadline is None:
+                    resume_deadline = time.monotonic() + reconnect.RECONNECT_TIMEOUT
+                elif time.monotonic() < resume_deadline:
+                    time.sleep(reconnect.RECONNECT_DELAY)
+                state.apply((LOST,))
+                redraw_screen(state.board, state.status)
+                s.close()
+                s = None
+                if time.monotonic() < resume_deadline:
+                    s = reconnect.resume(host, port, state.session, resume_deadline)
+                if s is None:
+                    print("Could not reconnect to the game.")
                     return
+                reader = LineReader()
+                continue
 
-                elif cmd == "DRAW":
-                    clear_screen() 
-                    print_board(board)
-                    print("\n================\n  Game is a draw. \n================\n")
-                    return
+            parts = line.strip().split()
+            if not parts:
+                continue
+
+            cmd = parts[0]
+            state.apply(tuple(parts))
+
+            if cmd == "SYNC":
+                # Đã quay lại ván: bàn cờ lấy theo server, bỏ mọi nước chưa được xác nhận
+                resume_deadline = None
+                redraw_screen(state.board, state.status)
+
+            elif cmd == "START":
+                # START <symbol> [size win_length]: server thông báo ký hiệu của client
+                # ('X' hoặc 'O') và luật của trận
+                redraw_screen(state.board, state.status) 
+
+            elif cmd == "YOUR":
+                # Đến lượt client: hiển thị trạng thái và gọi hàm nhập nước đi
+                redraw_screen(state.board, state.status) 
+                get_move_and_send(s, state, reader)
+                redraw_screen(state.board, state.status) 
+
+            elif cmd == "OPPONENT":
+                # OPPONENT x y: server thông báo nước đi của đối thủ
+                redraw_screen(state.board, state.status) 
+
+            elif cmd == "INVALID":
+                # INVALID <reason>: server từ chối nước đi vừa gửi (state đã hoàn tác nước đi).
+                # Lý do có thể là vi phạm luật hoặc trùng ô do cạnh tranh đồng thời.
+                redraw_screen(state.board, state.status) 
+                
+                # Yêu cầu người chơi nhập lại ngay lập tức (vẫn lượt của họ)
+                print("\n[STATUS]: It's still your turn. Please enter a valid move.\n") 
+                
+                get_move_and_send(s, state, reader)
+                redraw_screen(state.board, "New move sent, waiting for opponent...") 
+
+            elif cmd == "WIN":
+                clear_screen() 
+                print_board(state.board)
+                print("\n================\n    You win!    \n================\n")
+                return 
+
+            elif cmd == "LOSE":
+                clear_screen() 
+                print_board(state.board)
+                print("\n================\n    You lose!   \n================\n")
+                return
+
+            elif cmd == "DRAW":
+                clear_screen() 
+                print_board(state.board)
+                print("\n================\n  Game is a draw. \n================\n")
+                return
+
+            elif cmd == "OPPONENT_LEFT":
+                clear_screen() 
+                print_board(state.board)
+                print("\n================\n Opponent disconnected. \n================\n")
+                return 
 
-                elif cmd == "OPPONENT_LEFT":
-                    clear_screen() 
-                    print_board(board)
-                    print("\n================\n Opponent disconnected. \n================\n")
-                    return 
-    
     except ConnectionAbortedError:
         print("Connection was aborted.")
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
-        s.close()
+        if s is not None:
+            s.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
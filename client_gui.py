@@ -1,13 +1,22 @@
 # client_gui.py
+import os
 import socket
 import sys
 import threading
 import pygame
 import time
+from collections import OrderedDict
+import reconnect
+import wire
+import chat
+from client_state import ClientState, PLACE, SAID, SCROLL, REMATCH_SENT, LOST, DISCONNECTED, FAILED, RESULTS
+from framing import LineReader
 
 # --- Game Settings ---
 GRID_SIZE = 15
 CELL_SIZE = 40
+BOARD_PIXELS = 600   # bàn lớn hơn 15x15 thì thu nhỏ ô để vừa khung này
+MIN_CELL_SIZE = 12
 MARGIN = 20
 INFO_HEIGHT = 60
 BOARD_WIDTH = GRID_SIZE * CELL_SIZE + MARGIN * 2
@@ -15,12 +24,22 @@ CHAT_WIDTH = 300
 SCREEN_WIDTH = BOARD_WIDTH + CHAT_WIDTH
 SCREEN_HEIGHT = GRID_SIZE * CELL_SIZE + MARGIN * 2 + INFO_HEIGHT
 
+def set_grid_size(size):
+    """Tính lại bố cục cửa sổ cho bàn size x size."""
+    global GRID_SIZE, CELL_SIZE, BOARD_WIDTH, SCREEN_WIDTH, SCREEN_HEIGHT
+    GRID_SIZE = size
+    CELL_SIZE = max(MIN_CELL_SIZE, min(40, BOARD_PIXELS // size))
+    BOARD_WIDTH = GRID_SIZE * CELL_SIZE + MARGIN * 2
+    SCREEN_WIDTH = BOARD_WIDTH + CHAT_WIDTH
+    SCREEN_HEIGHT = GRID_SIZE * CELL_SIZE + MARGIN * 2 + INFO_HEIGHT
+
 # --- Colors (CYBER DARK THEME - CUSTOM) ---
 COLOR_BG = (18, 22, 30)
 COLOR_GRID = (60, 70, 90)
 COLOR_X = (0, 220, 255)
 COLOR_O = (255, 150, 60)
 COLOR_HIGHLIGHT = (80, 80, 120)
+COLOR_HINT = (120, 255, 120)
 COLOR_TEXT = (220, 220, 230)
 COLOR_INFO_BG = (25, 30, 45)
 COLOR_CHAT_BG = (30, 36, 55)
@@ -32,26 +51,30 @@ COLOR_BTN_HOVER = (0, 200, 255)
 COLOR_OVERLAY = (0, 0, 0, 180)
 
 # --- Global State ---
-board = [['.' for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-my_symbol = None
-is_my_turn = False
-game_over = False
-status_message = "Connecting to server..."
-last_player_move = None
-last_optimistic_move = None
+# Trạng thái ván (client_state.py): luồng mạng chỉ post() sự kiện, vòng lặp chính áp dụng
+state = ClientState(GRID_SIZE)
 sock = None
+server_addr = None
+use_binary = False  # CARO_BINARY=1: thương lượng giao thức nhị phân (wire.py)
+encode = wire.encode_line
+outbox = None  # lệnh gửi trong lúc chờ server trả lời HELLO
+send_lock = threading.Lock()
 
 # --- Rematch State ---
-game_over_time = 0
-rematch_sent = False
 TIMEOUT_SECONDS = 15
 
 # --- Chat State ---
-chat_history = []
 input_text = ""
-MAX_CHAT_LINES = 18
+MAX_CHAT_LINES = chat.VISIBLE_LINES
+SCROLL_LINES = 3  # số dòng mỗi nấc cuộn chuột trên khung chat
 
 # --- Drawing Functions ---
+FPS = 60
+IDLE_WAIT_MS = 250     # không có gì thay đổi: ngủ chờ sự kiện tối đa chừng này (đếm ngược PLAY AGAIN vẫn chạy)
+TEXT_CACHE_SIZE = 256  # số bề mặt chữ giữ lại mỗi font
+CHAT_LINE_HEIGHT = 25
+NETWORK_EVENT = pygame.USEREVENT + 1  # luồng mạng vừa đổi trạng thái: đánh thức vòng lặp chính
+
 def draw_button(screen, font, rect, text, is_hover):
     color = COLOR_BTN_HOVER if is_hover else COLOR_BTN_NORMAL
     pygame.draw.rect(screen, color, rect, border_radius=12)
@@ -59,98 +82,266 @@ def draw_button(screen, font, rect, text, is_hover):
     txt = font.render(text, True, (255, 255, 255))
     screen.blit(txt, txt.get_rect(center=rect.center))
 
+def stone_width():
+    return max(2, CELL_SIZE * 6 // 40)
+
 def draw_X(screen, center):
     offset = CELL_SIZE // 4
     pygame.draw.line(screen, COLOR_X,
                      (center[0]-offset, center[1]-offset),
-                     (center[0]+offset, center[1]+offset), 6)
+                     (center[0]+offset, center[1]+offset), stone_width())
     pygame.draw.line(screen, COLOR_X,
                      (center[0]-offset, center[1]+offset),
-                     (center[0]+offset, center[1]-offset), 6)
+                     (center[0]+offset, center[1]-offset), stone_width())
 
 def draw_O(screen, center):
     radius = CELL_SIZE // 3
-    pygame.draw.circle(screen, COLOR_O, center, radius, width=6)
-
-def draw_game(screen, font_game, font_chat):
-    screen.fill(COLOR_BG)
-
-    if last_player_move:
-        r, c = last_player_move
-        pygame.draw.rect(
-            screen, COLOR_HIGHLIGHT,
-            (MARGIN + c * CELL_SIZE, MARGIN + r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-        )
-
-    for i in range(GRID_SIZE + 1):
-        pygame.draw.line(screen, COLOR_GRID,
-            (MARGIN + i * CELL_SIZE, MARGIN),
-            (MARGIN + i * CELL_SIZE, MARGIN + GRID_SIZE * CELL_SIZE), 2)
-        pygame.draw.line(screen, COLOR_GRID,
-            (MARGIN, MARGIN + i * CELL_SIZE),
-            (MARGIN + GRID_SIZE * CELL_SIZE, MARGIN + i * CELL_SIZE), 2)
-
-    for r in range(GRID_SIZE):
-        for c in range(GRID_SIZE):
-            center = (
-                MARGIN + c * CELL_SIZE + CELL_SIZE // 2,
-                MARGIN + r * CELL_SIZE + CELL_SIZE // 2
-            )
-            if board[r][c] == 'X': draw_X(screen, center)
-            elif board[r][c] == 'O': draw_O(screen, center)
-
-    info_rect = (0, SCREEN_HEIGHT - INFO_HEIGHT, BOARD_WIDTH, INFO_HEIGHT)
-    if not (game_over and not status_message.startswith("Opponent Left")):
-        pygame.draw.rect(screen, COLOR_INFO_BG, info_rect)
-
-    pygame.draw.line(screen, COLOR_GRID,
-        (0, SCREEN_HEIGHT - INFO_HEIGHT),
-        (BOARD_WIDTH, SCREEN_HEIGHT - INFO_HEIGHT), 1)
-
-    txt = font_game.render(status_message, True, COLOR_TEXT)
-    screen.blit(txt, txt.get_rect(
-        center=(BOARD_WIDTH // 2, SCREEN_HEIGHT - INFO_HEIGHT // 2)))
-
-    pygame.draw.rect(screen, COLOR_CHAT_BG,
-        (BOARD_WIDTH, 0, CHAT_WIDTH, SCREEN_HEIGHT))
-    pygame.draw.line(screen, COLOR_BORDER,
-        (BOARD_WIDTH, 0), (BOARD_WIDTH, SCREEN_HEIGHT), 2)
-
-    title = font_game.render("CHAT ROOM", True, COLOR_X)
-    screen.blit(title, (BOARD_WIDTH + 20, 10))
-
-    y = 50
-    for line in chat_history[-MAX_CHAT_LINES:]:
-        color = COLOR_X if line.startswith("Me:") else COLOR_O
-        screen.blit(font_chat.render(line, True, color),
-                    (BOARD_WIDTH + 10, y))
-        y += 25
-
-    input_rect = (BOARD_WIDTH + 10, SCREEN_HEIGHT - 40, CHAT_WIDTH - 20, 30)
-    pygame.draw.rect(screen, COLOR_INPUT_BG, input_rect)
-    pygame.draw.rect(screen, COLOR_BORDER, input_rect, 1)
-    screen.blit(font_chat.render(input_text, True, COLOR_TEXT),
-                (input_rect[0] + 5, input_rect[1] + 5))
-
-    if game_over and not status_message.startswith("Opponent Left"):
-        elapsed = (pygame.time.get_ticks() - game_over_time) / 1000
-        remaining = max(0, TIMEOUT_SECONDS - elapsed)
-        if remaining > 0:
-            overlay = pygame.Surface((BOARD_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill(COLOR_OVERLAY)
-            screen.blit(overlay, (0, 0))
-
-            btn_rect = pygame.Rect(
-                (BOARD_WIDTH - 180)//2,
-                (SCREEN_HEIGHT - INFO_HEIGHT)//2,
-                180, 60
-            )
-            mouse_pos = pygame.mouse.get_pos()
-            hover = btn_rect.collidepoint(mouse_pos)
-            label = "WAITING..." if rematch_sent else f"PLAY AGAIN ({int(remaining)})"
-            draw_button(screen, font_game, btn_rect, label, hover)
-
-    pygame.display.flip()
+    pygame.draw.circle(screen, COLOR_O, center, radius, width=stone_width())
+
+def cell_rect(r, c):
+    return pygame.Rect(MARGIN + c * CELL_SIZE, MARGIN + r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+def rematch_button():
+    return pygame.Rect((BOARD_WIDTH - 180)//2, (SCREEN_HEIGHT - INFO_HEIGHT)//2, 180, 60)
+
+class TextCache:
+    """Bề mặt chữ đã render theo (chữ, màu); đầy thì bỏ cái lâu không dùng nhất."""
+
+    def __init__(self, font, size=TEXT_CACHE_SIZE):
+        self.font = font
+        self.size = size
+        self.surfaces = OrderedDict()
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.surfaces[key] = self.font.render(text, True, color)
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+class Renderer:
+    """
+    Vẽ giữ trạng thái: nền các khung, lưới và hai quân cờ được vẽ sẵn một lần
+    cho mỗi bố cục; mỗi khung hình so trạng thái hiện tại với những gì đang
+    trên màn hình, chỉ vẽ lại các ô, dòng trạng thái, khung chat, ô nhập đã
+    đổi và chỉ đưa đúng các vùng đó lên màn hình (pygame.display.update).
+    Đang hiện lớp phủ PLAY AGAIN (trong suốt) thì vùng bàn cờ được vẽ lại cả
+    khối khi có gì đổi. draw() trả về các vùng đã vẽ: rỗng nghĩa là rảnh.
+    """
+
+    def __init__(self, screen, font_game, font_chat, state):
+        self.state = state
+        self.font_game = font_game
+        self.game_text = TextCache(font_game)
+        self.chat_text = TextCache(font_chat)
+        self.resize(screen)
+
+    def resize(self, screen):
+        """Vẽ sẵn các lớp cố định theo bố cục hiện tại (sau set_grid_size và set_mode)."""
+        self.screen = screen
+        size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        board_px = GRID_SIZE * CELL_SIZE
+
+        background = pygame.Surface(size)
+        background.fill(COLOR_BG)
+        pygame.draw.rect(background, COLOR_INFO_BG, self.info_rect())
+        pygame.draw.line(background, COLOR_GRID,
+            (0, SCREEN_HEIGHT - INFO_HEIGHT), (BOARD_WIDTH, SCREEN_HEIGHT - INFO_HEIGHT), 1)
+        pygame.draw.rect(background, COLOR_CHAT_BG, (BOARD_WIDTH, 0, CHAT_WIDTH, SCREEN_HEIGHT))
+        pygame.draw.line(background, COLOR_BORDER, (BOARD_WIDTH, 0), (BOARD_WIDTH, SCREEN_HEIGHT), 2)
+        background.blit(self.font_game.render("CHAT ROOM", True, COLOR_X), (BOARD_WIDTH + 20, 10))
+        input_rect = self.input_rect()
+        pygame.draw.rect(background, COLOR_INPUT_BG, input_rect)
+        pygame.draw.rect(background, COLOR_BORDER, input_rect, 1)
+        self.background = background.convert()
+
+        # Lưới nằm trên ô tô sáng/gợi ý, dưới quân cờ (như thứ tự vẽ trước đây)
+        grid = pygame.Surface(size, pygame.SRCALPHA)
+        for i in range(GRID_SIZE + 1):
+            pygame.draw.line(grid, COLOR_GRID,
+                (MARGIN + i * CELL_SIZE, MARGIN), (MARGIN + i * CELL_SIZE, MARGIN + board_px), 2)
+            pygame.draw.line(grid, COLOR_GRID,
+                (MARGIN, MARGIN + i * CELL_SIZE), (MARGIN + board_px, MARGIN + i * CELL_SIZE), 2)
+        self.grid = grid.convert_alpha()
+
+        self.sprites = {}
+        for sym, draw in (('X', draw_X), ('O', draw_O)):
+            sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+            draw(sprite, (CELL_SIZE // 2, CELL_SIZE // 2))
+            self.sprites[sym] = sprite.convert_alpha()
+
+        overlay = pygame.Surface((BOARD_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        overlay.fill(COLOR_OVERLAY)
+        self.overlay = overlay.convert_alpha()
+        self.invalidate()
+
+    def invalidate(self):
+        """Quên những gì đang trên màn hình: khung sau vẽ lại toàn bộ (mở cửa sổ, bị che rồi hiện lại)."""
+        self.version = None
+        self.cells = None
+        self.marks = (None, None)
+        self.status = None
+        self.banner = None
+        self.chat = None
+        self.input = None
+
+    def info_rect(self):
+        return pygame.Rect(0, SCREEN_HEIGHT - INFO_HEIGHT, BOARD_WIDTH, INFO_HEIGHT)
+
+    def input_rect(self):
+        return pygame.Rect(BOARD_WIDTH + 10, SCREEN_HEIGHT - 40, CHAT_WIDTH - 20, 30)
+
+    def chat_rect(self):
+        rect = pygame.Rect(BOARD_WIDTH, 50, CHAT_WIDTH, MAX_CHAT_LINES * CHAT_LINE_HEIGHT)
+        return rect.clip(self.screen.get_rect())
+
+    def banner_state(self):
+        """Lớp phủ PLAY AGAIN: (nhãn nút, chuột đang trỏ vào) hoặc None."""
+        state = self.state
+        if not state.game_over or state.result not in RESULTS[:3]:
+            return None
+        remaining = TIMEOUT_SECONDS - (time.monotonic() - state.finished_at)
+        if remaining <= 0:
+            return None
+        label = "WAITING..." if state.rematch_sent else f"PLAY AGAIN ({int(remaining)})"
+        return label, rematch_button().collidepoint(pygame.mouse.get_pos())
+
+    def changed_cells(self):
+        """Các ô khác với lần vẽ trước (quân cờ, ô tô sáng, ô gợi ý); cập nhật bản sao đã vẽ."""
+        state = self.state
+        cells = self.cells
+        current = [list(row) for row in state.board]
+        self.cells = current
+        if cells is None or len(cells) != len(current):
+            return None  # vẽ lại hết
+        dirty = set()
+        for r, (old, new) in enumerate(zip(cells, current)):
+            if old != new:
+                dirty.update((r, c) for c, (a, b) in enumerate(zip(old, new)) if a != b)
+        marks = (state.last_move, state.hint)
+        if marks != self.marks:
+            dirty.update(m for m in self.marks + marks if m is not None)
+            self.marks = marks
+        return dirty
+
+    def draw_cell(self, r, c):
+        rect = cell_rect(r, c)
+        screen = self.screen
+        screen.blit(self.background, rect, rect)
+        if (r, c) == self.state.last_move:
+            pygame.draw.rect(screen, COLOR_HIGHLIGHT, rect)
+        if (r, c) == self.state.hint:
+            pygame.draw.rect(screen, COLOR_HINT, rect, 3)
+        screen.blit(self.grid, rect, rect)
+        sprite = self.sprites.get(self.cells[r][c])
+        if sprite is not None:
+            screen.blit(sprite, rect)
+        return rect
+
+    def draw_status(self):
+        rect = self.info_rect()
+        self.screen.blit(self.background, rect, rect)
+        txt = self.game_text.render(self.status, COLOR_TEXT)
+        self.screen.blit(txt, txt.get_rect(center=rect.center))
+        return rect
+
+    def draw_board_area(self):
+        """Cả vùng bàn cờ (và dòng trạng thái), kèm lớp phủ nếu có."""
+        rect = pygame.Rect(0, 0, BOARD_WIDTH, SCREEN_HEIGHT)
+        screen = self.screen
+        screen.blit(self.background, rect, rect)
+        if self.state.last_move:
+            pygame.draw.rect(screen, COLOR_HIGHLIGHT, cell_rect(*self.state.last_move))
+        if self.state.hint:
+            pygame.draw.rect(screen, COLOR_HINT, cell_rect(*self.state.hint), 3)
+        screen.blit(self.grid, rect, rect)
+        sprites = self.sprites
+        for r, row in enumerate(self.cells):
+            for c, sym in enumerate(row):
+                if sym in sprites:
+                    screen.blit(sprites[sym], cell_rect(r, c))
+        self.draw_status()
+        if self.banner is not None:
+            label, hover = self.banner
+            self.screen.blit(self.overlay, (0, 0))
+            draw_button(self.screen, self.font_game, rematch_button(), label, hover)
+        return rect
+
+    def draw_chat(self):
+        rect = self.chat_rect()
+        self.screen.blit(self.background, rect, rect)
+        y = rect.top
+        for line in self.chat:
+            color = COLOR_X if line.startswith("Me:") else COLOR_O
+            self.screen.blit(self.chat_text.render(line, color), (BOARD_WIDTH + 10, y))
+            y += CHAT_LINE_HEIGHT
+        return rect
+
+    def draw_input(self):
+        rect = self.input_rect()
+        self.screen.blit(self.background, rect, rect)
+        self.screen.blit(self.chat_text.render(self.input, COLOR_TEXT), (rect.x + 5, rect.y + 5))
+        return rect
+
+    def draw(self):
+        state = self.state
+        banner = self.banner_state()
+        if state.version == self.version and banner == self.banner and input_text == self.input:
+            return []  # trạng thái chưa đổi: khỏi so từng ô
+        rects = []
+        first = self.cells is None
+        changed = state.version != self.version
+        self.version = state.version
+        dirty = self.changed_cells() if changed else set()
+        status_changed = state.status != self.status
+        self.status = state.status
+        banner_changed = banner != self.banner
+        self.banner = banner
+
+        if dirty is None or banner_changed or (banner is not None and (dirty or status_changed)):
+            rects.append(self.draw_board_area())
+        else:
+            rects.extend(self.draw_cell(r, c) for r, c in dirty)
+            if status_changed:
+                rects.append(self.draw_status())
+
+        if first:
+            rect = pygame.Rect(BOARD_WIDTH, 0, CHAT_WIDTH, SCREEN_HEIGHT)
+            self.screen.blit(self.background, rect, rect)
+            rects.append(rect)
+        lines = state.chat.view() if changed else self.chat
+        if lines != self.chat:
+            self.chat = lines
+            rects.append(self.draw_chat())
+        if input_text != self.input:
+            self.input = input_text
+            rects.append(self.draw_input())
+
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+def notify():
+    """Luồng mạng vừa đổi trạng thái: đánh thức vòng lặp chính nếu nó đang ngủ chờ sự kiện."""
+    try:
+        pygame.event.post(pygame.event.Event(NETWORK_EVENT))
+    except pygame.error:
+        pass  # cửa sổ đã đóng
+
+def next_events(idle):
+    """
+    Sự kiện cho khung này. Khung trước không vẽ gì (idle) thì ngủ tới sự kiện
+    tiếp theo (phím, chuột, luồng mạng) thay vì vẽ lại 60 lần/giây.
+    """
+    events = pygame.event.get()
+    if idle and not events:
+        events = [e for e in [pygame.event.wait(IDLE_WAIT_MS)] + pygame.event.get()
+                  if e.type != pygame.NOEVENT]
+    return events
 
 def pixel_to_grid(pos):
     x, y = pos
@@ -160,72 +351,105 @@ def pixel_to_grid(pos):
     return (y - MARGIN) // CELL_SIZE, (x - MARGIN) // CELL_SIZE
 
 # --- Network Thread ---
-def network_thread():
-    global board, my_symbol, is_my_turn, game_over, status_message
-    global last_optimistic_move, last_player_move, chat_history
-    global game_over_time, rematch_sent
-
+def send_line(msg):
+    """Gửi một lệnh; đang mất kết nối thì bỏ qua (luồng mạng tự kết nối lại)."""
+    with send_lock:
+        if outbox is not None:
+            outbox.append(msg)  # chưa biết giao thức: gửi khi server trả lời HELLO
+            return
+        try:
+            sock.sendall(encode(msg))
+        except OSError:
+            pass
+
+def new_reader():
+    """Bộ đọc cho kết nối mới; dùng giao thức nhị phân thì giữ các lệnh gửi đi tới khi thương lượng xong."""
+    global outbox, encode
+    if not use_binary:
+        return LineReader()
+    with send_lock:
+        outbox = []
+        encode = wire.encode_line
+    return wire.FrameReader(mode=wire.WAITING)
+
+def negotiated(reader):
+    """Server đã trả lời HELLO: gửi các lệnh đang giữ theo giao thức đã chọn."""
+    global outbox, encode
+    with send_lock:
+        encode = wire.encoder(reader)
+        held, outbox = outbox, None
+        try:
+            for msg in held:
+                sock.sendall(encode(msg))
+        except OSError:
+            pass
+
+def network_thread(reader):
+    """Đọc lệnh của server và post() thành sự kiện; chỉ tự lo việc kết nối lại."""
+    global sock
+
+    session_token = None    # SESSION <token>: để quay lại ván khi mất kết nối
+    finished = False        # ván đã xong: mất kết nối thì không quay lại
+    resume_deadline = None  # đang kết nối lại: hạn chót (time.monotonic())
     try:
         while True:
-            data = sock.recv(1024).decode().strip()
-            if not data:
-                status_message = "Disconnected."
-                game_over = True
-                break
-
-            for line in data.split('\n'):
-                parts = line.split()
-                if not parts: continue
-                cmd = parts[0]
-
-                if cmd == "START":
-                    my_symbol = parts[1]
-                    status_message = f"You are '{my_symbol}'"
-                elif cmd == "YOUR":
-                    is_my_turn = True
-                    status_message = "Your move ⚡"
-                elif cmd == "OPPONENT":
-                    r, c = int(parts[1]), int(parts[2])
-                    board[r][c] = 'O' if my_symbol == 'X' else 'X'
-                    last_player_move = (r, c)
-                    status_message = "Opponent moved"
-                elif cmd == "INVALID":
-                    status_message = "Invalid move!"
-                    if last_optimistic_move:
-                        r, c = last_optimistic_move
-                        board[r][c] = '.'
-                        last_optimistic_move = None
-                    is_my_turn = True
-                elif cmd == "CHAT":
-                    chat_history.append("Opp: " + " ".join(parts[1:]))
-                elif cmd == "RESET":
-                    board[:] = [['.' for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-                    game_over = False
-                    rematch_sent = False
-                    status_message = "New Game Started!"
-                elif cmd in ("WIN", "LOSE", "DRAW", "OPPONENT_LEFT"):
-                    game_over = True
-                    game_over_time = pygame.time.get_ticks()
-                    status_message = {
-                        "WIN": "YOU WIN 🔥",
-                        "LOSE": "YOU LOSE ❌",
-                        "DRAW": "DRAW GAME",
-                        "OPPONENT_LEFT": "Opponent Left"
-                    }[cmd]
+            try:
+                line = reader.readline(sock)
+            except OSError:
+                line = None
+            if line is None or (resume_deadline and wire.text(line) == reconnect.UNKNOWN_SESSION):
+                if session_token is None or finished:
+                    state.post((DISCONNECTED,))
+                    break
+                # Mất kết nối giữa ván: server giữ chỗ một lúc, quay lại bằng token
+                if resume_deadline is None:
+                    resume_deadline = time.monotonic() + reconnect.RECONNECT_TIMEOUT
+                elif time.monotonic() < resume_deadline:
+                    time.sleep(reconnect.RECONNECT_DELAY)
+                state.post((LOST,))
+                sock.close()
+                new_sock = None
+                if time.monotonic() < resume_deadline:
+                    new_sock = reconnect.resume(*server_addr, session_token, resume_deadline, use_binary)
+                if new_sock is None:
+                    state.post((DISCONNECTED,))
+                    break
+                sock = new_sock
+                reader = new_reader()
+                continue
+            if outbox is not None and reader.mode != wire.WAITING:
+                negotiated(reader)
+
+            parts = wire.split(line)
+            if not parts: continue
+            cmd = parts[0]
+
+            if cmd == "SESSION":
+                session_token = parts[1]
+            elif cmd == "SYNC":
+                resume_deadline = None
+                finished = False
+            elif cmd == "RESET":
+                finished = False
+            elif cmd in RESULTS:
+                finished = True
+            state.post(tuple(parts))
     except:
-        game_over = True
-        status_message = "Connection error"
+        state.post((FAILED,))
 
 # --- Main Loop ---
 def main():
-    global sock, input_text, rematch_sent, last_player_move, is_my_turn
+    global sock, server_addr, input_text, use_binary, state
 
-    if len(sys.argv) != 3:
-        print("Usage: python client_gui.py <host> <port>")
+    if len(sys.argv) not in (3, 4, 5):
+        print("Usage: [CARO_NAME=<name>] [CARO_BINARY=1] python client_gui.py <host> <port> [size [win_length]]")
         return
 
     host = sys.argv[1]
     port = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        set_grid_size(int(sys.argv[3]))
+    state = ClientState(GRID_SIZE, wake=notify)
 
     pygame.init()
     font_game = pygame.font.SysFont("Consolas", 22, bold=True)
@@ -234,50 +458,85 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Cyber Caro Online")
 
+    server_addr = (host, port)
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.connect((host, port))
-    threading.Thread(target=network_thread, daemon=True).start()
+    sock.connect(server_addr)
+    handshake = []
+    name = os.environ.get("CARO_NAME")
+    if name:
+        # Chơi có tính hệ số Elo: được ghép với người gần hệ số (matchmaking.py)
+        handshake.append(f"NAME {name}")
+    if len(sys.argv) > 3:
+        # Chọn luật trước khi vào hàng đợi: chỉ ghép với người chọn cùng luật
+        handshake.append(f"SIZE {' '.join(sys.argv[3:])}")
+    use_binary = os.environ.get("CARO_BINARY") == "1"
+    if use_binary:
+        # Giao thức nhị phân (wire.py): server trả lời HELLO khi bắt tay xong
+        handshake.append(wire.HELLO)
+    if handshake:
+        sock.sendall(("\n".join(handshake + ["PLAY"]) + "\n").encode())
+    threading.Thread(target=network_thread, args=(new_reader(),), daemon=True).start()
 
     clock = pygame.time.Clock()
+    renderer = Renderer(screen, font_game, font_chat, state)
     running = True
+    idle = False
 
     while running:
-        for event in pygame.event.get():
+        events = next_events(idle)
+        # Cả lô lệnh server gửi từ khung trước: bàn cờ chỉ đổi ở đây, không đổi giữa lúc vẽ
+        state.apply_pending()
+        if state.size != GRID_SIZE:
+            # Server báo kích thước bàn khác (START): đổi bố cục
+            set_grid_size(state.size)
+            screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            renderer.resize(screen)
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
 
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN and input_text.strip():
-                    sock.sendall(f"CHAT {input_text}\n".encode())
-                    chat_history.append("Me: " + input_text)
+                    send_line(f"CHAT {input_text}")
+                    state.apply((SAID, input_text))
                     input_text = ""
                 elif event.key == pygame.K_BACKSPACE:
                     input_text = input_text[:-1]
+                elif event.key == pygame.K_F1:
+                    if state.my_turn and not state.game_over:
+                        send_line("HINT")
                 else:
                     if len(input_text) < 30:
                         input_text += event.unicode
 
+            if event.type == pygame.MOUSEWHEEL and pygame.mouse.get_pos()[0] > BOARD_WIDTH:
+                # Cuộn khung chat; lên quá các dòng đang có thì xin trang cũ hơn từ server (chat.py)
+                state.apply((SCROLL, event.y * SCROLL_LINES))
+                before = state.chat.next_request()
+                if before is not None:
+                    send_line(f"HISTORY {before} {chat.PAGE_LINES}")
+
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if game_over and not rematch_sent:
-                    bx = (BOARD_WIDTH - 180)//2
-                    by = (SCREEN_HEIGHT - INFO_HEIGHT)//2
-                    if bx < event.pos[0] < bx+180 and by < event.pos[1] < by+60:
-                        sock.sendall("REMATCH\n".encode())
-                        rematch_sent = True
-
-                elif not game_over and is_my_turn:
+                if state.game_over and not state.rematch_sent:
+                    if rematch_button().collidepoint(event.pos):
+                        send_line("REMATCH")
+                        state.apply((REMATCH_SENT,))
+
+                elif not state.game_over and state.my_turn:
                     pos = pixel_to_grid(event.pos)
                     if pos:
                         r, c = pos
-                        if board[r][c] == '.':
-                            board[r][c] = my_symbol
-                            last_player_move = (r, c)
-                            sock.sendall(f"MOVE {r} {c}\n".encode())
-                            is_my_turn = False
-                            status_message = "Opponent thinking..."
-
-        draw_game(screen, font_game, font_chat)
-        clock.tick(60)
+                        if state.board[r][c] == '.':
+                            state.apply((PLACE, r, c))
+                            send_line(f"MOVE {r} {c}")
+
+        idle = not renderer.draw() and not events
+        if not idle:
+            clock.tick(FPS)
 
     pygame.quit()
     sock.close()
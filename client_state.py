@@ -0,0 +1,218 @@
+# client_state.py
+"""
+Trạng thái một ván phía client, dùng chung cho client_gui.py và client.py.
+
+Luồng mạng không sửa trạng thái: mỗi lệnh của server được đưa vào hàng đợi
+dưới dạng một sự kiện bất biến (tuple các phần của lệnh, như wire.split()):
+
+    ("OPPONENT", "7", "8")    dòng chữ
+    ("OPPONENT", 7, 8)        khung nhị phân
+
+Luồng vẽ (hoặc vòng lặp duy nhất của client console) gọi apply_pending()
+mỗi khung để áp dụng cả lô sự kiện đang chờ, nên bàn cờ không bao giờ bị
+thay (RESET, SYNC, đổi cỡ bàn) giữa lúc đang vẽ. Hàng đợi là một deque:
+append() và popleft() nguyên tử trong CPython, không cần khóa.
+
+Thao tác của chính người chơi là các sự kiện cục bộ (PLACE, SAID, ...) áp
+dụng thẳng bằng apply() trên luồng vẽ.
+
+`version` tăng sau mỗi sự kiện áp dụng: nơi đọc trạng thái (vẽ, máy chơi,
+phát lại) so với version đã thấy lần trước để bỏ qua khi không có gì đổi.
+"""
+import time
+from collections import deque
+
+import reconnect
+from chat import ChatLog
+
+# Sự kiện cục bộ (chữ thường để không trùng lệnh của server)
+PLACE = "place"                # ("place", hàng, cột): vừa đi một nước, chờ server xác nhận
+SAID = "said"                  # ("said", chữ): dòng chat của mình
+REMATCH_SENT = "rematch_sent"  # đã gửi REMATCH
+SCROLL = "scroll"              # ("scroll", số dòng): cuộn khung chat (> 0: lên)
+LOST = "lost"                  # mất kết nối giữa ván, đang kết nối lại
+DISCONNECTED = "disconnected"  # không quay lại được ván
+FAILED = "failed"              # lỗi trên luồng mạng
+
+RESULTS = ("WIN", "LOSE", "DRAW", "OPPONENT_LEFT")
+
+# Dòng trạng thái theo sự kiện; client console dùng bộ chữ riêng (client.py)
+TEXTS = {
+    "connecting": "Connecting to server...",
+    "START": "You are '{sym}'",
+    "rules": " - {k} in a row",
+    "SYNC": "Reconnected - you are '{sym}'",
+    "YOUR": "Your move ⚡ (F1: hint)",
+    "HINT": "Hint: {x} {y}",
+    "OPPONENT": "Opponent moved",
+    "INVALID": "Invalid move!",
+    "RESET": "New Game Started!",
+    "WIN": "YOU WIN 🔥",
+    "LOSE": "YOU LOSE ❌",
+    "DRAW": "DRAW GAME",
+    "OPPONENT_LEFT": "Opponent Left",
+    PLACE: "Opponent thinking...",
+    LOST: "Connection lost, reconnecting...",
+    DISCONNECTED: "Disconnected.",
+    FAILED: "Connection error",
+}
+
+
+def empty_board(size):
+    return [['.' for _ in range(size)] for _ in range(size)]
+
+
+class ClientState:
+    """
+    board, size, win_length, my_symbol, my_turn, game_over, result (WIN/LOSE/
+    DRAW/OPPONENT_LEFT), finished_at (time.monotonic() lúc ván xong),
+    last_move, hint, pending (nước chưa được xác nhận: hàng, cột, giá trị cũ),
+    chat (chat.ChatLog), status, session, match_id, rematch_sent.
+
+    wake: gọi sau mỗi post() (luồng mạng) để đánh thức vòng lặp đang ngủ.
+    """
+
+    def __init__(self, size=15, texts=TEXTS, wake=None):
+        self.events = deque()
+        self.wake = wake
+        self.texts = texts
+        self.version = 0
+        self.size = size
+        self.win_length = None
+        self.board = empty_board(size)
+        self.my_symbol = None
+        self.my_turn = False
+        self.game_over = False
+        self.result = None
+        self.finished_at = 0.0
+        self.last_move = None
+        self.hint = None
+        self.pending = None
+        self.chat = ChatLog()
+        self.status = texts["connecting"]
+        self.session = None
+        self.match_id = None
+        self.rematch_sent = False
+
+    # --- Hàng đợi ---
+
+    def post(self, event):
+        """Luồng mạng: đưa một sự kiện vào hàng đợi."""
+        self.events.append(event)
+        if self.wake is not None:
+            self.wake()
+
+    def apply_pending(self):
+        """Áp dụng mọi sự kiện đang chờ; trả về số sự kiện đã áp dụng."""
+        events = self.events
+        n = 0
+        while events:
+            event = events.popleft()
+            try:
+                self.apply(event)
+            except (IndexError, ValueError):
+                pass  # lệnh sai dạng: bỏ qua như một dòng lạ
+            n += 1
+        return n
+
+    # --- Áp dụng một sự kiện ---
+
+    def say(self, key, **fields):
+        self.status = self.texts[key].format(**fields)
+
+    def opponent(self):
+        return 'O' if self.my_symbol == 'X' else 'X'
+
+    def apply(self, event):
+        cmd = event[0]
+
+        if cmd == "SESSION":
+            self.session = event[1]
+        elif cmd == "MATCH":
+            self.match_id = event[1]
+        elif cmd == "SYNC":
+            # Đã quay lại ván: bàn cờ lấy theo server, bỏ nước chưa được xác nhận
+            self.my_symbol, self.size, self.win_length, self.board = reconnect.parse_sync(event)
+            self.pending = None
+            self.hint = None
+            self.game_over = False
+            self.say("SYNC", sym=self.my_symbol)
+        elif cmd == "START":
+            # START <ký hiệu> [n k]
+            self.my_symbol = event[1]
+            status = self.texts["START"].format(sym=self.my_symbol)
+            if len(event) >= 4:
+                size, self.win_length = int(event[2]), int(event[3])
+                status += self.texts["rules"].format(size=size, k=self.win_length)
+                if size != self.size:
+                    self.size = size
+                    self.board = empty_board(size)
+            self.status = status
+        elif cmd == "YOUR":
+            self.my_turn = True
+            self.say("YOUR")
+        elif cmd == "HINT":
+            if self.my_turn:
+                self.hint = (int(event[1]), int(event[2]))
+                self.say("HINT", x=self.hint[0], y=self.hint[1])
+        elif cmd == "OPPONENT":
+            x, y = int(event[1]), int(event[2])
+            self.board[x][y] = self.opponent()
+            self.last_move = (x, y)
+            self.hint = None
+            self.say("OPPONENT", x=x, y=y)
+        elif cmd == "INVALID":
+            if self.pending:
+                x, y, previous = self.pending
+                self.board[x][y] = previous
+                self.pending = None
+            self.my_turn = True
+            self.say("INVALID", reason=" ".join(map(str, event[1:])))
+        elif cmd == "CHAT":
+            self.chat.add("Opp: " + " ".join(map(str, event[1:])))
+        elif cmd == "HISTORY":
+            # Một trang lịch sử chat (chat.py): HISTORY <seq> <X|O> <chữ>..., rồi HISTORY END <seq>
+            if event[1] == "END":
+                self.chat.page_end(int(event[2]))
+            else:
+                who = "Me: " if event[2] == self.my_symbol else "Opp: "
+                self.chat.page_line(who + " ".join(map(str, event[3:])))
+        elif cmd == "RESET":
+            self.board = empty_board(self.size)
+            self.game_over = False
+            self.result = None
+            self.rematch_sent = False
+            self.last_move = None
+            self.pending = None
+            self.hint = None
+            self.say("RESET")
+        elif cmd in RESULTS:
+            self.game_over = True
+            self.result = cmd
+            self.finished_at = time.monotonic()
+            self.my_turn = False
+            self.say(cmd)
+
+        elif cmd == PLACE:
+            x, y = event[1], event[2]
+            self.pending = (x, y, self.board[x][y])
+            self.board[x][y] = self.my_symbol
+            self.last_move = (x, y)
+            self.hint = None
+            self.my_turn = False
+            self.say(PLACE, x=x, y=y)
+        elif cmd == SAID:
+            self.chat.add("Me: " + event[1])
+        elif cmd == SCROLL:
+            self.chat.scroll_by(event[1])
+        elif cmd == REMATCH_SENT:
+            self.rematch_sent = True
+        elif cmd == LOST:
+            self.my_turn = False
+            self.say(LOST)
+        elif cmd in (DISCONNECTED, FAILED):
+            self.game_over = True
+            self.say(cmd)
+        else:
+            return
+        self.version += 1
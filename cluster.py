@@ -0,0 +1,443 @@
+# cluster.py
+"""
+Chế độ nhiều tiến trình: một tiến trình giám sát fork N worker cùng lắng nghe
+một cổng (SO_REUSEPORT), mỗi worker tự chạy các trận của mình.
+
+Hàng đợi ghép cặp nằm ở tiến trình giám sát (broker). Worker nhận kết nối rồi
+chuyển file descriptor của socket sang broker qua Unix socket (SCM_RIGHTS);
+mỗi lượt ghép (matchmaking.py), broker gửi cả hai fd của một cặp cho một
+worker để worker đó chạy trận. Nhờ vậy hai người chơi rơi vào hai worker khác
+nhau vẫn được ghép với nhau. Bảng hệ số cũng nằm ở broker: trước mỗi trận
+broker gửi kèm hệ số của hai người, worker chấm điểm rồi gửi hệ số mới về.
+Người chơi quay lại ván đang chờ (RESUME) cũng được broker ghép theo cùng
+cách, theo token thay vì theo luật chơi. Mã trận có số thứ tự worker phía
+trước ('<worker>.<số>'), nên khán giả (WATCH) vào nhầm worker được broker
+chuyển fd sang đúng worker đang chạy trận. Ván có người mất kết nối được worker
+gửi cho broker dưới dạng ảnh chụp gọn cùng fd của người còn lại, nên người
+quay lại vào worker nào cũng được. Mỗi fd người chơi đi kèm một cờ cho biết
+kết nối đã thương lượng giao thức nhị phân (HELLO, wire.py) hay chưa.
+"""
+import asyncio
+import os
+import selectors
+import signal
+import socket
+import struct
+import threading
+import time
+
+import journal
+import lobby
+import matchmaking
+import metrics
+import outbox
+import sessions
+import server
+import server_async
+import spectators
+import wire
+
+MSG_QUEUE = b"Q"  # worker -> broker: 1 fd người chơi mới
+MSG_MATCH = b"M"  # broker -> worker: 2 fd của một trận
+MSG_BOT = b"B"    # broker -> worker: 1 fd, người chơi này đấu với máy
+MSG_RESUME = b"R"  # worker -> broker: 1 fd + token; broker -> worker: 2 fd (X, O) + ván
+MSG_SUSPEND = b"S"  # worker -> broker: 1 fd người còn lại + ván đang chờ người mất kết nối
+MSG_END = b"E"    # broker -> worker: mã ván không ai quay lại kịp (ghi kết quả bỏ dở)
+MSG_RELEASE = b"L"  # broker -> worker đã gửi ván: mã ván tiếp tục ở worker khác (bỏ khỏi nhật ký)
+MSG_RATING = b"T"  # cả hai chiều: hệ số hiện tại của một người chơi
+MSG_WATCH = b"W"  # worker -> broker -> worker giữ trận: 1 fd khán giả + mã trận
+
+STATE = struct.Struct("<QBBcB")  # mã ván, kích thước bàn, số quân thắng, ký hiệu, cờ nhị phân; theo sau là các ô
+MAX_MSG = STATE.size + 1 + 99 * 99
+
+
+# --- Trao đổi fd qua Unix socket ---
+
+def pack_flags(flags):
+    """Cờ nhị phân của từng người chơi -> một số (bit i: người thứ i)."""
+    return sum(1 << i for i, binary in enumerate(flags) if binary)
+
+def unpack_flags(mask, count):
+    return [bool(mask >> i & 1) for i in range(count)]
+
+def pack_settings(kind, settings, names=(), binary=()):
+    fields = ["%d %d %d" % (*settings, pack_flags(binary))] + [name or "-" for name in names]
+    return kind + " ".join(fields).encode()
+
+def unpack_settings(msg):
+    """-> ((kích thước bàn, số quân thắng), [tên người chơi hoặc None], [cờ nhị phân])."""
+    fields = msg[1:].decode().split()
+    names = [None if name == "-" else name for name in fields[3:]]
+    return (int(fields[0]), int(fields[1])), names, unpack_flags(int(fields[2]), len(names))
+
+def send_player(broker, fd, hs):
+    if hs.resume is not None:
+        socket.send_fds(broker, [MSG_RESUME + b"%d" % hs.binary + hs.resume.encode()], [fd])
+    elif hs.watch is not None:
+        socket.send_fds(broker, [MSG_WATCH + hs.watch.encode()], [fd])
+    else:
+        socket.send_fds(broker, [pack_settings(MSG_QUEUE, hs.settings, [hs.name], [hs.binary])], [fd])
+
+def send_rating(ch, name):
+    rating = matchmaking.ratings.get(name)
+    try:
+        ch.send(MSG_RATING + b"%s %r %d" % (name.encode(), rating.value, rating.games))
+    except OSError:
+        pass
+
+def apply_rating(msg):
+    name, value, games = msg[1:].split()
+    matchmaking.ratings.set(name.decode(), matchmaking.Rating(float(value), int(games)))
+
+def pack_state(kind, game, sym=b"-", binary=()):
+    return kind + STATE.pack(game.id, game.size, game.win_length, sym, pack_flags(binary)) + game.cells
+
+def unpack_state(msg):
+    """-> (ván, ký hiệu, số cờ nhị phân)."""
+    game_id, size, win_length, sym, mask = STATE.unpack_from(msg, 1)
+    return sessions.GameState(game_id, size, win_length, msg[1 + STATE.size:]), sym.decode(), mask
+
+def suspend_player(broker, game, sym, fd, binary):
+    """Ván có người mất kết nối: gửi ảnh chụp ván và fd của người còn lại (ký hiệu sym) cho broker."""
+    try:
+        socket.send_fds(broker, [pack_state(MSG_SUSPEND, game, sym.encode(), [binary])], [fd])
+    except OSError:
+        pass
+
+def recv_match(broker, watch):
+    """
+    Nhận một trận từ broker: ([sock1, sock2] hoặc [sock] nếu đấu với máy, luật,
+    ván đang chờ hoặc None, tên hai người chơi, bộ đọc của từng socket theo
+    giao thức đã thương lượng); trả về None khi broker đã tắt,
+    () nếu không có trận. Khán giả được giao cho watch(sock, mã trận).
+    """
+    msg, fds, _, _ = socket.recv_fds(broker, MAX_MSG, 2)
+    if not msg:
+        return None
+    if msg[:1] == MSG_WATCH:
+        watch(socket.socket(fileno=fds[0]), msg[1:].decode())
+        return ()
+    if msg[:1] == MSG_END:
+        j = journal.default_journal()
+        if j is not None:
+            j.end_game(int(msg[1:], 16), journal.ABANDONED)
+        return ()
+    if msg[:1] == MSG_RELEASE:
+        j = journal.default_journal()
+        if j is not None:
+            j.release(int(msg[1:], 16))
+        return ()
+    if msg[:1] == MSG_RATING:
+        apply_rating(msg)
+        return ()
+    socks = [socket.socket(fileno=fd) for fd in fds]
+    if msg[:1] == MSG_RESUME:
+        game, _, mask = unpack_state(msg)
+        readers = [wire.reader(b) for b in unpack_flags(mask, 2)]
+        return socks, (game.size, game.win_length), game, (None, None), readers
+    settings, names, binary = unpack_settings(msg)
+    readers = [wire.reader(b) for b in binary]
+    return socks, settings, None, names + [None] * (2 - len(names)), readers
+
+def _reply(fd, msg, binary=False):
+    """Gửi thẳng một thông điệp trên fd người chơi đang nằm ở broker (fd vẫn mở)."""
+    sock = socket.socket(fileno=fd)
+    try:
+        sock.sendall(wire.encode(msg) if binary else wire.encode_line(msg))
+    except OSError:
+        pass
+    sock.detach()
+
+def _reject(fd, msg, binary=False):
+    """Trả lời rồi đóng fd người chơi đang nằm ở broker."""
+    _reply(fd, msg, binary)
+    os.close(fd)
+
+
+# --- Broker (chạy trong tiến trình giám sát) ---
+
+def run_broker(channels, bot_wait=0):
+    """
+    Ghép cặp theo lô (matchmaking.Queue) giữa các worker; gửi trận cho worker
+    của người đến sau. Người chờ quá bot_wait giây được trả về worker của họ
+    để đấu với máy.
+    """
+    sel = selectors.DefaultSelector()
+    for ch in channels:
+        sel.register(ch, selectors.EVENT_READ)
+    waiting = {}  # (kích thước bàn, số quân thắng) -> matchmaking.Queue các (kênh, fd)
+    # fd người đang chờ: worker đã trao fd cho broker nên chính broker nhận ra ai bỏ đi
+    queued = selectors.DefaultSelector()
+    metrics.watch_queues(waiting)
+    next_tick = time.monotonic()
+
+    while sel.get_map():
+        for game, players in sessions.registry.expired():
+            for owner, fd, binary in players:
+                _reject(fd, "OPPONENT_LEFT", binary)
+                try:
+                    owner.send(MSG_END + b"%x" % game.id)
+                except OSError:
+                    pass
+
+        now = time.monotonic()
+        if now >= next_tick:
+            next_tick = now + matchmaking.TICK
+            for entry in server.drop_departed(queued):
+                os.close(entry.player[1])
+            for settings, queue in waiting.items():
+                for a, b in queue.pair(now):
+                    (_, fd1, _), (owner, fd2, _) = a.player, b.player
+                    queued.unregister(fd1)
+                    queued.unregister(fd2)
+                    send_match(owner, MSG_MATCH, settings, [a, b])
+                    os.close(fd1)
+                    os.close(fd2)
+                if bot_wait > 0:
+                    for entry in queue.expired(bot_wait, now):
+                        owner, fd, _ = entry.player
+                        queued.unregister(fd)
+                        send_match(owner, MSG_BOT, settings, [entry])
+                        os.close(fd)
+
+        if any(waiting.values()):
+            timeout = max(0.0, next_tick - time.monotonic())
+        elif len(sessions.registry):
+            timeout = server.BOT_POLL
+        else:
+            timeout = None
+        for key, _ in sel.select(timeout):
+            ch = key.fileobj
+            try:
+                msg, fds, _, _ = socket.recv_fds(ch, MAX_MSG, 1)
+            except OSError:
+                msg, fds = b"", []
+            if not msg:
+                # Worker đã chết: bỏ kênh, người chơi đang chờ của nó vẫn giữ nguyên.
+                sel.unregister(ch)
+                ch.close()
+                continue
+            if msg[:1] == MSG_RATING:
+                apply_rating(msg)
+                continue
+            if msg[:1] == MSG_WATCH:
+                index = spectators.owner(msg[1:].decode())
+                if index is None or index >= len(channels):
+                    _reject(fds[0], "INVALID Unknown match")
+                    continue
+                try:
+                    socket.send_fds(channels[index], [msg], fds)
+                except OSError:
+                    _reject(fds[0], "INVALID Unknown match")  # worker giữ trận đã chết
+                    continue
+                os.close(fds[0])
+                continue
+            if msg[:1] == MSG_SUSPEND:
+                game, sym, mask = unpack_state(msg)
+                binary = bool(mask)
+                sessions.registry.suspend(game, {sym: (ch, fds[0], binary)})
+                _reply(fds[0], sessions.registry.notice, binary)
+                continue
+            if msg[:1] == MSG_RESUME:
+                binary = msg[1:2] == b"1"
+                try:
+                    paired = sessions.registry.join(msg[2:].decode(), (ch, fds[0], binary))
+                except KeyError:
+                    _reject(fds[0], "INVALID Unknown session", binary)
+                    continue
+                if paired is not None:
+                    game, (owner_x, fd_x, bin_x), (owner, fd_o, bin_o) = paired
+                    try:
+                        socket.send_fds(owner, [pack_state(MSG_RESUME, game, binary=[bin_x, bin_o])],
+                                        [fd_x, fd_o])
+                        # Ván sang worker khác: worker cũ thôi giữ nó trong ảnh chụp nhật ký,
+                        # kẻo khôi phục sau sự cố dựng lại thế cờ cũ của một ván đã xong
+                        if owner_x is not owner:
+                            owner_x.send(MSG_RELEASE + b"%x" % game.id)
+                    except OSError:
+                        pass
+                    os.close(fd_x)
+                    os.close(fd_o)
+                continue
+            settings, (name,), (binary,) = unpack_settings(msg)
+            queue = waiting.setdefault(settings, matchmaking.Queue())
+            entry = queue.add((ch, fds[0], binary), matchmaking.ratings.get(name).value, name)
+            queued.register(fds[0], selectors.EVENT_READ, (queue, entry))
+
+def send_match(owner, kind, settings, entries):
+    """Gửi fd của những người vừa được ghép cho worker `owner`, kèm hệ số hiện tại của họ."""
+    names = [e.name for e in entries]
+    for name in names:
+        if name:
+            send_rating(owner, name)
+    try:
+        socket.send_fds(owner, [pack_settings(kind, settings, names, [e.player[2] for e in entries])],
+                        [e.player[1] for e in entries])
+    except OSError:
+        pass
+
+
+# --- Worker ---
+
+def make_listener(host, port):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    s.bind((host, port))
+    s.listen(128)
+    return s
+
+def thread_worker(listener, broker, bot_level):
+    def suspend(game, players):
+        (sym, (conn, _, reader)), = players.items()
+        suspend_player(broker, game, sym, conn.fileno(), wire.is_binary(reader))
+        conn.close()
+
+    def receive_matches():
+        while True:
+            received = recv_match(broker, server.watch_match)
+            if received is None:
+                report_sent()
+                journal.shutdown()
+                os._exit(0)
+            if not received:
+                continue
+            socks, settings, game, names, readers = received
+            players = [(c, c.getpeername(), r) for c, r in zip(socks, readers)]
+            if len(players) == 1:
+                players.append(server.bot_player(bot_level))
+            threading.Thread(target=server.handle_match,
+                             args=(*players, settings, game, suspend, names), daemon=True).start()
+
+    def client_thread(conn, addr):
+        print(f"[+] Connected {addr} (worker {os.getpid()})")
+        result = server.handshake(conn)
+        if result is not None:
+            hs = result[1]
+            if hs.watch is not None and spectators.hub.get(hs.watch) is not None:
+                server.watch_match(conn, hs.watch)  # trận nằm ngay ở worker này
+                return
+            send_player(broker, conn.fileno(), hs)
+        conn.close()
+
+    threading.Thread(target=receive_matches, daemon=True).start()
+    while True:
+        conn, addr = listener.accept()
+        threading.Thread(target=client_thread, args=(server.accepted(conn), addr), daemon=True).start()
+
+async def async_worker(listener, broker, bot_level):
+    loop = asyncio.get_running_loop()
+
+    def suspend(game, players):
+        (sym, (_, writer, lines)), = players.items()
+        suspend_player(broker, game, sym, writer.get_extra_info("socket").fileno(),
+                       wire.is_binary(lines))
+        writer.close()
+
+    async def client_connected(reader, writer):
+        print(f"[+] Connected {writer.get_extra_info('peername')} (worker {os.getpid()})")
+        result = await server_async.handshake(reader, writer)
+        if result is not None and result[1].watch is not None and \
+                spectators.hub.get(result[1].watch) is not None:
+            await server_async.watch_match(reader, writer, result[1].watch)  # trận nằm ngay ở worker này
+            return
+        if result is not None:
+            # Tách socket khỏi transport: gửi bản sao fd cho broker rồi đóng transport
+            fd = os.dup(writer.get_extra_info("socket").fileno())
+            send_player(broker, fd, result[1])
+            os.close(fd)
+        writer.close()
+
+    async def start_match(socks, settings, game, names, readers):
+        players = [(*await asyncio.open_connection(sock=c), r) for c, r in zip(socks, readers)]
+        if len(players) == 1:
+            players.append(await server_async.bot_player(bot_level))
+        await server_async.handle_match(*players, settings, game, suspend, names)
+
+    async def watch(sock, match_id):
+        reader, writer = await asyncio.open_connection(sock=sock)
+        await server_async.watch_match(reader, writer, match_id)
+
+    def start_watch(sock, match_id):
+        task = loop.create_task(watch(sock, match_id))
+        server_async.matches.add(task)
+        task.add_done_callback(server_async.matches.discard)
+
+    def on_broker():
+        received = recv_match(broker, start_watch)
+        if received is None:
+            report_sent()
+            journal.shutdown()
+            os._exit(0)
+        if not received:
+            return
+        task = loop.create_task(start_match(*received))
+        server_async.matches.add(task)
+        task.add_done_callback(server_async.matches.discard)
+
+    loop.add_reader(broker.fileno(), on_broker)
+    srv = await asyncio.start_server(client_connected, sock=listener)
+    async with srv:
+        await server_async.until_terminated()
+
+def report_sent():
+    """Bộ đếm gửi đi (outbox.stats) của worker, in ra lúc worker dừng."""
+    print(f"[worker {os.getpid()}] Sent: {outbox.stats}", flush=True)
+
+
+def run_worker(index, host, port, broker, mode, bot_level):
+    listener = make_listener(host, port)
+    spectators.hub.prefix = "%d." % index
+    metrics.serve(1 + index)
+
+    def report(name_x, name_o, score_x):
+        # Broker giữ bảng hệ số chung: gửi hệ số mới của hai người sau mỗi ván
+        send_rating(broker, name_x)
+        send_rating(broker, name_o)
+    matchmaking.ratings.on_record = report
+    # Giám sát tắt worker bằng SIGTERM: thoát bình thường để kịp ghi nốt nhật ký
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        if mode == "async":
+            asyncio.run(async_worker(listener, broker, bot_level))
+        else:
+            thread_worker(listener, broker, bot_level)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)  # giám sát có thể gửi SIGTERM lần nữa
+        report_sent()
+        journal.shutdown()
+
+
+# --- Tiến trình giám sát ---
+
+def run(host, port, workers, mode="thread", bot_wait=0, bot_level=None):
+    print(f"Starting {workers} {mode} workers on {host}:{port}")
+    # Sảnh (lobby.py) nằm trong bộ nhớ của từng tiến trình: chưa dùng chung giữa các worker
+    lobby.configure(False)
+    channels = []
+    pids = []
+    for index in range(workers):
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            for ch in channels:
+                ch.close()
+            parent_end.close()
+            run_worker(index, host, port, child_end, mode, bot_level)
+            os._exit(0)
+        child_end.close()
+        channels.append(parent_end)
+        pids.append(pid)
+
+    metrics.serve()  # sau khi fork: worker không thừa hưởng cổng này
+    try:
+        run_broker(channels, bot_wait)
+    except KeyboardInterrupt:
+        print("Shutting down server.")
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,60 @@
+# framing.py
+"""
+Tách luồng byte TCP thành từng dòng lệnh hoàn chỉnh.
+
+TCP không giữ ranh giới thông điệp: một lần recv() có thể chứa nửa lệnh, hoặc
+nhiều lệnh dính liền. LineReader giữ một bytearray dùng lại giữa các lần đọc,
+chỉ trả ra những dòng đã kết thúc bằng '\\n' và giữ phần còn dở cho lần sau.
+Server và cả hai client dùng chung lớp này.
+"""
+from collections import deque
+
+MAX_LINE = 4096  # dòng dài hơn mà chưa thấy '\n' thì coi là vi phạm giao thức
+RECV_SIZE = 4096
+
+
+class LineReader:
+    __slots__ = ("buf", "lines", "max_line")
+
+    def __init__(self, max_line=MAX_LINE):
+        self.buf = bytearray()
+        self.lines = deque()
+        self.max_line = max_line
+
+    def feed(self, data):
+        """Nạp thêm dữ liệu vừa nhận; trả về số dòng hoàn chỉnh đang chờ."""
+        buf = self.buf
+        buf += data
+        end = buf.rfind(b"\n")
+        if end < 0:
+            if len(buf) > self.max_line:
+                del buf[:]
+                raise ValueError("line too long")
+            return len(self.lines)
+
+        # Cắt cả loạt dòng đã hoàn chỉnh trong một lần, phần dở dang ở lại buf.
+        chunk = buf[:end].decode(errors="replace")
+        del buf[:end + 1]
+        for line in chunk.split("\n"):
+            self.lines.append(line.rstrip("\r"))
+        return len(self.lines)
+
+    def readline(self, sock, bufsize=RECV_SIZE):
+        """Đọc một dòng từ socket (chặn); None khi kết nối đã đóng."""
+        lines = self.lines
+        while not lines:
+            data = sock.recv(bufsize)
+            if not data:
+                return None
+            self.feed(data)
+        return lines.popleft()
+
+    async def areadline(self, reader, bufsize=RECV_SIZE):
+        """Như readline() nhưng cho asyncio.StreamReader."""
+        lines = self.lines
+        while not lines:
+            data = await reader.read(bufsize)
+            if not data:
+                return None
+            self.feed(data)
+        return lines.popleft()
@@ -1,8 +1,94 @@
 # game_logic.py
+from array import array
 
-def Board(size=15):
-    """Tạo bàn cờ rỗng kích thước size x size."""
-    return [['.' for _ in range(size)] for _ in range(size)]
+EMPTY = ord('.')
+
+DEFAULT_SIZE = 15
+WIN_LENGTH = 5
+MIN_SIZE = 5
+MAX_SIZE = 99  # toạ độ tối đa 2 chữ số; đủ cho các biến thể "bàn vô hạn"
+
+_EMPTY_CELLS = {}
+
+
+class Board:
+    """
+    Bàn cờ size x size lưu trong một bytearray duy nhất, mỗi ô một byte
+    ('.', 'X' hoặc 'O'), ô (x, y) nằm ở vị trí x * size + y.
+    """
+    __slots__ = ("size", "cells")
+
+    def __init__(self, size=15):
+        self.size = size
+        self.cells = bytearray(self._empty(size))
+
+    @staticmethod
+    def _empty(size):
+        cells = _EMPTY_CELLS.get(size)
+        if cells is None:
+            cells = _EMPTY_CELLS[size] = b'.' * (size * size)
+        return cells
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, x):
+        """Một hàng dạng chuỗi, để board[x][y] vẫn đọc được như trước."""
+        size = self.size
+        if not 0 <= x < size:
+            raise IndexError(x)
+        return self.cells[x * size:(x + 1) * size].decode()
+
+    def __iter__(self):
+        for x in range(self.size):
+            yield self[x]
+
+    def get(self, x, y):
+        return chr(self.cells[x * self.size + y])
+
+    def reset(self):
+        """Xóa bàn cờ tại chỗ, không cấp phát lại."""
+        self.cells[:] = self._empty(self.size)
+
+    def snapshot(self):
+        """
+        memoryview chỉ đọc của các ô: giao trạng thái cho nơi khác (khán giả) mà
+        không sao chép thêm, và nơi nhận không sửa được bàn của trận.
+        """
+        return memoryview(self.cells).toreadonly()
+
+    @classmethod
+    def from_bytes(cls, size, data):
+        board = cls.__new__(cls)
+        board.size = size
+        board.cells = bytearray(data)
+        return board
+
+    def pack(self):
+        """Mã hóa gọn 2 bit mỗi ô (0 trống, 1 X, 2 O), 4 ô mỗi byte: bàn 15x15 còn 57 byte."""
+        out = bytearray((len(self.cells) + 3) // 4)
+        for i, v in enumerate(self.cells):
+            if v != EMPTY:
+                out[i >> 2] |= _PACK_CODES[v] << (2 * (i & 3))
+        return bytes(out)
+
+    @classmethod
+    def unpack(cls, size, data):
+        """Ngược lại với pack()."""
+        board = cls(size)
+        cells = board.cells
+        for i in range(size * size):
+            code = (data[i >> 2] >> (2 * (i & 3))) & 3
+            if code:
+                cells[i] = _PACK_SYMBOLS[code]
+        return board
+
+_PACK_CODES = {ord('X'): 1, ord('O'): 2}
+_PACK_SYMBOLS = {1: ord('X'), 2: ord('O')}
+
+def valid_settings(size, win_length):
+    """Kích thước bàn và số quân để thắng có chơi được không."""
+    return MIN_SIZE <= size <= MAX_SIZE and 3 <= win_length <= size
 
 def in_bounds(size, x, y):
     """Kiểm tra tọa độ (x, y) có nằm trong bàn cờ không."""
@@ -10,21 +96,24 @@ def in_bounds(size, x, y):
 
 def apply_move(board, x, y, symbol):
     """Cập nhật nước đi vào bàn cờ nếu hợp lệ."""
-    size = len(board)
+    size = board.size
     if not in_bounds(size, x, y):
         return False, "Out of bounds"
-    if board[x][y] != '.':
+    i = x * size + y
+    if board.cells[i] != EMPTY:
         return False, "Cell occupied"
-    board[x][y] = symbol
+    board.cells[i] = ord(symbol)
     return True, None
 
-def check_win(board, x, y):
+def check_win(board, x, y, win_length=WIN_LENGTH):
     """
-    Kiểm tra điều kiện thắng: Đủ 5 quân liên tiếp và không bị chặn 2 đầu.
+    Kiểm tra điều kiện thắng: Đủ win_length (mặc định 5) quân liên tiếp
+    và không bị chặn 2 đầu.
     """
-    size = len(board)
-    sym = board[x][y]
-    if sym == '.':
+    size = board.size
+    cells = board.cells
+    sym = cells[x * size + y]
+    if sym == EMPTY:
         return False
     
     # 4 hướng: Ngang, Dọc, Chéo Chính, Chéo Phụ
@@ -34,36 +123,36 @@ def check_win(board, x, y):
         # Kiểm tra hướng dương
         count_pos = 0
         cx, cy = x + dx, y + dy
-        while in_bounds(size, cx, cy) and board[cx][cy] == sym:
+        while in_bounds(size, cx, cy) and cells[cx * size + cy] == sym:
             count_pos += 1
             cx += dx
             cy += dy
         
         blocked_pos = False
         if in_bounds(size, cx, cy):
-            cell_val = board[cx][cy]
-            if cell_val != '.' and cell_val != sym:
+            cell_val = cells[cx * size + cy]
+            if cell_val != EMPTY and cell_val != sym:
                 blocked_pos = True
 
         # Kiểm tra hướng âm
         count_neg = 0
         cx, cy = x - dx, y - dy
-        while in_bounds(size, cx, cy) and board[cx][cy] == sym:
+        while in_bounds(size, cx, cy) and cells[cx * size + cy] == sym:
             count_neg += 1
             cx -= dx
             cy -= dy
         
         blocked_neg = False
         if in_bounds(size, cx, cy):
-            cell_val = board[cx][cy]
-            if cell_val != '.' and cell_val != sym:
+            cell_val = cells[cx * size + cy]
+            if cell_val != EMPTY and cell_val != sym:
                 blocked_neg = True
 
         # Tổng số quân
         total = 1 + count_pos + count_neg
         
-        # Điều kiện thắng: >= 5 quân và không bị chặn cả 2 đầu
-        if total >= 5:
+        # Điều kiện thắng: >= win_length quân và không bị chặn cả 2 đầu
+        if total >= win_length:
             if not (blocked_pos and blocked_neg):
                 return True
                 
@@ -71,10 +160,7 @@ def check_win(board, x, y):
 
 def is_full(board):
     """Kiểm tra xem bàn cờ đã đầy chưa (Hòa)."""
-    for row in board:
-        if '.' in row:
-            return False
-    return True
+    return EMPTY not in board.cells
 
 def board_to_string(board):
     """Chuyển trạng thái bàn cờ thành chuỗi (để debug)."""
@@ -82,4 +168,124 @@ def board_to_string(board):
     lines = ["   " + " ".join([f"{i:2}" for i in range(size)])]
     for i, row in enumerate(board):
         lines.append(f"{i:2} " + " ".join(row))
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+_LINE_TABLES = {}
+
+def _line_table(size):
+    """
+    Với mỗi ô (x, y): 4 cặp (chỉ số đường, vị trí bit) cho hàng, cột, chéo chính
+    và chéo phụ đi qua ô đó. Các đường được đánh số liên tiếp trong một list.
+    """
+    table = _LINE_TABLES.get(size)
+    if table is None:
+        cols = size
+        diags = 2 * size
+        antis = 2 * size + 2 * size - 1
+        table = [((x, y), (cols + y, x), (diags + x - y + size - 1, x), (antis + x + y, x))
+                 for x in range(size) for y in range(size)]
+        _LINE_TABLES[size] = table
+    return table
+
+
+# Kiểu phần tử nhỏ nhất chứa được mặt nạ một đường (size bit); bàn lớn hơn 64 dùng list số nguyên
+_MASK_TYPES = ((16, 'H'), (32, 'I'), (64, 'Q'))
+_EMPTY_MASKS = {}
+
+def _empty_masks(size):
+    """Mặt nạ rỗng cho cả hai người chơi (dùng chung, sao chép khi tạo BitBoard)."""
+    masks = _EMPTY_MASKS.get(size)
+    if masks is None:
+        n = 2 * (2 * size + 2 * (2 * size - 1))
+        code = next((code for bits, code in _MASK_TYPES if size <= bits), None)
+        masks = _EMPTY_MASKS[size] = array(code, [0]) * n if code else [0] * n
+    return masks
+
+
+class BitBoard:
+    """
+    Bàn cờ dạng bitboard: mỗi người chơi có một mặt nạ cho từng hàng, cột,
+    đường chéo chính và chéo phụ; bit thứ i là ô thứ i trên đường đó.
+
+    Mặt nạ của cả hai người nằm liền trong một array (X trước, O sau), mỗi
+    phần tử vừa đủ số bit của một đường (16 bit với bàn 15x15), nên mỗi
+    BitBoard chỉ tốn vài trăm byte và không tạo số nguyên Python nào.
+
+    Kiểm tra thắng chỉ cần vài phép toán bit trên 4 đường đi qua nước vừa đánh,
+    kiểm tra hòa dựa trên bộ đếm nước đi. Kết quả giống hệt check_win/is_full.
+    """
+    __slots__ = ("size", "win_length", "moves", "lines", "masks", "table")
+
+    def __init__(self, size=15, win_length=WIN_LENGTH):
+        self.size = size
+        self.win_length = win_length
+        self.moves = 0
+        self.table = _line_table(size)
+        self.lines = 2 * size + 2 * (2 * size - 1)  # mặt nạ của O bắt đầu từ đây
+        self.masks = _empty_masks(size)[:]
+
+    def reset(self):
+        """Xóa bàn cờ tại chỗ, không cấp phát lại."""
+        self.masks[:] = _empty_masks(self.size)
+        self.moves = 0
+
+    def get(self, x, y):
+        masks = self.masks
+        if masks[x] >> y & 1:
+            return 'X'
+        if masks[self.lines + x] >> y & 1:
+            return 'O'
+        return '.'
+
+    def apply_move(self, x, y, symbol):
+        """Cập nhật nước đi vào bàn cờ nếu hợp lệ."""
+        if not in_bounds(self.size, x, y):
+            return False, "Out of bounds"
+        masks, lines = self.masks, self.lines
+        if (masks[x] | masks[lines + x]) >> y & 1:
+            return False, "Cell occupied"
+        own = 0 if symbol == 'X' else lines
+        for line, bit in self.table[x * self.size + y]:
+            masks[own + line] |= 1 << bit
+        self.moves += 1
+        return True, None
+
+    def remove(self, x, y):
+        """Gỡ quân ở (x, y) (để máy tìm nước đi thử rồi hoàn tác)."""
+        masks = self.masks
+        for own in (0, self.lines):
+            if masks[own + x] >> y & 1:
+                for line, bit in self.table[x * self.size + y]:
+                    masks[own + line] &= ~(1 << bit)
+                self.moves -= 1
+                return
+
+    def check_win(self, x, y):
+        """Đủ win_length quân liên tiếp qua (x, y) và không bị chặn 2 đầu."""
+        win_length = self.win_length
+        masks = self.masks
+        own, theirs = 0, self.lines
+        if not masks[x] >> y & 1:
+            if not masks[theirs + x] >> y & 1:
+                return False
+            own, theirs = theirs, own
+
+        for line, i in self.table[x * self.size + y]:
+            m = masks[own + line]
+            # Số quân liền nhau phía trên bit i: vị trí bit 0 thấp nhất của m >> (i + 1)
+            t = m >> (i + 1)
+            count_pos = (~t & (t + 1)).bit_length() - 1
+            # Phía dưới bit i: bit 0 cao nhất trong đoạn [0, i)
+            end_neg = (~m & ((1 << i) - 1)).bit_length() - 1
+
+            # Tổng số quân = 1 + count_pos + (i - 1 - end_neg)
+            if count_pos + i - end_neg >= win_length:
+                # Ô ngoài bàn cờ không có bit nào nên không tính là bị chặn
+                blocked = masks[theirs + line]
+                if not (blocked >> (i + 1 + count_pos) & 1 and end_neg >= 0 and blocked >> end_neg & 1):
+                    return True
+        return False
+
+    def is_full(self):
+        """Kiểm tra xem bàn cờ đã đầy chưa (Hòa)."""
+        return self.moves == self.size * self.size
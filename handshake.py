@@ -0,0 +1,140 @@
+# handshake.py
+"""
+Các lệnh (tùy chọn) client gửi ngay sau khi kết nối, trước khi vào hàng đợi:
+
+    SIZE <n> [k]   chơi trên bàn n x n, cần k quân liên tiếp để thắng
+    NAME <tên>     chơi có tính hệ số Elo, được ghép với người gần hệ số (matchmaking.py)
+    PLAY           vào hàng đợi ngay, không chờ thêm lệnh nào nữa
+    RESUME <token> quay lại ván đang dở khi mất kết nối hoặc server khởi động lại (sessions.py)
+    WATCH <mã>     xem trực tiếp một trận thay vì chơi (spectators.py)
+    HELLO BIN1     dùng giao thức nhị phân sau khi bắt tay (wire.py); server trả
+                   lời `HELLO BIN1` hoặc `HELLO TEXT` khi bắt tay xong
+    LIST, CREATE, JOIN, LEAVE
+                   sảnh chờ: mở phòng hoặc vào phòng của người khác (lobby.py)
+
+Client cũ không gửi gì: server chờ HANDSHAKE_TIMEOUT giây rồi cho vào hàng đợi
+với luật mặc định, nên giao thức cũ vẫn dùng được.
+"""
+import lobby
+import wire
+from game_logic import DEFAULT_SIZE, WIN_LENGTH, valid_settings
+from matchmaking import valid_name
+
+HANDSHAKE_TIMEOUT = 0.3
+LOBBY_COMMANDS = ("LIST", "CREATE", "JOIN", "LEAVE")
+
+
+class Handshake:
+    """
+    rooms: lobby.Lobby (None: không có sảnh). Chủ phòng (CREATE) chưa xong bắt
+    tay cho tới khi có người vào phòng: server chờ đồng thời dòng tiếp theo của
+    họ và người vào phòng (lobby.Lobby.watch) rồi gọi finish(). Người vào phòng
+    (JOIN) xong bắt tay ngay, server cho họ ngồi vào bằng Lobby.seat().
+    """
+
+    def __init__(self, rooms=None):
+        self.size = DEFAULT_SIZE
+        self.win_length = WIN_LENGTH
+        self.name = None
+        self.resume = None
+        self.watch = None
+        self.hello = None   # các phiên bản giao thức client đề nghị (HELLO)
+        self.binary = False  # đã đồng ý dùng khung nhị phân sau bắt tay
+        self.rooms = rooms
+        self.room = None     # phòng mình đã mở (CREATE), đang chờ người vào
+        self.joined = None   # phòng vừa vào (JOIN)
+        self.in_lobby = False  # đã dùng lệnh sảnh: không còn hạn HANDSHAKE_TIMEOUT
+        self.done = False
+
+    @property
+    def settings(self):
+        """Khóa hàng đợi: chỉ ghép hai người cùng kích thước bàn và luật thắng."""
+        return self.size, self.win_length
+
+    def handle(self, line):
+        """Xử lý một dòng; trả về câu trả lời cần gửi lại (hoặc None), có thể gồm nhiều dòng."""
+        parts = line.split()
+        if not parts:
+            return None
+        cmd = parts[0]
+
+        if cmd in LOBBY_COMMANDS:
+            return self.lobby_command(cmd, parts[1:])
+        if self.room is not None and cmd != "HELLO":
+            return "INVALID Waiting in room (LEAVE first)"
+
+        if cmd == "SIZE":
+            try:
+                size = int(parts[1])
+                win_length = int(parts[2]) if len(parts) > 2 else min(WIN_LENGTH, size)
+            except (IndexError, ValueError):
+                return "INVALID Bad SIZE"
+            if not valid_settings(size, win_length):
+                return "INVALID Unsupported board size"
+            self.size, self.win_length = size, win_length
+        elif cmd == "NAME":
+            if len(parts) != 2 or not valid_name(parts[1]):
+                return "INVALID Bad NAME"
+            self.name = parts[1]
+        elif cmd == "HELLO":
+            self.hello = parts[1:]
+        elif cmd == "RESUME" and len(parts) == 2:
+            self.resume = parts[1]
+            return self.finish()
+        elif cmd == "WATCH" and len(parts) == 2:
+            self.watch = parts[1]
+            return self.finish()
+        else:
+            # PLAY, hoặc một lệnh lạ gửi quá sớm: kết thúc bắt tay
+            return self.finish()
+        return None
+
+    def lobby_command(self, cmd, args):
+        """LIST, CREATE, JOIN, LEAVE (lobby.py)."""
+        rooms = self.rooms
+        if rooms is None:
+            return "INVALID Lobby not available"
+        self.in_lobby = True
+
+        if cmd == "LIST":
+            return "\n".join(rooms.list_lines(self.settings, args))
+        if cmd == "LEAVE":
+            if self.room is None or not rooms.leave(self.room):
+                return None  # không có phòng, hoặc đã có người vào: trận sắp bắt đầu
+            room, self.room = self.room, None
+            return "LEFT " + room.id
+        if self.room is not None:
+            return "INVALID Already in a room"
+
+        if cmd == "CREATE":
+            move_time = None
+            private = False
+            for arg in args:
+                if arg == "PRIVATE":
+                    private = True
+                    continue
+                try:
+                    move_time = int(arg)
+                except ValueError:
+                    return "INVALID Bad CREATE"
+                if not 0 <= move_time <= lobby.MAX_MOVE_TIME:
+                    return "INVALID Bad CREATE"
+            self.room = rooms.create(self.settings, move_time, private, self.name)
+            return self.room.line()
+
+        # JOIN [mã]
+        try:
+            room = rooms.join(args[0] if args else None, self.settings)
+        except KeyError:
+            return "INVALID Unknown room" if args else "INVALID No open room"
+        self.joined = room
+        self.size, self.win_length = room.settings
+        return self.finish()
+
+    def finish(self):
+        """Kết thúc bắt tay; trả lời HELLO nếu client đã hỏi (khán giả luôn nhận dạng chữ)."""
+        self.done = True
+        if self.hello is None:
+            return None
+        self.binary = wire.VERSION in self.hello and self.watch is None
+        return wire.HELLO if self.binary else wire.HELLO_TEXT
@@ -0,0 +1,409 @@
+# journal.py
+"""
+Nhật ký ván đấu: tệp nhị phân chỉ ghi nối thêm (append-only).
+
+Mỗi bản ghi dài cố định 12 byte (<QBBBB):
+
+    START  mã ván, kích thước bàn, số quân thắng, 0
+    MOVE   mã ván, x, y, ký hiệu (1 = X, 2 = O)
+    END    mã ván, kết quả (0 hòa, 1 X thắng, 2 O thắng, 3 bỏ dở,
+           4 X thắng do O hết giờ, 5 O thắng do X hết giờ), 0, 0
+    ADOPT  mã ván, kích thước bàn, số quân thắng, 0: ván nhận từ nơi khác
+           (khôi phục, hoặc worker khác của cluster), theo sau là các STONE
+    STONE  mã ván, x, y, ký hiệu: một quân đã có trên bàn lúc nhận ván
+
+Các trận chạy song song nên bản ghi của nhiều ván xen kẽ nhau; mã ván dùng để
+gom lại. Bản ghi được gom vào bộ đệm và một luồng nền ghi xuống đĩa + fsync
+mỗi FSYNC_INTERVAL giây (mất điện chỉ mất tối đa chừng đó), nên luồng trận
+hay event loop không bao giờ chờ đĩa. Tệp đầy SEGMENT_BYTES thì chuyển sang
+đoạn (segment) mới; mỗi tiến trình ghi đoạn riêng của mình.
+
+Mỗi SNAPSHOT_INTERVAL giây, Journal còn ghi một ảnh chụp (snapshot) các ván
+đang chơi dở cùng vị trí trong nhật ký lúc chụp; sau khi server chết, chỉ cần
+đọc ảnh chụp và phần nhật ký phía sau nó (xem recovery.py).
+
+Đọc lại theo kiểu luồng (generator), từng khối nhỏ, nên duyệt hàng triệu ván
+mà không phải nạp cả tệp:
+
+    python journal.py replay journal/      # kiểm tra lại kết quả bằng check_win và cả bàn (vector_eval)
+    python journal.py stats journal/
+"""
+import argparse
+import atexit
+import glob
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from game_logic import Board, apply_move, check_win, is_full
+from vector_eval import winners
+
+RECORD = struct.Struct("<QBBBB")
+START, MOVE, END, ADOPT, STONE = 1, 2, 3, 4, 5
+DRAW, X_WIN, O_WIN, ABANDONED = 0, 1, 2, 3
+X_WIN_TIME, O_WIN_TIME = 4, 5  # thắng vì đối thủ hết giờ: nước cuối không tạo thành hàng
+
+CODE = {'X': 1, 'O': 2}
+SYMBOL = {1: 'X', 2: 'O'}
+RESULT_NAMES = {DRAW: "draw", X_WIN: "X wins", O_WIN: "O wins", ABANDONED: "abandoned",
+                X_WIN_TIME: "X wins on time", O_WIN_TIME: "O wins on time"}
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+FSYNC_INTERVAL = 0.5
+SNAPSHOT_INTERVAL = 5.0
+READ_CHUNK = RECORD.size * 8192
+SUFFIX = ".jnl"
+SNAP_SUFFIX = ".snap"
+
+# Ảnh chụp: header, tên đoạn nhật ký, rồi từng ván (header ván + mỗi ô một byte 0/1/2)
+SNAP_MAGIC = b"CSN1"
+SNAP_HEADER = struct.Struct("<4sdQIH")  # magic, hết hạn (0 = không), vị trí trong đoạn, số ván, độ dài tên đoạn
+SNAP_GAME = struct.Struct("<QBB")       # mã ván, kích thước bàn, số quân thắng
+
+Game = namedtuple("Game", "id size win_length moves result")
+
+
+# --- Ghi ---
+
+class Journal:
+    """Ghi nhật ký vào thư mục `directory`; an toàn khi gọi từ nhiều luồng."""
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, fsync_interval=FSYNC_INTERVAL,
+                 snapshot_interval=SNAPSHOT_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        # Tên đoạn sắp xếp theo thời gian mở; pid để các worker không ghi chung tệp
+        self.prefix = writer_prefix()
+        self.snapshot_path = os.path.join(directory, self.prefix + SNAP_SUFFIX)
+        self.segment = 0
+        self.file = None
+        self.written = 0
+        self.buffer = bytearray()
+        self.live = {}  # mã ván -> (kích thước, số quân thắng, bytearray ô 0/1/2): các ván chưa kết thúc
+        self.dirty = False
+        self.last_snapshot = time.monotonic()
+        self.lock = threading.Lock()     # bộ đệm và self.live
+        self.io_lock = threading.Lock()  # tệp: luồng nền và close() không ghi cùng lúc
+        self.closed = False
+        self._open_segment()
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    def _open_segment(self):
+        self.segment += 1
+        path = os.path.join(self.directory, "%s-%06d%s" % (self.prefix, self.segment, SUFFIX))
+        self.file = open(path, "ab")
+        self.written = 0
+
+    def start_game(self, game_id, size, win_length):
+        record = RECORD.pack(game_id, START, size, win_length, 0)
+        with self.lock:
+            self.buffer += record
+            self.live[game_id] = (size, win_length, bytearray(size * size))
+            self.dirty = True
+
+    def move(self, game_id, x, y, sym):
+        code = CODE[sym]
+        record = RECORD.pack(game_id, MOVE, x, y, code)
+        with self.lock:
+            self.buffer += record
+            game = self.live.get(game_id)
+            if game is not None:
+                game[2][x * game[0] + y] = code
+            self.dirty = True
+
+    def end_game(self, game_id, result):
+        record = RECORD.pack(game_id, END, result, 0, 0)
+        with self.lock:
+            self.buffer += record
+            self.live.pop(game_id, None)
+            self.dirty = True
+
+    def adopt(self, game_id, size, win_length, cells):
+        """
+        Nhận một ván từ nơi khác (khôi phục từ nhật ký cũ, hoặc ván có người
+        quay lại ở worker khác): các nước tiếp theo ghi vào nhật ký này. Ghi
+        ADOPT cùng các quân đang có (ô mã 0/1/2), để nhật ký này tự đủ thế cờ
+        dù đoạn của nó được đọc trước hay sau đoạn có START của ván.
+        """
+        stones = [[c for c, v in enumerate(cells) if v == code] for code in (1, 2)]
+        records = [RECORD.pack(game_id, ADOPT, size, win_length, 0)]
+        for i in range(len(stones[0]) + len(stones[1])):
+            c = stones[i % 2][i // 2]  # X, O xen kẽ như thứ tự đi
+            records.append(RECORD.pack(game_id, STONE, c // size, c % size, i % 2 + 1))
+        with self.lock:
+            self.buffer += b"".join(records)
+            self.live[game_id] = (size, win_length, bytearray(cells))
+            self.dirty = True
+
+    def release(self, game_id):
+        """Ván đã chuyển sang nhật ký khác (người chơi quay lại ở worker khác): bỏ khỏi ảnh chụp."""
+        with self.lock:
+            if self.live.pop(game_id, None) is not None:
+                self.dirty = True
+
+    def flush(self, snapshot=False):
+        """Ghi bộ đệm xuống đĩa và fsync (gọi từ luồng nền, hoặc khi đóng); chụp ảnh khi tới hạn."""
+        with self.io_lock:
+            now = time.monotonic()
+            games = None
+            with self.lock:
+                data, self.buffer = self.buffer, bytearray()
+                if self.dirty and (snapshot or now - self.last_snapshot >= self.snapshot_interval):
+                    # Chỉ sao chép trong khóa; ghi tệp ảnh chụp sau khi nhả khóa
+                    games = [(gid, size, k, bytes(cells)) for gid, (size, k, cells) in self.live.items()]
+                    self.dirty = False
+                    self.last_snapshot = now
+            if self.file is None:
+                return
+            if data:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.written += len(data)
+            if games is not None:
+                write_snapshot(self.snapshot_path, os.path.basename(self.file.name), self.written, games)
+            if self.written >= self.segment_bytes:
+                self.file.close()
+                self._open_segment()
+
+    def _flush_loop(self):
+        while not self.closed:
+            time.sleep(self.fsync_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[!] Journal write failed: {e}")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.flush(snapshot=True)
+        with self.io_lock:
+            self.file.close()
+            self.file = None
+
+
+def writer_prefix():
+    """Tiền tố tên tệp của một tiến trình ghi: thời điểm (ns) rồi pid, nên sắp xếp theo thời gian."""
+    return "%d-%d" % (time.time_ns(), os.getpid())
+
+
+# --- Ảnh chụp ---
+
+def write_snapshot(path, segment, offset, games, expires=0.0):
+    """Ghi ảnh chụp qua tệp tạm rồi đổi tên, nên không bao giờ còn ảnh chụp ghi dở."""
+    name = segment.encode()
+    parts = [SNAP_HEADER.pack(SNAP_MAGIC, expires, offset, len(games), len(name)), name]
+    for game_id, size, win_length, cells in games:
+        parts.append(SNAP_GAME.pack(game_id, size, win_length))
+        parts.append(cells)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"".join(parts))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    """(hết hạn, tên đoạn, vị trí, [(mã ván, kích thước, số quân thắng, ô)])."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, expires, offset, count, name_len = SNAP_HEADER.unpack_from(data)
+    if magic != SNAP_MAGIC:
+        raise ValueError(f"{path}: not a journal snapshot")
+    pos = SNAP_HEADER.size
+    segment = data[pos:pos + name_len].decode()
+    pos += name_len
+    games = []
+    for _ in range(count):
+        game_id, size, win_length = SNAP_GAME.unpack_from(data, pos)
+        pos += SNAP_GAME.size
+        games.append((game_id, size, win_length, data[pos:pos + size * size]))
+        pos += size * size
+    return expires, segment, offset, games
+
+
+# --- Đọc ---
+
+def segments(path):
+    """Các tệp đoạn theo thứ tự ghi (path là thư mục hoặc một tệp)."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*" + SUFFIX)))
+    return [path]
+
+
+def iter_records(paths, offset=0):
+    """
+    Từng bản ghi (mã ván, loại, a, b, c); bỏ qua bản ghi cuối bị ghi dở.
+    offset: bắt đầu từ vị trí này trong tệp đầu tiên (phần đuôi sau một ảnh chụp).
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            if offset:
+                f.seek(offset)
+                offset = 0
+            tail = b""
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                if tail:
+                    chunk = tail + chunk
+                whole = len(chunk) - len(chunk) % RECORD.size
+                yield from RECORD.iter_unpack(memoryview(chunk)[:whole])
+                tail = chunk[whole:]
+
+
+def iter_games(paths, include_open=False):
+    """
+    Gom bản ghi thành từng ván (Game) theo thứ tự kết thúc. Ván chưa có END
+    (server dừng giữa chừng) được trả về cuối cùng với result=None nếu
+    include_open.
+    """
+    games = {}
+    # Ván mở đầu bằng ADOPT (nhật ký nhận ván đứng trước nhật ký gốc): START và các
+    # nước của nhật ký gốc đọc sau chỉ lặp lại các quân đã có
+    adopted = set()
+    for game_id, kind, a, b, c in iter_records(paths):
+        if kind == MOVE or kind == STONE:
+            game = games.get(game_id)
+            if game is not None:
+                move = (a, b, SYMBOL[c])
+                # STONE lặp lại quân đã đọc từ nhật ký gốc khi đoạn của nó đứng trước
+                if (kind == STONE or game_id in adopted) and move in game.moves:
+                    continue
+                game.moves.append(move)
+        elif kind == START or kind == ADOPT:
+            # Ván đã có (nhật ký khác của cùng ván đọc trước): giữ, không bắt đầu lại
+            if game_id in games:
+                continue
+            if kind == START and game_id in adopted:
+                adopted.discard(game_id)
+                continue
+            games[game_id] = Game(game_id, a, b, [], None)
+            if kind == ADOPT:
+                adopted.add(game_id)
+        elif kind == END:
+            game = games.pop(game_id, None)
+            if game is not None:
+                yield game._replace(result=a)
+    if include_open:
+        yield from games.values()
+
+
+# --- Phát lại ---
+
+def replay_result(game):
+    """
+    Chơi lại ván trên một Board mới; trả về kết quả theo luật (hoặc None nếu
+    có nước sai). Thế cờ cuối được kiểm tra lại trên cả bàn (vector_eval), không
+    chỉ dựa vào nước cuối: phải có đúng chuỗi thắng của người thắng, ván khác
+    thì không có chuỗi thắng nào.
+    """
+    board = Board(game.size)
+    won = None
+    for i, (x, y, sym) in enumerate(game.moves):
+        ok, _ = apply_move(board, x, y, sym)
+        if not ok:
+            return None
+        if check_win(board, x, y, game.win_length):
+            # Nước thắng phải là nước cuối cùng của ván
+            if i != len(game.moves) - 1:
+                return None
+            won = sym
+    lines = winners(board, game.win_length)
+    if won is not None:
+        return CODE[won] if lines == {won} else None
+    if lines:
+        return None
+    if is_full(board):
+        return DRAW
+    # Ván dừng giữa chừng: thắng do hết giờ hợp lệ nếu người thua là bên đang tới lượt (X khi số nước chẵn)
+    if game.result == X_WIN_TIME and len(game.moves) % 2 == 1:
+        return X_WIN_TIME
+    if game.result == O_WIN_TIME and len(game.moves) % 2 == 0:
+        return O_WIN_TIME
+    return ABANDONED
+
+
+def replay(args):
+    games = moves = mismatches = 0
+    t0 = time.perf_counter()
+    for game in iter_games(segments(args.path)):
+        games += 1
+        moves += len(game.moves)
+        expected = replay_result(game)
+        if expected != game.result:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"game {game.id:016x}: recorded {RESULT_NAMES.get(game.result)}, "
+                      f"replay {RESULT_NAMES.get(expected, 'illegal move')}")
+    dt = time.perf_counter() - t0
+    print(f"{games} games, {moves} moves, {mismatches} mismatches")
+    print(f"{games / dt if dt else 0:.0f} games/s, {moves / dt if dt else 0:.0f} moves/s")
+
+
+def stats(args):
+    results = {}
+    games = moves = 0
+    for game in iter_games(segments(args.path), include_open=True):
+        games += 1
+        moves += len(game.moves)
+        name = RESULT_NAMES.get(game.result, "unfinished")
+        results[name] = results.get(name, 0) + 1
+    print(f"{games} games, {moves} moves")
+    for name, n in sorted(results.items()):
+        print(f"{name:>12}: {n}")
+
+
+# --- Nhật ký dùng chung của tiến trình ---
+
+_directory = None
+_journal = None
+_journal_lock = threading.Lock()
+
+def configure(directory):
+    """Thư mục nhật ký (None = không ghi)."""
+    global _directory
+    _directory = directory
+
+def default_journal():
+    """Nhật ký của tiến trình hiện tại, mở khi cần lần đầu (sau khi cluster đã fork worker)."""
+    global _journal
+    if _directory is None:
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal(_directory)
+        return _journal
+
+def shutdown():
+    """Ghi nốt và đóng nhật ký của tiến trình (tiến trình sắp thoát bằng os._exit)."""
+    if _journal is not None:
+        _journal.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game journal tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("replay", help="re-verify every finished game (check_win per move, whole-board final position)")
+    p.add_argument("path", help="journal directory or segment file")
+    p.set_defaults(func=replay)
+    p = sub.add_parser("stats", help="count games by result")
+    p.add_argument("path")
+    p.set_defaults(func=stats)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# loadgen.py
+"""
+Tạo tải cho server bằng hàng nghìn client giả lập không giao diện (asyncio),
+nói đúng giao thức của client thật (PLAY, MOVE, CHAT, REMATCH, EXIT, RESUME).
+
+Kịch bản (--scenario, chạy lần lượt):
+
+    rapid       mỗi cặp đi hết --moves nước kịch bản nhanh nhất có thể rồi EXIT
+    chat        như rapid, mỗi lượt gửi thêm --chat dòng CHAT
+    disconnect  giữa ván người đi trước ngắt kết nối rồi quay lại bằng RESUME
+    rematch     ván thắng nhanh (9 nước), cả hai REMATCH, lặp --games ván
+
+Mỗi kịch bản in số nước đi/giây, thông điệp/giây và độ trễ (p50/p90/p99/max):
+
+    move        gửi MOVE -> đối thủ nhận OPPONENT
+    chat        gửi CHAT -> đối thủ nhận CHAT
+    resume      kết nối lại -> nhận SYNC
+    rematch     gửi REMATCH -> nhận START của ván mới
+    pair        kết nối -> nhận START (ghép cặp)
+
+Mặc định tự chạy server.py trên một cổng trống của 127.0.0.1 (--mode,
+--workers như server); --port dùng server đang chạy sẵn. --json ghi thêm một
+dòng kết quả mỗi kịch bản để so sánh giữa các lần chạy.
+
+    python loadgen.py --clients 2000 --scenario rapid chat
+    python loadgen.py --clients 200 --scenario disconnect rematch --mode async
+    python loadgen.py --port 12345 --scenario rematch --games 20
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from bench_matchmaking import percentile
+from bench_server import free_port, scripted_moves, wait_listening
+
+SCENARIOS = ("rapid", "chat", "disconnect", "rematch")
+KINDS = ("move", "chat", "resume", "rematch", "pair")
+
+# X thắng ở nước thứ 9: X đi hàng 0, O đi hàng 1
+QUICK_WIN = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2), (1, 2), (0, 3), (1, 3), (0, 4)]
+
+RESUME_RETRY = 0.05  # server chưa thấy kết nối cũ đã chết ('Unknown session'): thử lại sau chừng này giây
+
+
+class Load:
+    """Số đếm và độ trễ chung của mọi client trong một kịch bản."""
+
+    def __init__(self, port, scenario, moves, chat, games, batch):
+        self.port = port
+        self.scenario = scenario
+        self.moves = moves
+        self.chat = chat
+        self.games = games
+        self.connecting = asyncio.Semaphore(batch)  # hàng chờ accept của server có hạn
+        self.latencies = {kind: [] for kind in KINDS}
+        self.sent_move = {}  # mã trận -> thời điểm gửi nước vừa đi
+        self.moves_played = 0
+        self.games_done = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.errors = 0
+
+
+class Client:
+    def __init__(self, load):
+        self.load = load
+        self.reader = None
+        self.writer = None
+        self.sym = None
+        self.match = None
+        self.token = None
+        self.turn = 0    # số nước mình đã đi trong ván này
+        self.played = 0  # số ván đã xong (rematch)
+        self.dropped = False
+        self.rematch_at = None
+
+    def send(self, line):
+        self.writer.write(line.encode() + b"\n")
+        self.load.messages_out += 1
+
+    async def connect(self, first_line):
+        async with self.load.connecting:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.load.port)
+        # Gửi ngay: quá HANDSHAKE_TIMEOUT mà chưa có lệnh thì server coi là client cũ
+        self.send(first_line)
+
+    def my_moves(self):
+        moves = QUICK_WIN if self.load.scenario == "rematch" else self.load.moves
+        return moves[0::2] if self.sym == 'X' else moves[1::2]
+
+    async def run(self):
+        try:
+            await self.play()
+        except (OSError, asyncio.IncompleteReadError):
+            self.load.errors += 1
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+
+    async def play(self):
+        load = self.load
+        lat = load.latencies
+        await self.connect("PLAY")
+        connected = time.perf_counter()
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                load.errors += 1  # server đóng kết nối giữa chừng
+                return
+            now = time.perf_counter()
+            load.messages_in += 1
+            parts = line.decode().split()
+            if not parts:
+                continue
+            cmd = parts[0]
+
+            if cmd == "START":
+                self.sym = parts[1]
+                self.turn = 0
+                if self.rematch_at is not None:
+                    lat["rematch"].append(now - self.rematch_at)
+                    self.rematch_at = None
+                else:
+                    lat["pair"].append(now - connected)
+            elif cmd == "MATCH":
+                self.match = parts[1]
+            elif cmd == "SESSION":
+                self.token = parts[1]
+            elif cmd == "OPPONENT":
+                sent = load.sent_move.pop(self.match, None)
+                if sent is not None:
+                    lat["move"].append(now - sent)
+            elif cmd == "CHAT" and len(parts) == 3 and parts[1] == "load":
+                lat["chat"].append(now - float(parts[2]))
+            elif cmd == "YOUR":
+                mine = self.my_moves()
+                if self.turn >= len(mine):
+                    load.games_done += 1  # hết nước kịch bản: ván xong, rời trận
+                    self.send("EXIT")
+                    return
+                if load.scenario == "disconnect" and not self.dropped and self.sym == 'X' \
+                        and self.turn == len(mine) // 2:
+                    await self.reconnect()
+                    continue  # server gửi lại YOUR TURN sau SYNC
+                for _ in range(load.chat if load.scenario == "chat" else 0):
+                    self.send(f"CHAT load {time.perf_counter()!r}")
+                x, y = mine[self.turn]
+                self.turn += 1
+                load.sent_move[self.match] = time.perf_counter()
+                self.send(f"MOVE {x} {y}")
+                load.moves_played += 1
+            elif cmd in ("WIN", "LOSE", "DRAW"):
+                self.played += 1
+                if self.sym == 'X':
+                    load.games_done += 1  # mỗi ván đếm một lần
+                if load.scenario == "rematch" and self.played < load.games:
+                    self.rematch_at = time.perf_counter()
+                    self.send("REMATCH")
+                else:
+                    self.send("EXIT")
+                    return
+            elif cmd == "OPPONENT_LEFT":
+                return
+            elif cmd == "INVALID":
+                load.errors += 1
+
+    async def reconnect(self):
+        """Ngắt kết nối giữa ván rồi quay lại bằng RESUME <token>; đo tới khi nhận SYNC."""
+        load = self.load
+        self.dropped = True
+        self.writer.close()
+        start = time.perf_counter()
+        while True:
+            await self.connect(f"RESUME {self.token}")
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                load.messages_in += 1
+                if line.startswith(b"SYNC"):
+                    load.latencies["resume"].append(time.perf_counter() - start)
+                    return
+                if line.startswith(b"INVALID"):
+                    break
+            self.writer.close()
+            await asyncio.sleep(RESUME_RETRY)
+
+
+# --- Chạy một kịch bản ---
+
+async def run_scenario(port, scenario, args, moves):
+    load = Load(port, scenario, moves, args.chat, args.games, args.batch)
+    clients = [Client(load) for _ in range(args.clients)]
+    t0 = time.perf_counter()
+    tasks = [asyncio.create_task(c.run()) for c in clients]
+    done, pending = await asyncio.wait(tasks, timeout=args.timeout)
+    elapsed = time.perf_counter() - t0
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return load, elapsed, len(pending)
+
+
+def summary(scenario, load, elapsed, unfinished, args):
+    result = {
+        "scenario": scenario, "clients": args.clients, "seconds": round(elapsed, 3),
+        "moves": load.moves_played, "games": load.games_done,
+        "messages_in": load.messages_in, "messages_out": load.messages_out,
+        "errors": load.errors, "unfinished": unfinished,
+    }
+    for kind, values in load.latencies.items():
+        if values:
+            result[kind] = {"n": len(values), **{
+                p: round(percentile(values, q) * 1e3, 3)
+                for p, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))}}
+    return result
+
+
+def report(result):
+    s = result["seconds"]
+    print(f"{result['scenario']:>10}: {result['clients']} clients, {result['games']} games, "
+          f"{result['moves']} moves in {s:.2f}s")
+    print(f"            {result['moves'] / s:8.0f} moves/s  {result['games'] / s:8.1f} games/s  "
+          f"{result['messages_in'] / s:8.0f} msg/s in  {result['messages_out'] / s:8.0f} msg/s out")
+    for kind in KINDS:
+        if kind in result:
+            r = result[kind]
+            print(f"            {kind:>8} ms: p50 {r['p50']:8.2f}  p90 {r['p90']:8.2f}  "
+                  f"p99 {r['p99']:8.2f}  max {r['max']:8.2f}  ({r['n']})")
+    if result["errors"] or result["unfinished"]:
+        print(f"            {result['errors']} errors, {result['unfinished']} clients unfinished")
+
+
+def start_server(args):
+    port = free_port()
+    cmd = [sys.executable, "server.py", str(port), "--host", "127.0.0.1", "--mode", args.mode,
+           "--workers", str(args.workers), "--bot-after", "0", "--analysis-workers", "0",
+           "--chat-rate", str(args.chat_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    try:
+        wait_listening(port)  # kết nối thăm dò đóng ngay khi bắt tay nên không vào hàng đợi
+    except RuntimeError:
+        proc.terminate()
+        raise
+    return port, proc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load generator for the Caro server")
+    parser.add_argument("--clients", type=int, default=1000, help="số client (chẵn: mỗi trận hai người)")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=["rapid"])
+    parser.add_argument("--moves", type=int, default=40, help="số nước mỗi ván (rapid, chat, disconnect)")
+    parser.add_argument("--chat", type=int, default=5, help="số dòng CHAT mỗi lượt (chat)")
+    parser.add_argument("--chat-rate", type=float, default=0.0,
+                        help="--chat-rate của server tự chạy (mặc định 0: đo chuyển tin, không giới hạn)")
+    parser.add_argument("--games", type=int, default=10, help="số ván mỗi trận (rematch)")
+    parser.add_argument("--batch", type=int, default=100, help="số kết nối đang mở cùng lúc")
+    parser.add_argument("--timeout", type=float, default=300.0, help="giới hạn thời gian mỗi kịch bản")
+    parser.add_argument("--port", type=int, default=None, help="dùng server đang chạy trên 127.0.0.1")
+    parser.add_argument("--mode", choices=("thread", "async"), default="thread")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE", default=None, help="ghi thêm một dòng JSON mỗi kịch bản")
+    args = parser.parse_args()
+    if args.clients % 2:
+        parser.error("--clients must be even")
+
+    # Mỗi client một fd ở cả hai phía (server tự chạy là tiến trình con, thừa hưởng giới hạn)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = 2 * args.clients + 256
+    if soft < want <= hard or (hard == resource.RLIM_INFINITY and soft < want):
+        resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+
+    moves = scripted_moves(args.moves)
+    for scenario in args.scenario:
+        # Server mới cho mỗi kịch bản: kết quả không phụ thuộc kịch bản chạy trước
+        port, proc = (args.port, None) if args.port else start_server(args)
+        try:
+            load, elapsed, unfinished = asyncio.run(run_scenario(port, scenario, args, moves))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+        result = summary(scenario, load, elapsed, unfinished, args)
+        result["server"] = "port %d" % args.port if args.port else \
+            (f"{args.mode} x{args.workers}" if args.workers else args.mode)
+        report(result)
+        if args.json:
+            with open(args.json, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
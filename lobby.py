@@ -0,0 +1,332 @@
+# lobby.py
+"""
+Sảnh chờ: phòng do người chơi tự mở, thay cho hàng đợi ghép cặp vô danh.
+
+Các lệnh gửi trong lúc bắt tay (handshake.py), trước PLAY:
+
+    LIST [sau] [số phòng]   một trang các phòng công khai đang chờ, cùng luật
+                            với SIZE đã gửi (mặc định 15 5), phòng cũ trước
+    LIST SINCE <version>    các thay đổi từ version đó (cập nhật dần)
+    CREATE [giây] [PRIVATE] mở phòng theo luật hiện tại; giây mỗi lượt (0 = không
+                            giới hạn, bỏ trống: --move-time của server). Phòng
+                            riêng tư không có trong LIST: chỉ ai biết mã mới vào được
+    JOIN [mã]               vào phòng; bỏ trống mã: phòng công khai chờ lâu nhất
+                            cùng luật. Trận bắt đầu ngay, chủ phòng đi trước (X)
+    LEAVE                   chủ phòng đóng phòng, ở lại sảnh
+
+Server trả lời:
+
+    ROOM <mã> <n> <k> <giây> <chủ phòng|->   một phòng (LIST, CREATE, phòng mới ở LIST SINCE)
+    GONE <mã>                                phòng đã đủ người hoặc đã đóng (LIST SINCE)
+    ROOMS <sau> <version>                    hết trang; <sau> để xin trang tiếp (0 = hết)
+    ROOMS RESET <version>                    LIST SINCE quá cũ: xin lại từ trang đầu
+    LEFT <mã>                                đã đóng phòng (LEAVE)
+
+Người đã dùng lệnh sảnh không còn bị giới hạn HANDSHAKE_TIMEOUT: client cũ
+vẫn vào hàng đợi như trước.
+
+Mỗi bộ luật (kích thước bàn, số quân thắng) có một chỉ mục (RoomIndex) các
+phòng công khai đang chờ: danh sách số thứ tự phòng đã sắp xếp (phòng mới
+luôn có số lớn nhất nên chỉ cần thêm vào cuối) cùng dict số thứ tự -> phòng.
+Lấy một trang là một lần tìm nhị phân; JOIN và bỏ một phòng là O(1) (trung
+bình), dù có hàng chục nghìn phòng. Mỗi thay đổi của danh sách công khai
+tăng `version` và được ghi vào một vòng đệm CHANGES dòng; client đã có danh
+sách chỉ xin các thay đổi thay vì tải lại cả danh sách.
+
+Đo với 50k phòng:
+
+    python lobby.py --rooms 50000
+"""
+import argparse
+import bisect
+import itertools
+import secrets
+import threading
+import time
+from collections import deque
+
+import timers
+
+PAGE_ROOMS = 50     # số phòng mỗi trang mặc định
+PAGE_MAX = 200      # số phòng tối đa mỗi trang
+CHANGES = 4096      # số thay đổi gần nhất giữ lại cho LIST SINCE
+MAX_MOVE_TIME = 3600
+COMPACT_SLACK = 64  # RoomIndex dựng lại danh sách khi số phòng đã bỏ vượt số còn lại chừng này
+
+# Trạng thái của một phòng
+OPEN, JOINING, SEATED, CLOSED = range(4)
+
+
+class Room:
+    """
+    Một phòng. guest: người vào phòng (do server đặt bằng seat()), notify: hàm
+    đánh thức chủ phòng đang chờ (watch()).
+    """
+    __slots__ = ("id", "seq", "settings", "move_time", "private", "host",
+                 "guest", "guest_name", "state", "notify")
+
+    def __init__(self, room_id, seq, settings, move_time, private, host):
+        self.id = room_id
+        self.seq = seq
+        self.settings = settings
+        self.move_time = move_time
+        self.private = private
+        self.host = host  # tên chủ phòng (NAME) hoặc None
+        self.guest = None
+        self.guest_name = None
+        self.state = OPEN
+        self.notify = None
+
+    def line(self):
+        return "ROOM %s %d %d %g %s" % (self.id, *self.settings, self.move_time, self.host or "-")
+
+
+class RoomIndex:
+    """
+    Các phòng công khai đang chờ của một bộ luật, theo thứ tự mở phòng.
+
+    Bỏ một phòng chỉ xóa nó khỏi dict; số thứ tự của nó nằm lại trong `seqs`
+    và được bỏ qua khi đọc. Khi số đã bỏ nhiều hơn số còn lại, `seqs` được dựng
+    lại một lần (O(n) cho n lần bỏ), nên không lần bỏ nào phải dời cả danh sách.
+    """
+
+    def __init__(self):
+        self.seqs = []   # số thứ tự phòng, tăng dần (kể cả phòng đã bỏ)
+        self.rooms = {}  # số thứ tự -> Room đang chờ
+        self.head = 0    # mọi phòng trước vị trí này đã bỏ
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def add(self, room):
+        self.seqs.append(room.seq)  # số thứ tự mới luôn lớn nhất
+        self.rooms[room.seq] = room
+
+    def remove(self, room):
+        del self.rooms[room.seq]
+        if len(self.seqs) > 2 * len(self.rooms) + COMPACT_SLACK:
+            rooms = self.rooms
+            self.seqs = [seq for seq in self.seqs if seq in rooms]
+            self.head = 0
+
+    def first(self):
+        seqs, rooms = self.seqs, self.rooms
+        while self.head < len(seqs) and seqs[self.head] not in rooms:
+            self.head += 1
+        return rooms[seqs[self.head]] if self.head < len(seqs) else None
+
+    def page(self, after, count):
+        """-> (tối đa count phòng có số thứ tự > after, số thứ tự để xin trang tiếp hoặc 0)."""
+        seqs, rooms = self.seqs, self.rooms
+        i = max(bisect.bisect_right(seqs, after), self.head)
+        chosen = []
+        while i < len(seqs):
+            room = rooms.get(seqs[i])
+            if room is not None:
+                if len(chosen) == count:
+                    return chosen, chosen[-1].seq  # còn phòng sau trang này
+                chosen.append(room)
+            i += 1
+        return chosen, 0
+
+
+class Lobby:
+    def __init__(self, changes=CHANGES):
+        self.lock = threading.Lock()
+        self.rooms = {}    # mã -> Room đang chờ (kể cả phòng riêng tư)
+        self.index = {}    # (kích thước bàn, số quân thắng) -> RoomIndex
+        self.version = 0   # tăng sau mỗi thay đổi của danh sách công khai
+        self.changes = deque(maxlen=changes)  # (version, luật, dòng ROOM/GONE)
+        self.counter = itertools.count(1)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def _changed(self, room, line):
+        self.version += 1
+        self.changes.append((self.version, room.settings, line))
+
+    def _unlist(self, room):
+        """Bỏ phòng khỏi danh sách chờ (đã có người vào hoặc đã đóng)."""
+        del self.rooms[room.id]
+        if not room.private:
+            index = self.index[room.settings]
+            index.remove(room)
+            if not index:
+                del self.index[room.settings]
+            self._changed(room, "GONE " + room.id)
+
+    def create(self, settings, move_time=None, private=False, host=None):
+        """Mở phòng mới; move_time None: thời gian mỗi lượt mặc định của server."""
+        if move_time is None:
+            move_time = timers.limits()[0]
+        with self.lock:
+            seq = next(self.counter)
+            room_id = str(seq)
+            if private:
+                # Mã ngẫu nhiên: không đoán được từ các mã công khai
+                while room_id in self.rooms or room_id.isdigit():
+                    room_id = secrets.token_urlsafe(6)
+            room = Room(room_id, seq, settings, move_time, private, host)
+            self.rooms[room_id] = room
+            if not private:
+                self.index.setdefault(settings, RoomIndex()).add(room)
+                self._changed(room, room.line())
+        return room
+
+    def join(self, room_id, settings):
+        """
+        Giữ chỗ trong phòng `room_id` (None: phòng công khai chờ lâu nhất có
+        luật `settings`) và bỏ nó khỏi danh sách; người vào chỉ thật sự ngồi
+        vào phòng khi server gọi seat(). Không có phòng: KeyError.
+        """
+        with self.lock:
+            if room_id is None:
+                index = self.index.get(settings)
+                room = index.first() if index is not None else None
+                if room is None:
+                    raise KeyError(settings)
+            else:
+                room = self.rooms[room_id]
+            self._unlist(room)
+            room.state = JOINING
+        return room
+
+    def seat(self, room, player, name=None):
+        """Người đã join() ngồi vào phòng rồi đánh thức chủ phòng; False nếu chủ phòng đã bỏ đi."""
+        with self.lock:
+            if room.state != JOINING:
+                return False
+            room.guest, room.guest_name = player, name
+            room.state = SEATED
+            notify = room.notify
+        if notify is not None:
+            notify()
+        return True
+
+    def watch(self, room, notify):
+        """Chủ phòng chờ: notify() được gọi khi có người ngồi vào; True nếu đã có người ngồi sẵn."""
+        with self.lock:
+            room.notify = notify
+            return room.state == SEATED
+
+    def leave(self, room):
+        """LEAVE: đóng phòng; False nếu đã có người ngồi vào (trận sắp bắt đầu)."""
+        with self.lock:
+            if room.state == SEATED:
+                return False
+            self._close(room)
+            return True
+
+    def close(self, room):
+        """Chủ phòng mất kết nối: đóng phòng; trả về người đã ngồi vào (để báo cho họ) hoặc None."""
+        with self.lock:
+            guest = room.guest if room.state == SEATED else None
+            self._close(room)
+        return guest
+
+    def _close(self, room):
+        if room.state == OPEN:
+            self._unlist(room)
+        room.state = CLOSED
+        room.notify = None
+
+    # --- Danh sách phòng ---
+
+    def page(self, settings, after=0, count=PAGE_ROOMS):
+        """-> (các phòng công khai đang chờ có luật `settings`, số thứ tự để xin trang tiếp, version)."""
+        count = max(1, min(count, PAGE_MAX))
+        with self.lock:
+            index = self.index.get(settings)
+            rooms, more = index.page(after, count) if index is not None else ([], 0)
+            return rooms, more, self.version
+
+    def since(self, settings, version):
+        """-> (các dòng ROOM/GONE có luật `settings` sau `version`, version hiện tại); None nếu quá cũ."""
+        with self.lock:
+            changes = self.changes
+            if version > self.version:
+                return None
+            if version == self.version:
+                return [], version
+            start = version - changes[0][0] + 1 if changes else -1
+            if start < 0:
+                return None
+            lines = [line for _, key, line in itertools.islice(changes, start, None) if key == settings]
+            return lines, self.version
+
+    def list_lines(self, settings, args):
+        """Các dòng trả lời `LIST [sau] [số phòng]` hoặc `LIST SINCE <version>`."""
+        if args[:1] == ["SINCE"]:
+            try:
+                changes = self.since(settings, int(args[1]))
+            except (IndexError, ValueError):
+                changes = None
+            if changes is None:
+                return [f"ROOMS RESET {self.version}"]
+            lines, version = changes
+            return lines + [f"ROOMS 0 {version}"]
+        try:
+            after = int(args[0]) if len(args) > 0 else 0
+            count = int(args[1]) if len(args) > 1 else PAGE_ROOMS
+        except ValueError:
+            after, count = 0, PAGE_ROOMS
+        rooms, more, version = self.page(settings, after, count)
+        return [room.line() for room in rooms] + [f"ROOMS {more} {version}"]
+
+
+rooms = Lobby()
+
+_enabled = True
+
+def configure(enabled):
+    """Bật/tắt sảnh cho các kết nối mới (cluster: sảnh chưa dùng chung giữa các worker)."""
+    global _enabled
+    _enabled = enabled
+
+def default_lobby():
+    """Sảnh của tiến trình, hoặc None nếu đã tắt."""
+    return rooms if _enabled else None
+
+
+# --- Đo chi phí ---
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=20_000)
+    args = parser.parse_args()
+    clock = time.perf_counter
+    settings = [(15, 5), (19, 5), (9, 5), (3, 3)]
+
+    for n in (args.rooms // 100, args.rooms // 10, args.rooms):
+        lobby = Lobby()
+        t0 = clock()
+        made = [lobby.create(settings[i % len(settings)], 30, host="p%d" % i) for i in range(n)]
+        create = (clock() - t0) / n
+
+        rounds = args.rounds
+        key = settings[0]
+        t0 = clock()
+        for i in range(rounds):
+            lobby.list_lines(key, [str(made[(i * 7919) % n].seq), "20"])
+        page = (clock() - t0) / rounds
+
+        version = lobby.version
+        t0 = clock()
+        for i in range(rounds):
+            room = lobby.join(None, settings[i % len(settings)])
+            lobby.seat(room, None)
+            lobby.create(room.settings, 30)  # số phòng giữ nguyên
+        churn = (clock() - t0) / rounds
+        t0 = clock()
+        for i in range(rounds):
+            lobby.list_lines(key, ["SINCE", str(lobby.version - 40)])
+        since = (clock() - t0) / rounds
+        print(f"{n:>7} rooms: create {create * 1e6:5.2f} us, LIST page of 20 {page * 1e6:6.2f} us, "
+              f"JOIN + new room {churn * 1e6:5.2f} us, LIST SINCE (40 changes) {since * 1e6:6.2f} us, "
+              f"{lobby.version - version} changes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+# match.py
+import base64
+from time import perf_counter
+
+import chat as game_chat
+import journal as game_journal
+import metrics
+import sessions
+import wire
+from game_logic import DEFAULT_SIZE, WIN_LENGTH, Board, BitBoard, apply_move, valid_settings
+from vector_eval import winners
+
+_STATE_CODES = bytes.maketrans(b".XO", b"\0\1\2")  # ô của Board -> mã của sessions.GameState
+_STATE_SYMBOLS = bytes.maketrans(b"\0\1\2", b".XO")
+_SCORES = {game_journal.X_WIN: 1.0, game_journal.DRAW: 0.5, game_journal.O_WIN: 0.0,
+           game_journal.X_WIN_TIME: 1.0, game_journal.O_WIN_TIME: 0.0}  # điểm của X
+
+
+def resume_error(game):
+    """Lý do thế cờ (sessions.GameState) không chơi tiếp được, hoặc None."""
+    size, cells = game.size, game.cells
+    if not valid_settings(size, game.win_length) or len(cells) != size * size:
+        return "bad board settings"
+    if cells.translate(None, b"\0\1\2"):
+        return "bad cell"
+    x_count, o_count = cells.count(1), cells.count(2)
+    if x_count - o_count not in (0, 1):
+        return "bad stone count"
+    if x_count + o_count == size * size:
+        return "board is full"
+    # Thế cờ do recovery dựng lại từ nhật ký: kiểm tra cả bàn, ván đã có người thắng thì không chơi tiếp
+    if winners(Board.from_bytes(size, cells.translate(_STATE_SYMBOLS)), game.win_length):
+        return "game already won"
+    return None
+
+
+class Match:
+    """
+    Luật của một trận đấu giữa hai người chơi, tách khỏi tầng mạng.
+
+    Server (luồng hoặc asyncio) đọc lệnh của cả hai người chơi, ai gửi trước
+    xử lý trước, rồi gọi handle(người gửi, lệnh); mọi thông điệp gửi đi đều
+    qua hàm send(peer, msg). `current` là người đang tới lượt đi.
+
+    hints(board, symbol, win_length, done) gửi thế cờ đi phân tích (xem
+    analysis.py) và trả về một Future; khi có kết quả, server gọi done(move)
+    trong đúng ngữ cảnh của trận (giữ khóa, hoặc trên event loop).
+
+    journal (journal.Journal) ghi lại mọi ván: bắt đầu, từng nước hợp lệ, kết quả.
+
+    grace > 0: người mất kết nối giữa ván được giữ chỗ chừng ấy giây. Trận
+    kết thúc với `absent` là người vừa mất kết nối; server cất snapshot() của
+    ván vào sessions.registry cùng người còn lại rồi mới báo cho người đó
+    (SUSPEND_NOTICE), để RESUME đến ngay sau đó luôn tìm thấy ván.
+
+    timers(delay, callback) đặt đồng hồ (xem timers.py) và trả về một đồng hồ
+    hủy được; server gọi callback trong đúng ngữ cảnh của trận như với hints.
+    Mỗi lượt có move_time giây, hết giờ thì người đang đi thua. Ván đã xong
+    mà không ai gửi gì trong idle_time giây thì trận kết thúc (finished).
+
+    rated(điểm của X) được gọi sau mỗi ván có kết quả (1 X thắng, 0.5 hòa,
+    0 O thắng; bỏ ván giữa chừng là thua) và trả về dòng báo hệ số mới cho
+    hai người chơi (xem matchmaking.rater).
+
+    spectators (spectators.Channel) nhận ảnh chụp mỗi ván và từng nước đi để
+    phát cho khán giả (WATCH); hai người chơi được báo mã trận (MATCH <mã>).
+
+    chat (chat.Room) giới hạn tốc độ CHAT của từng người chơi và giữ lịch sử
+    để xem lại theo trang (HISTORY); không có thì CHAT được chuyển thẳng.
+    """
+
+    def __init__(self, p1, p2, send, size=DEFAULT_SIZE, win_length=WIN_LENGTH, hints=None,
+                 journal=None, grace=0, timers=None, move_time=0, idle_time=0, rated=None,
+                 spectators=None, chat=None):
+        self.p1 = p1
+        self.p2 = p2
+        self.send = send
+        self.hints = hints
+        self.pending_hints = []
+        self.journal = journal
+        self.grace = grace
+        self.absent = None
+        self.timers = timers
+        self.move_time = move_time
+        self.idle_time = idle_time
+        self.clocks = {}  # tên đồng hồ -> (số lần đặt, đồng hồ đang chạy)
+        self.rated = rated
+        self.spectators = spectators
+        self.chat = chat
+        self.game_id = None
+        self.symbols = {p1: 'X', p2: 'O'}
+        self.rematch_status = {p1: False, p2: False}
+        # Hai bàn cờ dùng lại suốt trận: Board giữ các ô (để chụp trạng thái),
+        # BitBoard kiểm tra thắng/hòa.
+        self.size = size
+        self.win_length = win_length
+        self.board = Board(size)
+        self.engine = BitBoard(size, win_length)
+        self.current = p1
+        self.other = p2
+        self.game_active = False
+        self.finished = False
+
+    def start(self):
+        """Bắt đầu (hoặc chơi lại) một ván mới."""
+        self.board.reset()
+        self.engine.reset()
+        self.rematch_status[self.p1] = False
+        self.rematch_status[self.p2] = False
+
+        # Client cũ chỉ đọc ký hiệu; kích thước bàn và luật thắng đi kèm phía sau
+        rules = f"{self.size} {self.win_length}"
+        self.send(self.p1, f"START X {rules}")
+        self.send(self.p2, f"START O {rules}")
+
+        self.send(self.p1, "RESET")
+        self.send(self.p2, "RESET")
+
+        self.current = self.p1
+        self.other = self.p2
+        self.send(self.current, "YOUR TURN")
+
+        self.game_active = True
+        self.set_clock("idle", 0)
+        self.set_clock("turn", self.move_time, self.time_up)
+        self.game_id = sessions.new_game_id()
+        metrics.games.inc()
+        if self.journal is not None:
+            self.journal.start_game(self.game_id, self.size, self.win_length)
+        self.send_sessions()
+        self.broadcast_game()
+
+    def send_sessions(self):
+        """Token để quay lại ván này (RESUME) khi mất kết nối hoặc server khởi động lại."""
+        for p in (self.p1, self.p2):
+            self.send(p, f"SESSION {sessions.token(self.game_id, self.symbols[p])}")
+
+    def broadcast_game(self):
+        """Ván mới hoặc ván tiếp tục: gửi ảnh chụp cho khán giả, báo mã trận cho người chơi."""
+        if self.spectators is None:
+            return
+        self.spectators.new_game(self.size, self.win_length, self.board.snapshot(),
+                                 self.symbols[self.current])
+        for p in (self.p1, self.p2):
+            self.send(p, f"MATCH {self.spectators.id}")
+
+    def resume(self, game):
+        """
+        Tiếp tục một ván đang chờ (sessions.GameState): khôi phục từ nhật ký
+        hoặc sau khi mất kết nối. Thế cờ không hợp lệ (resume_error) thì ván
+        được ghi là bỏ dở và trận kết thúc.
+        """
+        problem = resume_error(game)
+        if problem is not None:
+            if self.journal is not None:
+                self.journal.end_game(game.id, game_journal.ABANDONED)
+            for p in (self.p1, self.p2):
+                self.send(p, f"CHAT [System]: Cannot resume game ({problem})")
+                self.send(p, "OPPONENT_LEFT")
+            self.finish()
+            return
+        self.board.reset()
+        self.engine.reset()
+        size = self.size
+        for c, code in enumerate(game.cells):
+            if code:
+                sym = 'XO'[code - 1]
+                apply_move(self.board, c // size, c % size, sym)
+                self.engine.apply_move(c // size, c % size, sym)
+        # X đi trước, hai bên đi luân phiên: cùng số quân thì tới lượt X
+        x_count = self.board.cells.count(ord('X'))
+        if x_count == self.board.cells.count(ord('O')):
+            self.current, self.other = self.p1, self.p2
+        else:
+            self.current, self.other = self.p2, self.p1
+
+        self.game_id = game.id
+        metrics.games.inc()
+        if self.journal is not None:
+            self.journal.adopt(game.id, size, self.win_length, game.cells)
+        packed = base64.b64encode(self.board.pack()).decode()
+        for p in (self.p1, self.p2):
+            self.send(p, f"SYNC {self.symbols[p]} {size} {self.win_length} {packed}")
+        self.send_sessions()
+        self.broadcast_game()
+        self.game_active = True
+        self.send(self.current, "YOUR TURN")
+        self.set_clock("turn", self.move_time, self.time_up)
+
+    def snapshot(self):
+        """Trạng thái gọn của ván đang chơi để tiếp tục về sau bằng resume()."""
+        return sessions.GameState(self.game_id, self.size, self.win_length,
+                                  bytes(self.board.cells).translate(_STATE_CODES))
+
+    def opponent(self, player):
+        return self.p2 if player is self.p1 else self.p1
+
+    def end_game(self, result, loser=None):
+        self.game_active = False
+        self.set_clock("turn", 0)
+        self.set_clock("idle", self.idle_time, self.idle)
+        if self.journal is not None:
+            self.journal.end_game(self.game_id, result)
+        if self.spectators is not None:
+            self.spectators.result(result)
+        if self.rated is not None:
+            if loser is not None:
+                score_x = 0.0 if self.symbols[loser] == 'X' else 1.0
+            else:
+                score_x = _SCORES[result]
+            notice = self.rated(score_x)
+            if notice:
+                self.send(self.p1, notice)
+                self.send(self.p2, notice)
+
+    def finish(self):
+        self.cancel_hints()
+        for name in list(self.clocks):
+            self.set_clock(name, 0)
+        if self.spectators is not None:
+            self.spectators.close()
+        self.finished = True
+
+    def leave(self, player):
+        """Người chơi rời trận (mất kết nối hoặc EXIT)."""
+        if self.game_active:
+            self.end_game(game_journal.ABANDONED, loser=player)
+        self.send(self.opponent(player), "OPPONENT_LEFT")
+        self.finish()
+
+    def disconnect(self, player):
+        """Người chơi mất kết nối: giữa ván thì giữ chỗ chờ họ quay lại, không thì rời trận."""
+        if not (self.game_active and self.grace > 0):
+            self.leave(player)
+            return
+        self.absent = player
+        self.finish()
+
+    # --- Đồng hồ ---
+
+    def set_clock(self, name, delay, callback=None):
+        """Đặt lại đồng hồ `name` (delay 0 = chỉ hủy). Đồng hồ cũ lỡ tới hạn cùng lúc thì bị bỏ qua."""
+        serial, clock = self.clocks.get(name, (0, None))
+        if clock is not None:
+            clock.cancel()
+        serial += 1
+        if self.timers is None or delay <= 0:
+            self.clocks[name] = (serial, None)
+            return
+
+        def fire():
+            if self.clocks[name][0] == serial and not self.finished:
+                callback()
+        self.clocks[name] = (serial, self.timers(delay, fire))
+
+    def time_up(self):
+        """Hết giờ của lượt: người đang đi thua."""
+        if not self.game_active:
+            return
+        current, other = self.current, self.other
+        sym = self.symbols[current]
+        notice = f"CHAT [System]: {sym} ran out of time"
+        self.send(current, notice)
+        self.send(other, notice)
+        self.cancel_hints()
+        self.send(current, "LOSE")
+        self.send(other, "WIN")
+        self.end_game(game_journal.O_WIN_TIME if sym == 'X' else game_journal.X_WIN_TIME)
+
+    def idle(self):
+        """Ván đã xong và không ai gửi gì (không chơi lại): đóng trận."""
+        if self.game_active:
+            return
+        for p in (self.p1, self.p2):
+            self.send(p, "CHAT [System]: Match closed (idle)")
+        self.finish()
+
+    def cancel_hints(self):
+        """Thế cờ đã đổi hoặc trận đã xong: bỏ các job gợi ý chưa chạy."""
+        for job in self.pending_hints:
+            job.cancel()
+        self.pending_hints.clear()
+
+    def request_hint(self, player):
+        if self.hints is None:
+            self.send(player, "CHAT [System]: Hints are not available")
+            return
+        moves = self.engine.moves
+
+        def done(move):
+            # Bỏ gợi ý đến muộn: đã có nước đi mới hoặc ván đã kết thúc
+            if move is not None and self.game_active and self.current is player \
+                    and self.engine.moves == moves:
+                self.send(player, "HINT %d %d" % move)
+
+        self.pending_hints.append(
+            self.hints(self.board, self.symbols[player], self.win_length, done))
+
+    def handle(self, player, data):
+        """Xử lý một thông điệp của người chơi `player`: dòng chữ hoặc lệnh đã tách (wire.FrameReader); None = mất kết nối."""
+        if data is None:
+            self.disconnect(player)
+            return
+
+        start = perf_counter()
+        metrics.messages_in.inc()
+        parts = wire.split(data)
+        if not parts: return
+        cmd = parts[0]
+        metrics.commands.inc(cmd)
+        other = self.opponent(player)
+        if not self.game_active:
+            self.set_clock("idle", self.idle_time, self.idle)
+
+        if cmd == "CHAT":
+            msg = " ".join(parts[1:])
+            if self.chat is not None:
+                msg = self.chat.say(player, self.symbols[player], msg)
+                if msg is None:
+                    metrics.chat_limited.inc()
+                    if self.chat.throttled(player):
+                        self.send(player, game_chat.SLOW_NOTICE)
+                    return
+            self.send(other, f"CHAT {msg}")
+
+        elif cmd == "HISTORY":
+            room = self.chat if self.chat is not None else game_chat.Room()
+            for line in room.page_lines(parts[1:]):
+                self.send(player, line)
+
+        elif cmd == "REMATCH":
+            if not self.game_active:
+                self.rematch_status[player] = True
+                # Notify opponent via chat
+                self.send(other, "CHAT [System]: Opponent wants a rematch!")
+
+                # Check if both accepted
+                if self.rematch_status[self.p1] and self.rematch_status[self.p2]:
+                    self.start()
+                    return
+
+        elif cmd == "MOVE" and len(parts) == 3 and self.game_active:
+            if player is not self.current:
+                self.send(player, "INVALID Not your turn")
+                return
+            try:
+                x, y = int(parts[1]), int(parts[2])
+            except: return
+
+            # Thời gian từng pha của nước đi (metrics.py); ghi nhật ký và khán giả không tính
+            t0 = perf_counter()
+            sym = self.symbols[player]
+            ok, reason = apply_move(self.board, x, y, sym)
+
+            if not ok:
+                self.send(player, f"INVALID {reason}")
+                return
+
+            self.engine.apply_move(x, y, sym)
+            t1 = perf_counter()
+            if self.journal is not None:
+                self.journal.move(self.game_id, x, y, sym)
+            if self.spectators is not None:
+                self.spectators.move(sym, x, y)
+            self.cancel_hints()
+            t2 = perf_counter()
+            won = self.engine.check_win(x, y)
+            full = not won and self.engine.is_full()
+            t3 = perf_counter()
+            self.send(other, f"OPPONENT {x} {y}")
+
+            if won:
+                self.send(player, "WIN")
+                self.send(other, "LOSE")
+            elif full:
+                self.send(player, "DRAW")
+                self.send(other, "DRAW")
+            else:
+                self.send(other, "YOUR TURN")
+            t4 = perf_counter()
+            metrics.move_parse.observe(t0 - start)
+            metrics.move_apply.observe(t1 - t0)
+            metrics.move_check.observe(t3 - t2)
+            metrics.move_send.observe(t4 - t3)
+
+            if won:
+                self.end_game(game_journal.X_WIN if sym == 'X' else game_journal.O_WIN)
+            elif full:
+                self.end_game(game_journal.DRAW)
+            else:
+                self.current, self.other = other, player
+                self.set_clock("turn", self.move_time, self.time_up)
+
+        elif cmd == "HINT" and self.game_active and player is self.current:
+            self.request_hint(player)
+
+        elif cmd == "EXIT":
+            self.leave(player)
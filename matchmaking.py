@@ -0,0 +1,252 @@
+# matchmaking.py
+"""
+Ghép cặp theo hệ số Elo.
+
+Người chơi gửi `NAME <tên>` trước PLAY thì được chấm hệ số (bắt đầu từ
+DEFAULT_RATING); ván giữa hai người có tên được tính điểm, kết quả báo trong
+khung chat. Người không có tên coi như DEFAULT_RATING và không bị tính điểm.
+
+Hàng đợi của mỗi bộ luật (Queue) chia người chờ vào các ngăn hệ số rộng
+BUCKET_WIDTH điểm; mỗi ngăn là một deque theo thứ tự vào hàng. Server không
+ghép ngay khi có người vào mà gọi pair() mỗi TICK giây cho cả loạt:
+
+1. trong mỗi ngăn vừa có người vào, ghép lần lượt hai người chờ lâu nhất
+   (cùng ngăn thì chênh nhau dưới BUCKET_WIDTH, luôn nằm trong cửa sổ),
+2. sau bước 1 mỗi ngăn còn nhiều nhất một người; những người này được ghép
+   với người gần hệ số nhất ở ngăn khác nếu chênh lệch nằm trong cửa sổ của
+   một trong hai. Cửa sổ rộng dần theo thời gian chờ (BASE_WINDOW +
+   WIDEN_RATE * giây chờ, tối đa MAX_WINDOW), người chờ lâu được ưu tiên trước.
+
+Mỗi lượt ghép vì vậy chỉ tốn O(số người mới vào + số ngăn), dù hàng đợi dài
+bao nhiêu. Một heap theo thời điểm vào hàng cho biết ai đã chờ quá lâu (để
+ghép với máy); người rời hàng chỉ bị đánh dấu, được bỏ qua khi tới lượt (O(1)).
+
+Đo với 100k người chờ:
+
+    python bench_matchmaking.py --players 100000
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+
+import metrics
+
+DEFAULT_RATING = 1500.0
+PROVISIONAL_GAMES = 30  # dưới số ván này hệ số thay đổi nhanh hơn
+K_PROVISIONAL = 40.0
+K_ESTABLISHED = 20.0
+
+TICK = 0.1           # chu kỳ ghép cặp theo lô (giây)
+BUCKET_WIDTH = 100
+BASE_WINDOW = 100.0  # chênh lệch hệ số chấp nhận được ngay khi vào hàng
+WIDEN_RATE = 20.0    # cửa sổ rộng thêm chừng này điểm mỗi giây chờ
+MAX_WINDOW = 800.0
+
+MAX_NAME = 16
+NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-")
+
+Rating = namedtuple("Rating", "value games")
+
+
+def valid_name(name):
+    return 0 < len(name) <= MAX_NAME and NAME_CHARS.issuperset(name)
+
+
+# --- Hệ số Elo ---
+
+class Ratings:
+    """Hệ số của người chơi theo tên (trong bộ nhớ của tiến trình)."""
+
+    def __init__(self):
+        self.table = {}
+        self.lock = threading.Lock()
+        self.on_record = None  # on_record(tên X, tên O, điểm của X): cluster báo kết quả về broker
+
+    def get(self, name):
+        return self.table.get(name) or Rating(DEFAULT_RATING, 0)
+
+    def set(self, name, rating):
+        with self.lock:
+            self.table[name] = rating
+
+    def record(self, name_x, name_o, score_x):
+        """Cập nhật sau một ván (score_x: 1 X thắng, 0.5 hòa, 0 O thắng); trả về hai cặp (hệ số mới, chênh lệch)."""
+        with self.lock:
+            x, o = self.get(name_x), self.get(name_o)
+            expected_x = 1.0 / (1.0 + 10.0 ** ((o.value - x.value) / 400.0))
+            dx = k_factor(x) * (score_x - expected_x)
+            do = k_factor(o) * (expected_x - score_x)
+            self.table[name_x] = Rating(x.value + dx, x.games + 1)
+            self.table[name_o] = Rating(o.value + do, o.games + 1)
+        if self.on_record is not None:
+            self.on_record(name_x, name_o, score_x)
+        return (x.value + dx, dx), (o.value + do, do)
+
+
+def k_factor(rating):
+    return K_PROVISIONAL if rating.games < PROVISIONAL_GAMES else K_ESTABLISHED
+
+
+def rater(name_x, name_o, table=None):
+    """
+    Hàm chấm điểm cho Match (rated): ghi kết quả từng ván vào bảng hệ số và
+    trả về dòng báo cho hai người chơi; None nếu ván không được tính điểm.
+    """
+    if not name_x or not name_o or name_x == name_o:
+        return None
+    table = table or ratings
+
+    def rated(score_x):
+        (rx, dx), (ro, do) = table.record(name_x, name_o, score_x)
+        return f"CHAT [System]: Rating {name_x} {rx:.0f} ({dx:+.0f}), {name_o} {ro:.0f} ({do:+.0f})"
+    return rated
+
+
+ratings = Ratings()
+
+
+# --- Hàng đợi ghép cặp ---
+
+class Entry:
+    __slots__ = ("player", "name", "rating", "since", "waiting")
+
+    def __init__(self, player, name, rating, since):
+        self.player = player
+        self.name = name
+        self.rating = rating
+        self.since = since
+        self.waiting = True
+
+
+class Queue:
+    """Người chờ của một bộ luật (kích thước bàn, số quân thắng)."""
+
+    def __init__(self, bucket_width=BUCKET_WIDTH, base_window=BASE_WINDOW,
+                 widen_rate=WIDEN_RATE, max_window=MAX_WINDOW):
+        self.bucket_width = bucket_width
+        self.base_window = base_window
+        self.widen_rate = widen_rate
+        self.max_window = max_window
+        self.buckets = {}     # số ngăn -> deque các Entry theo thứ tự vào hàng
+        self.fresh = set()    # các ngăn có người mới vào từ lần ghép trước
+        self.by_time = []     # heap (thời điểm vào hàng, thứ tự, Entry)
+        self.counter = itertools.count()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, player, rating=DEFAULT_RATING, name=None, now=None):
+        """Vào hàng; trả về Entry (để rời hàng bằng remove())."""
+        if now is None:
+            now = time.monotonic()
+        entry = Entry(player, name, rating, now)
+        bucket = int(rating // self.bucket_width)
+        self.buckets.setdefault(bucket, deque()).append(entry)
+        self.fresh.add(bucket)
+        heapq.heappush(self.by_time, (now, next(self.counter), entry))
+        self.count += 1
+        return entry
+
+    def remove(self, entry):
+        """Rời hàng (mất kết nối, hủy); Entry được dọn khi tới lượt."""
+        if entry.waiting:
+            entry.waiting = False
+            self.count -= 1
+
+    def window(self, entry, now):
+        return min(self.max_window, self.base_window + self.widen_rate * (now - entry.since))
+
+    def _take(self, a, b, pairs, now):
+        a.waiting = b.waiting = False
+        self.count -= 2
+        metrics.queue_wait.observe(now - a.since)
+        metrics.queue_wait.observe(now - b.since)
+        pairs.append((a, b) if a.since <= b.since else (b, a))
+
+    def _head(self, bucket):
+        """Người chờ lâu nhất còn trong ngăn (dọn các Entry đã rời hàng ở đầu)."""
+        queue = self.buckets.get(bucket)
+        if queue is None:
+            return None
+        while queue and not queue[0].waiting:
+            queue.popleft()
+        if not queue:
+            del self.buckets[bucket]
+            return None
+        return queue[0]
+
+    def pair(self, now=None):
+        """Ghép cả loạt; trả về danh sách (Entry chờ lâu hơn, Entry kia)."""
+        if now is None:
+            now = time.monotonic()
+        pairs = []
+
+        # 1. Cùng ngăn: ghép theo thứ tự vào hàng
+        for bucket in self.fresh:
+            queue = self.buckets.pop(bucket, None)
+            if queue is None:
+                continue
+            live = deque(e for e in queue if e.waiting)
+            while len(live) >= 2:
+                a = live.popleft()
+                self._take(a, live.popleft(), pairs, now)
+            if live:
+                self.buckets[bucket] = live  # còn một người: chờ lượt sau
+        self.fresh.clear()
+
+        # 2. Khác ngăn: mỗi ngăn còn nhiều nhất một người, ghép người gần hệ số nhất
+        heads = sorted((e for e in map(self._head, list(self.buckets)) if e is not None),
+                       key=lambda e: e.rating)
+        if len(heads) > 1:
+            position = {id(e): i for i, e in enumerate(heads)}
+            for a in sorted(heads, key=lambda e: e.since):
+                if not a.waiting:
+                    continue
+                i = position[id(a)]
+                best = None
+                for step in (-1, 1):
+                    j = i + step
+                    while 0 <= j < len(heads) and not heads[j].waiting:
+                        j += step
+                    if 0 <= j < len(heads):
+                        b = heads[j]
+                        diff = abs(a.rating - b.rating)
+                        if diff <= max(self.window(a, now), self.window(b, now)) and \
+                                (best is None or diff < abs(a.rating - best.rating)):
+                            best = b
+                if best is not None:
+                    self._take(a, best, pairs, now)
+            for e in heads:
+                if not e.waiting:
+                    self._head(int(e.rating // self.bucket_width))  # dọn ngăn
+
+        # Heap chỉ giữ người còn chờ: dọn đầu heap để expired() và oldest() luôn O(log n)
+        self._trim()
+        return pairs
+
+    def _trim(self):
+        by_time = self.by_time
+        while by_time and not by_time[0][2].waiting:
+            heapq.heappop(by_time)
+
+    def oldest(self):
+        """Entry chờ lâu nhất (hoặc None)."""
+        self._trim()
+        return self.by_time[0][2] if self.by_time else None
+
+    def expired(self, wait, now=None):
+        """Lấy ra những người đã chờ từ `wait` giây trở lên (để ghép với máy)."""
+        if now is None:
+            now = time.monotonic()
+        out = []
+        while True:
+            entry = self.oldest()
+            if entry is None or now - entry.since < wait:
+                return out
+            heapq.heappop(self.by_time)
+            self.remove(entry)
+            metrics.queue_wait.observe(now - entry.since)
+            out.append(entry)
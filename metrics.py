@@ -0,0 +1,305 @@
+# metrics.py
+"""
+Số đo của server, xem qua HTTP theo định dạng văn bản của Prometheus.
+
+    python server.py --metrics-port 9100
+    curl -s localhost:9100/metrics
+
+Cổng chỉ mở trên 127.0.0.1. Ở chế độ --workers, broker (hàng đợi ghép cặp,
+các ván chờ RESUME) dùng đúng cổng này, worker thứ i dùng cổng + 1 + i.
+
+Có hai loại số đo:
+
+- đếm và đo thời gian trên đường nóng (lệnh của người chơi, các pha xử lý
+  một nước đi, thời gian chờ ghép cặp, thời gian máy tìm nước): mỗi lần chỉ
+  là một lần next() hay deque.append(), không khóa, đủ rẻ để luôn bật;
+- số đo trạng thái (số trận, số người chờ, số phòng, số khán giả, bộ đếm của outbox.py)
+  chỉ được tính lúc có người đọc /metrics, không tốn gì giữa hai lần đọc.
+
+Đo chi phí mỗi lần đếm/đo:
+
+    python metrics.py
+"""
+import argparse
+import bisect
+import itertools
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lobby
+import outbox
+import sessions
+import spectators
+
+# Thời gian xử lý trên server: từ micro giây tới vài chục mili giây
+FAST_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.025)
+# Thời gian chờ của người: ghép cặp, máy suy nghĩ
+SLOW_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COMMANDS = ("MOVE", "CHAT", "REMATCH", "HINT", "HISTORY", "EXIT")  # lệnh khác đếm chung là "other"
+FOLD_EVERY = 1024  # Histogram gộp các giá trị đang chờ sau chừng này lần đo
+
+
+def _labels(labels):
+    return "{%s}" % ",".join('%s="%s"' % kv for kv in labels) if labels else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _read(count):
+    """Giá trị hiện tại của itertools.count mà không tăng nó."""
+    return int(repr(count)[6:-1])
+
+
+# Đường nóng không dùng khóa: next() của itertools.count và deque.append()
+# là nguyên tử trong CPython, nhiều luồng đếm cùng lúc không mất lần nào.
+
+class Counter:
+    """Số đếm chỉ tăng; fn: đọc giá trị lúc xuất (số đếm có sẵn ở nơi khác)."""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.fn = fn
+        self.count = itertools.count()
+
+    def inc(self):
+        next(self.count)
+
+    def samples(self):
+        value = self.fn() if self.fn is not None else _read(self.count)
+        return [(self.name + _labels(self.labels), value)]
+
+
+class Gauge(Counter):
+    """Giá trị hiện tại, tính bằng fn lúc xuất."""
+    kind = "gauge"
+
+    def set_function(self, fn):
+        self.fn = fn
+
+
+class CommandCounter:
+    """Số lệnh theo tên lệnh; tên lạ gộp vào "other" để số nhãn luôn có hạn."""
+    kind = "counter"
+
+    def __init__(self, name, help, known=COMMANDS):
+        self.name = name
+        self.help = help
+        self.counts = {command: itertools.count() for command in known + ("other",)}
+        self.other = self.counts["other"]
+
+    def inc(self, command):
+        next(self.counts.get(command, self.other))
+
+    def samples(self):
+        return [(self.name + _labels([("command", c)]), _read(n)) for c, n in self.counts.items()]
+
+
+class Histogram:
+    """
+    Phân bố thời gian (giây) theo các ngưỡng cố định. observe() chỉ thêm giá
+    trị vào hàng chờ; việc xếp vào ô được làm theo lô (mỗi FOLD_EVERY lần đo,
+    hoặc lúc xuất).
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=FAST_BUCKETS, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # ô cuối: lớn hơn mọi ngưỡng
+        self.sum = 0.0
+        self.pending = deque()
+        self.lock = threading.Lock()  # chỉ khi gộp
+
+    def observe(self, seconds):
+        pending = self.pending
+        pending.append(seconds)
+        if len(pending) >= FOLD_EVERY:
+            self.fold()
+
+    def fold(self):
+        with self.lock:
+            pending = self.pending
+            counts = self.counts
+            bounds = self.bounds
+            total = 0.0
+            # Chỉ lấy số giá trị đang có: luồng khác vẫn có thể thêm vào cuối
+            for _ in range(len(pending)):
+                seconds = pending.popleft()
+                counts[bisect.bisect_left(bounds, seconds)] += 1
+                total += seconds
+            self.sum += total
+
+    def samples(self):
+        self.fold()
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        out = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + ("+Inf",), counts):
+            cumulative += n
+            le = bound if isinstance(bound, str) else "%g" % bound
+            out.append((self.name + "_bucket" + _labels(self.labels + (("le", le),)), cumulative))
+        out.append((self.name + "_sum" + _labels(self.labels), total))
+        out.append((self.name + "_count" + _labels(self.labels), cumulative))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Toàn bộ số đo theo định dạng văn bản của Prometheus (0.0.4)."""
+        lines = []
+        seen = set()
+        for m in self.metrics:
+            if m.name not in seen:
+                seen.add(m.name)
+                lines.append(f"# HELP {m.name} {m.help}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+            try:
+                samples = m.samples()
+            except Exception:
+                continue  # fn của số đo trạng thái lỗi: bỏ qua, không làm hỏng cả trang
+            lines.extend(f"{name} {_number(value)}" for name, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Số đo của server ---
+
+connections = registry.add(Counter("caro_connections_total", "Kết nối đã nhận"))
+games = registry.add(Counter("caro_games_total", "Ván đã bắt đầu hoặc tiếp tục (RESUME)"))
+messages_in = registry.add(Counter("caro_messages_in_total", "Lệnh nhận từ người chơi trong trận"))
+commands = registry.add(CommandCounter("caro_commands_total", "Lệnh nhận từ người chơi, theo tên lệnh"))
+
+# Một nước đi hợp lệ, chia theo pha (Match.handle)
+PHASES = ("parse", "apply_move", "check_win", "send")
+move_parse, move_apply, move_check, move_send = (
+    registry.add(Histogram("caro_move_seconds", "Thời gian xử lý một nước đi, theo pha",
+                           labels=[("phase", phase)]))
+    for phase in PHASES)
+
+chat_limited = registry.add(Counter("caro_chat_limited_total", "Dòng CHAT bị bỏ vì người gửi vượt giới hạn tốc độ"))
+
+queue_wait = registry.add(Histogram("caro_queue_wait_seconds", "Thời gian chờ ghép cặp (với người hoặc máy)",
+                                    SLOW_BUCKETS))
+bot_search = registry.add(Histogram("caro_bot_search_seconds", "Thời gian máy tìm một nước đi",
+                                    SLOW_BUCKETS))
+
+# Trạng thái, tính lúc xuất. Hàng đợi ghép cặp nằm ở server đang chạy (watch_queues).
+queue_depth = registry.add(Gauge("caro_queue_depth", "Người đang chờ ghép cặp", fn=lambda: 0))
+matches = registry.add(Gauge("caro_matches_active", "Trận đang chạy", fn=lambda: len(spectators.hub)))
+rooms = registry.add(Gauge("caro_lobby_rooms", "Phòng đang chờ người vào (lobby.py)",
+                           fn=lambda: len(lobby.rooms)))
+held = registry.add(Gauge("caro_sessions_held", "Ván đang chờ người mất kết nối quay lại (RESUME)",
+                          fn=lambda: len(sessions.registry)))
+
+
+def _viewers():
+    with spectators.hub.lock:
+        channels = list(spectators.hub.channels.values())
+    return sum(len(ch) for ch in channels)
+
+
+viewers = registry.add(Gauge("caro_spectators", "Khán giả đang xem (WATCH)", fn=_viewers))
+active = registry.add(Gauge(
+    "caro_connections_active", "Kết nối đang mở: người chơi trong trận (kể cả máy), đang chờ, đang giữ chỗ, khán giả",
+    fn=lambda: 2 * len(spectators.hub) + queue_depth.fn() + len(sessions.registry) + _viewers()))
+
+for _field, _help in (("messages", "Thông điệp gửi cho người chơi"),
+                      ("bytes", "Số byte gửi cho người chơi"),
+                      ("writes", "Số lần ghi ra socket (outbox.py)"),
+                      ("drops", "Dòng CHAT bỏ vì người nhận quá chậm"),
+                      ("disconnects", "Kết nối bị ngắt vì đọc quá chậm")):
+    registry.add(Counter(f"caro_out_{_field}_total", _help,
+                         fn=lambda field=_field: outbox.stats.snapshot()[field]))
+
+
+def watch_queues(waiting):
+    """Số người chờ được đọc từ dict {luật: matchmaking.Queue} của server đang chạy."""
+    queue_depth.set_function(lambda: sum(map(len, list(waiting.values()))))
+
+
+# --- Cổng HTTP ---
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # không in mỗi lần Prometheus đọc
+
+
+_port = 0
+
+def configure(port):
+    """Cổng HTTP xem số đo (0 = tắt)."""
+    global _port
+    _port = port
+
+def serve(offset=0, host="127.0.0.1"):
+    """Mở cổng (cổng đã cấu hình + offset) trên một luồng nền; None nếu tắt hoặc không mở được."""
+    if not _port:
+        return None
+    try:
+        httpd = ThreadingHTTPServer((host, _port + offset), Handler)
+    except OSError as e:
+        print(f"Metrics port {_port + offset} unavailable: {e}")
+        return None
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"Metrics on http://{host}:{_port + offset}/metrics")
+    return httpd
+
+
+# --- Đo chi phí ---
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    args = parser.parse_args()
+    n = args.rounds
+    counter = Counter("c", "")
+    histogram = Histogram("h", "")
+    command = CommandCounter("k", "")
+    clock = time.perf_counter
+    for name, op in (("perf_counter()", clock),
+                     ("Counter.inc()", counter.inc),
+                     ("CommandCounter.inc('MOVE')", lambda: command.inc("MOVE")),
+                     ("Histogram.observe(3e-5)", lambda: histogram.observe(3e-5))):
+        t0 = clock()
+        for _ in range(n):
+            op()
+        print(f"{name:>28}: {(clock() - t0) / n * 1e9:6.0f} ns")
+    t0 = clock()
+    page = registry.render()
+    print(f"render /metrics: {(clock() - t0) * 1e3:.2f} ms, {len(page)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# opening_book.py
+"""
+Sách khai cuộc: các nước đi đã biết cho những thế cờ đầu ván.
+
+Tệp sách là một mảng bản ghi cố định đã sắp xếp theo khóa, đọc qua mmap và
+tìm nhị phân, nên mở sách gần như tức thì và các tiến trình worker cùng dùng
+chung trang nhớ của hệ điều hành thay vì mỗi tiến trình nạp một bản.
+
+    header   <4sHHII   magic, kích thước bàn, số quân thắng, số nước tối đa, số bản ghi
+    bản ghi  <QHI      khóa thế cờ, ô (x * size + y), trọng số
+
+Khóa là băm Zobrist (bảng của ai.py) của thế cờ đã chuẩn hóa theo 8 phép đối
+xứng của bàn (4 phép quay x 2 phép lật): lấy giá trị nhỏ nhất trong 8 băm, và
+nước đi được lưu theo đúng phép biến đổi đó. Nhờ vậy một khai cuộc và các
+bản xoay/lật của nó dùng chung một mục.
+
+Dựng sách từ các ván đã ghi (tệp văn bản hoặc nhật ký journal.py của server)
+và từ phân tích của engine:
+
+    python opening_book.py build opening_book.bin --journal journal/ --selfplay 200
+    python opening_book.py show opening_book.bin 7,7 8,8
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from bisect import bisect_left
+from collections import Counter
+
+import journal
+from ai import LEVELS, SIDE_KEY, Engine, zobrist_table
+from game_logic import DEFAULT_SIZE, EMPTY, WIN_LENGTH, Board, apply_move
+
+MAGIC = b"CBK1"
+HEADER = struct.Struct("<4sHHII")
+RECORD = struct.Struct("<QHI")
+KEY = struct.Struct("<Q")
+
+MAX_PLY = 12          # chỉ ghi thế cờ có tối đa chừng này quân
+ENGINE_WEIGHT = 1     # trọng số mỗi lần engine chọn một nước
+GAME_WEIGHT = 1       # trọng số mỗi lần nước đó xuất hiện trong ván đã ghi
+
+
+# --- Đối xứng ---
+
+_SYMMETRIES = {}
+
+def symmetries(size):
+    """8 hoán vị ô (ô -> ô sau biến đổi) và hoán vị ngược tương ứng."""
+    perms = _SYMMETRIES.get(size)
+    if perms is None:
+        m = size - 1
+        transforms = (
+            lambda x, y: (x, y), lambda x, y: (y, m - x),
+            lambda x, y: (m - x, m - y), lambda x, y: (m - y, x),
+            lambda x, y: (x, m - y), lambda x, y: (m - x, y),
+            lambda x, y: (y, x), lambda x, y: (m - y, m - x),
+        )
+        forward = []
+        for t in transforms:
+            perm = [0] * (size * size)
+            for x in range(size):
+                for y in range(size):
+                    tx, ty = t(x, y)
+                    perm[x * size + y] = tx * size + ty
+            forward.append(perm)
+        inverse = []
+        for perm in forward:
+            inv = [0] * len(perm)
+            for c, tc in enumerate(perm):
+                inv[tc] = c
+            inverse.append(inv)
+        perms = _SYMMETRIES[size] = (forward, inverse)
+    return perms
+
+
+def canonical(size, stones, sym):
+    """
+    (khóa, các phép biến đổi cho ra khóa đó) của thế cờ: stones là các
+    (ô, ký hiệu), sym là bên sắp đi. Khóa là băm nhỏ nhất trong 8 bản đối
+    xứng; thế cờ tự đối xứng (ví dụ chỉ có một quân ở tâm) có nhiều phép
+    biến đổi cùng cho ra khóa nhỏ nhất.
+    """
+    zobrist = zobrist_table(size)
+    forward, _ = symmetries(size)
+    best, best_ts = None, []
+    for t, perm in enumerate(forward):
+        key = SIDE_KEY[sym]
+        for c, s in stones:
+            key ^= zobrist[s][perm[c]]
+        if best is None or key < best:
+            best, best_ts = key, [t]
+        elif key == best:
+            best_ts.append(t)
+    return best, best_ts
+
+
+def canonical_cell(size, ts, cell):
+    """Ô của nước đi trong thế chuẩn: nhỏ nhất qua mọi phép biến đổi ra cùng khóa."""
+    forward, _ = symmetries(size)
+    return min(forward[t][cell] for t in ts)
+
+
+def board_stones(board):
+    return [(c, chr(v)) for c, v in enumerate(board.cells) if v != EMPTY]
+
+
+# --- Đọc sách ---
+
+class _Keys:
+    """Dãy khóa của các bản ghi, đọc thẳng từ mmap (cho bisect)."""
+    __slots__ = ("buf", "count")
+
+    def __init__(self, buf, count):
+        self.buf = buf
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return KEY.unpack_from(self.buf, HEADER.size + i * RECORD.size)[0]
+
+
+class OpeningBook:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.win_length, self.max_ply, self.count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an opening book")
+        self.keys = _Keys(self.mm, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def entries(self, key):
+        """Các (ô, trọng số) đã lưu cho khóa đã chuẩn hóa."""
+        found = []
+        i = bisect_left(self.keys, key)
+        while i < self.count:
+            k, cell, weight = RECORD.unpack_from(self.mm, HEADER.size + i * RECORD.size)
+            if k != key:
+                break
+            found.append((cell, weight))
+            i += 1
+        return found
+
+    def moves(self, board, sym, win_length=WIN_LENGTH):
+        """Các nước (x, y, trọng số) trong sách cho thế cờ này, trọng số giảm dần."""
+        if board.size != self.size or win_length != self.win_length:
+            return []
+        stones = board_stones(board)
+        if len(stones) > self.max_ply:
+            return []
+        key, ts = canonical(self.size, stones, sym)
+        inverse = symmetries(self.size)[1]
+        found = {}
+        for cell, weight in self.entries(key):
+            # Thế cờ tự đối xứng: mọi nước tương đương với nước đã lưu đều tốt như nhau
+            for t in ts:
+                c = inverse[t][cell]
+                if board.cells[c] == EMPTY:
+                    found[c] = weight
+        return sorted(((c // self.size, c % self.size, w) for c, w in found.items()),
+                      key=lambda m: -m[2])
+
+    def lookup(self, board, sym, win_length=WIN_LENGTH, rng=None):
+        """Nước (x, y) của sách: trọng số cao nhất, hoặc chọn ngẫu nhiên theo trọng số nếu có rng."""
+        found = self.moves(board, sym, win_length)
+        if not found:
+            return None
+        if rng is None:
+            x, y, _ = found[0]
+        else:
+            x, y, _ = rng.choices(found, weights=[w for _, _, w in found])[0]
+        return x, y
+
+    def close(self):
+        self.mm.close()
+
+
+# --- Sách dùng chung của tiến trình ---
+
+DEFAULT_PATH = "opening_book.bin"
+
+_path = DEFAULT_PATH
+_book = None
+_loaded = False
+
+def configure(path):
+    """Đường dẫn sách (None = không dùng sách)."""
+    global _path, _book, _loaded
+    _path, _book, _loaded = path, None, False
+
+def default_book():
+    """Sách của tiến trình hiện tại, mở khi cần lần đầu; None nếu không có tệp sách."""
+    global _book, _loaded
+    if not _loaded:
+        _loaded = True
+        if _path and os.path.exists(_path):
+            try:
+                _book = OpeningBook(_path)
+            except (OSError, ValueError) as e:
+                print(f"[!] Opening book disabled: {e}")
+    return _book
+
+
+# --- Dựng sách ---
+
+def add_game(counts, size, moves, plies, weight=GAME_WEIGHT):
+    """Cộng các nước đầu ván (dãy (x, y), X đi trước) vào bảng đếm."""
+    stones = []
+    for i, (x, y) in enumerate(moves[:plies]):
+        sym = 'XO'[i % 2]
+        key, ts = canonical(size, stones, sym)
+        cell = x * size + y
+        counts[key, canonical_cell(size, ts, cell)] += weight
+        stones.append((cell, sym))
+
+
+def selfplay_lines(count, size, win_length, plies, level, seed=0):
+    """
+    Phân tích bằng engine: mỗi ván bắt đầu bằng một quân ngẫu nhiên gần
+    tâm, sau đó engine tự chơi cả hai bên tới `plies` nước.
+    """
+    rng = random.Random(seed)
+    engine = Engine(size, win_length)
+    center = size // 2
+    for _ in range(count):
+        engine.reset()
+        x = min(size - 1, max(0, center + rng.randint(-2, 2)))
+        y = min(size - 1, max(0, center + rng.randint(-2, 2)))
+        moves = [(x, y)]
+        engine.place(x, y, 'X')
+        for i in range(1, plies):
+            sym = 'XO'[i % 2]
+            x, y = engine.best_move(sym, level)
+            engine.place(x, y, sym)
+            moves.append((x, y))
+            if engine.bits.check_win(x, y):
+                break
+        yield moves
+
+
+def read_games(path):
+    """Tệp văn bản, mỗi dòng một ván: các nước `x,y` cách nhau bởi khoảng trắng."""
+    with open(path) as f:
+        for line in f:
+            moves = [tuple(map(int, m.split(","))) for m in line.split()]
+            if moves:
+                yield moves
+
+
+def write_book(path, counts, size, win_length, plies):
+    records = sorted(counts.items(), key=lambda item: (item[0][0], -item[1]))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, size, win_length, plies, len(records)))
+        for (key, cell), weight in records:
+            f.write(RECORD.pack(key, cell, min(weight, 0xFFFFFFFF)))
+    os.replace(tmp, path)  # server đang mmap tệp cũ vẫn đọc được tới khi mở lại
+    return len(records)
+
+
+def build(args):
+    counts = Counter()
+    games = 0
+    for path in args.games:
+        for moves in read_games(path):
+            add_game(counts, args.size, moves, args.plies)
+            games += 1
+    for path in args.journal:
+        for game in journal.iter_games(journal.segments(path)):
+            # Chỉ học từ ván cùng luật, chơi đủ (bỏ các ván bị bỏ dở)
+            if (game.size, game.win_length) != (args.size, args.win) or game.result == journal.ABANDONED:
+                continue
+            add_game(counts, args.size, [(x, y) for x, y, _ in game.moves], args.plies)
+            games += 1
+    for moves in selfplay_lines(args.selfplay, args.size, args.win, args.plies,
+                                LEVELS[args.level], args.seed):
+        add_game(counts, args.size, moves, args.plies, ENGINE_WEIGHT)
+        games += 1
+    n = write_book(args.out, counts, args.size, args.win, args.plies)
+    print(f"{games} games -> {n} entries, {os.path.getsize(args.out)} bytes: {args.out}")
+
+
+def show(args):
+    book = OpeningBook(args.book)
+    board = Board(book.size)
+    for i, m in enumerate(args.moves):
+        x, y = map(int, m.split(","))
+        apply_move(board, x, y, 'XO'[i % 2])
+    sym = 'XO'[len(args.moves) % 2]
+    print(f"{book.size}x{book.size}, {book.win_length} in a row, {len(book)} entries")
+    for x, y, weight in book.moves(board, sym, book.win_length):
+        print(f"{sym} {x},{y}  weight {weight}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Opening book tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="build a book from recorded games and engine self-play")
+    p.add_argument("out")
+    p.add_argument("--games", nargs="*", default=[], help="text files, one game per line")
+    p.add_argument("--journal", nargs="*", default=[], help="server journal directories or segments")
+    p.add_argument("--selfplay", type=int, default=0, help="number of engine-analysed openings")
+    p.add_argument("--level", choices=sorted(LEVELS), default="easy")
+    p.add_argument("--plies", type=int, default=MAX_PLY)
+    p.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    p.add_argument("--win", type=int, default=WIN_LENGTH)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=build)
+
+    p = sub.add_parser("show", help="list book moves after the given moves (x,y ...)")
+    p.add_argument("book")
+    p.add_argument("moves", nargs="*")
+    p.set_defaults(func=show)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,209 @@
+# outbox.py
+"""
+Bộ đệm gửi của từng kết nối người chơi: gom mọi thông điệp do một sự kiện
+sinh ra (một lệnh, một đồng hồ, một gợi ý) thành một lần ghi.
+
+Match gọi send() nhiều lần cho một nước đi (OPPONENT rồi YOUR TURN, hoặc
+WIN/LOSE kèm dòng hệ số); trước đây mỗi dòng là một sendall() chặn, nên một
+nước đi tốn hai ba syscall, các gói nhỏ vướng Nagle/delayed ACK, và một client
+không đọc làm treo cả luồng của trận. Giờ send() chỉ thêm vào bộ đệm; server
+gọi flush() sau mỗi sự kiện, ghi một lần, không bao giờ chặn.
+
+Lượng dữ liệu chưa gửi được của một kết nối có hai ngưỡng:
+
+    >= HIGH_WATER   người nhận chậm: dừng đọc lệnh của họ (mỗi lệnh sinh thêm
+                    dữ liệu cho chính họ) và bỏ các dòng CHAT gửi tới họ,
+                    tới khi còn <= LOW_WATER
+    >  MAX_BUFFER   coi như mất kết nối (đóng, giữ chỗ theo --grace như thường)
+
+`stats` đếm cho cả tiến trình: số byte, số lần ghi, số thông điệp, số dòng
+bị bỏ và số kết nối bị ngắt vì đọc quá chậm.
+"""
+import socket
+import threading
+
+import wire
+
+HIGH_WATER = 64 * 1024
+LOW_WATER = 16 * 1024
+MAX_BUFFER = 1024 * 1024
+FLUSH_TIMEOUT = 1.0  # trận xong: chờ gửi nốt phần còn lại tối đa chừng này giây
+
+
+class Stats:
+    """Bộ đếm gửi đi của tiến trình."""
+
+    FIELDS = ("messages", "bytes", "writes", "drops", "disconnects")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+        self.writes = 0
+        self.drops = 0        # dòng CHAT bỏ vì người nhận quá chậm
+        self.disconnects = 0  # kết nối bị ngắt vì vượt MAX_BUFFER
+
+    def wrote(self, messages, nbytes):
+        with self.lock:
+            self.messages += messages
+            self.bytes += nbytes
+            self.writes += 1
+
+    def dropped(self):
+        with self.lock:
+            self.drops += 1
+
+    def disconnected(self):
+        with self.lock:
+            self.disconnects += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __str__(self):
+        s = self.snapshot()
+        per_write = s["messages"] / s["writes"] if s["writes"] else 0.0
+        return ("%(messages)d messages, %(bytes)d bytes in %(writes)d writes, "
+                "%(drops)d dropped, %(disconnects)d slow consumers disconnected" % s
+                + " (%.2f messages/write)" % per_write)
+
+
+stats = Stats()
+
+
+class Outbox:
+    """
+    Bộ đệm chung cho hai chế độ server; lớp con chỉ khác cách ghi ra mạng.
+
+    paused: đang vượt HIGH_WATER (server ngừng đọc lệnh của kết nối này).
+    closed: ghi lỗi hoặc vượt MAX_BUFFER; server báo trận là người này mất kết nối.
+    """
+    __slots__ = ("conn", "encode", "buf", "count", "paused", "closed", "overflow")
+
+    def __init__(self, conn, encode=wire.encode_line):
+        self.conn = conn
+        self.encode = encode
+        self.buf = bytearray()
+        self.count = 0  # số thông điệp đang nằm trong buf
+        self.paused = False
+        self.closed = False
+        self.overflow = False
+
+    def put(self, msg):
+        if self.closed:
+            return
+        if self.paused and msg.startswith("CHAT"):
+            stats.dropped()
+            return
+        self.buf += self.encode(msg)
+        self.count += 1
+
+    def backlog(self):
+        """Số byte chưa ra tới mạng."""
+        return len(self.buf)
+
+    def flush(self):
+        raise NotImplementedError
+
+    def watermarks(self):
+        size = self.backlog()
+        if size > MAX_BUFFER:
+            self.overflow = True
+            self.close()
+            stats.disconnected()
+        elif size >= HIGH_WATER:
+            self.paused = True
+        elif self.paused and size <= LOW_WATER:
+            self.paused = False
+
+    def close(self):
+        self.closed = True
+        self.buf.clear()
+        self.count = 0
+
+
+class SocketOutbox(Outbox):
+    """Chế độ luồng: socket không chặn; phần chưa gửi được chờ EVENT_WRITE (blocked)."""
+    __slots__ = ("blocked",)
+
+    def __init__(self, conn, encode=wire.encode_line):
+        Outbox.__init__(self, conn, encode)
+        self.blocked = False
+        conn.setblocking(False)
+
+    def flush(self):
+        """Ghi những gì đang chờ bằng một send(); True nếu còn dữ liệu chờ socket ghi được."""
+        if self.closed:
+            return False
+        if self.buf and not self.blocked:
+            try:
+                sent = self.conn.send(self.buf)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.close()
+                return False
+            if sent:
+                stats.wrote(self.count, sent)
+                self.count = 0
+                del self.buf[:sent]
+            self.blocked = bool(self.buf)
+        self.watermarks()
+        return self.blocked
+
+    def close(self):
+        Outbox.close(self)
+        try:
+            # Client thấy mất kết nối và có thể quay lại (RESUME)
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def writable(self):
+        """Selector báo socket ghi được tiếp."""
+        self.blocked = False
+        self.flush()
+
+    def drain(self, timeout=FLUSH_TIMEOUT):
+        """Trận đã xong: gửi nốt (chặn tối đa timeout giây) rồi trả socket về chế độ chặn."""
+        try:
+            if self.buf and not self.closed:
+                self.conn.settimeout(timeout)
+                self.conn.sendall(self.buf)
+                stats.wrote(self.count, len(self.buf))
+            self.conn.settimeout(None)
+        except OSError:
+            pass
+        self.buf.clear()
+        self.count = 0
+
+
+class StreamOutbox(Outbox):
+    """asyncio: transport tự giữ phần chưa gửi được; drain() của writer chờ xuống dưới LOW_WATER."""
+    __slots__ = ()
+
+    def __init__(self, writer, encode=wire.encode_line):
+        Outbox.__init__(self, writer, encode)
+        writer.transport.set_write_buffer_limits(high=HIGH_WATER, low=LOW_WATER)
+
+    def backlog(self):
+        return len(self.buf) + self.conn.transport.get_write_buffer_size()
+
+    def flush(self):
+        if self.closed or not self.buf:
+            return False
+        writer = self.conn
+        if writer.transport.is_closing():
+            self.close()
+            return False
+        writer.write(bytes(self.buf))
+        stats.wrote(self.count, len(self.buf))
+        self.buf.clear()
+        self.count = 0
+        self.watermarks()
+        return False
+
+    def close(self):
+        Outbox.close(self)
+        self.conn.transport.abort()
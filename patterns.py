@@ -0,0 +1,217 @@
+# patterns.py
+"""
+Đánh giá thế cờ theo mẫu (bốn, ba mở, ba gãy...) bằng bảng tra dựng sẵn.
+
+Mỗi đường (hàng, cột, chéo) được mã hóa thành một số nguyên, 2 bit mỗi ô:
+0 trống, 1 X, 2 O, 3 tường (ngoài bàn). Hai đầu đường có thêm một ô tường.
+Một "cửa sổ" gồm win_length ô liền nhau cùng một ô ngữ cảnh ở mỗi đầu; mã
+của cửa sổ là chỉ số vào bảng pattern_table(), cho ra điểm của cửa sổ đó theo
+góc nhìn X (điểm của X trừ điểm của O).
+
+Luật riêng của trò này được tính ngay trong bảng: cửa sổ có hai đầu đều là
+quân đối thủ thì không bao giờ thành chuỗi thắng (bị chặn 2 đầu), còn tường
+thì không tính là chặn. Vì vậy "bốn" kẹp giữa hai quân đối thủ có 0 điểm.
+
+Khi đặt hoặc gỡ một quân, chỉ các cửa sổ chứa ô đó trên 4 đường đi qua nó
+được tra lại, nên điểm cả bàn được cập nhật dần với vài chục lần tra bảng.
+"""
+from game_logic import DEFAULT_SIZE, WIN_LENGTH
+
+EMPTY, X, O, WALL = 0, 1, 2, 3
+CODE = {'X': X, 'O': O}
+
+WIN_VALUE = 10 ** 7
+# Điểm cửa sổ theo số quân còn thiếu để đủ win_length: thiếu 1 (bốn), thiếu 2 (ba)...
+MISSING_VALUE = (WIN_VALUE, 1000, 100, 10, 1)
+OPEN_BONUS = 2       # ba/hai có cả hai ô ngữ cảnh trống: dễ thành mẫu mở
+MAX_DENSE_WIN = 7    # win_length lớn hơn thì bảng 4^(k+2) quá lớn: tra lười thay vì dựng sẵn
+
+
+def _side_value(cells, own, opp, win_length):
+    """Điểm của cửa sổ cho bên `own`."""
+    inner = cells[1:-1]
+    if opp in inner or WALL in inner:
+        return 0
+    before, after = cells[0], cells[-1]
+    n = inner.count(own)
+    if n == 0:
+        return 0
+
+    if n == win_length:
+        if before == own:
+            return 0  # không phải đầu chuỗi: chuỗi này đã được tính ở cửa sổ trước
+        if before == opp and after == opp:
+            return 0  # đủ quân nhưng bị chặn 2 đầu: không thắng
+        if before == opp and after == own:
+            # Chuỗi dài hơn cửa sổ: không thấy đầu kia có bị chặn không,
+            # chỉ tính như một nước bốn (thắng thật vẫn do check_win quyết định)
+            return MISSING_VALUE[1]
+        return WIN_VALUE
+
+    if before == opp and after == opp:
+        return 0  # lấp đầy cửa sổ này cũng chỉ ra chuỗi bị chặn 2 đầu
+    missing = win_length - n
+    if missing >= len(MISSING_VALUE):
+        return 0
+    value = MISSING_VALUE[missing]
+    if missing >= 2 and before == EMPTY and after == EMPTY:
+        value *= OPEN_BONUS
+    return value
+
+
+def window_value(code, win_length):
+    """Điểm (góc nhìn X) của cửa sổ có mã `code`."""
+    width = win_length + 2
+    cells = [(code >> (2 * k)) & 3 for k in range(width)]
+    return (_side_value(cells, X, O, win_length) -
+            _side_value(cells, O, X, win_length))
+
+
+class _LazyTable(dict):
+    def __init__(self, win_length):
+        super().__init__()
+        self.win_length = win_length
+
+    def __missing__(self, code):
+        value = self[code] = window_value(code, self.win_length)
+        return value
+
+
+_TABLES = {}
+
+def pattern_table(win_length=WIN_LENGTH):
+    """Bảng điểm cho mọi cửa sổ có thể có (4^(win_length+2) mục), dựng một lần."""
+    table = _TABLES.get(win_length)
+    if table is None:
+        if win_length <= MAX_DENSE_WIN:
+            table = [window_value(code, win_length) for code in range(4 ** (win_length + 2))]
+        else:
+            table = _LazyTable(win_length)
+        _TABLES[win_length] = table
+    return table
+
+
+_GEOMETRY = {}
+
+def _geometry(size):
+    """
+    Đánh số mọi đường của bàn (hàng, cột, chéo chính, chéo phụ). Trả về
+    (độ dài từng đường, với mỗi ô: 4 cặp (chỉ số đường, vị trí trong đường)).
+    Vị trí tính cả ô tường ở đầu, nên ô thật đầu tiên có vị trí 1.
+    """
+    geo = _GEOMETRY.get(size)
+    if geo is not None:
+        return geo
+
+    lengths = []
+    index = {}
+
+    def line(kind, key, n):
+        index[kind, key] = len(lengths)
+        lengths.append(n)
+
+    for x in range(size):
+        line('row', x, size)
+    for y in range(size):
+        line('col', y, size)
+    for d in range(-(size - 1), size):
+        line('diag', d, size - abs(d))
+    for s in range(2 * size - 1):
+        line('anti', s, size - abs(s - (size - 1)))
+
+    cells = []
+    for x in range(size):
+        for y in range(size):
+            d, s = x - y, x + y
+            cells.append((
+                (index['row', x], y + 1),
+                (index['col', y], x + 1),
+                (index['diag', d], x - max(0, d) + 1),
+                (index['anti', s], x - max(0, s - size + 1) + 1),
+            ))
+
+    geo = _GEOMETRY[size] = (lengths, cells)
+    return geo
+
+
+class PatternEvaluator:
+    """Điểm cả bàn (góc nhìn X), cập nhật dần khi đặt/gỡ quân."""
+    __slots__ = ("size", "win_length", "table", "lengths", "cells",
+                 "codes", "score", "_mask", "_blank")
+
+    def __init__(self, size=DEFAULT_SIZE, win_length=WIN_LENGTH):
+        self.size = size
+        self.win_length = win_length
+        self.table = pattern_table(win_length)
+        self.lengths, self.cells = _geometry(size)
+        self._mask = 4 ** (win_length + 2) - 1
+        # Đường trống: chỉ có hai ô tường ở hai đầu
+        self._blank = [WALL | (WALL << (2 * (n + 1))) for n in self.lengths]
+        self.codes = list(self._blank)
+        self.score = 0
+
+    def reset(self):
+        self.codes[:] = self._blank
+        self.score = 0
+
+    def _line_delta(self, line, pos, value):
+        """Điểm thay đổi khi ô `pos` của đường `line` đổi thành `value`; trả về (delta, mã mới)."""
+        code = self.codes[line]
+        shift = 2 * pos
+        new = (code & ~(3 << shift)) | (value << shift)
+
+        table, mask = self.table, self._mask
+        # Các cửa sổ chứa pos: bắt đầu từ pos - win_length - 1 tới pos, trong [0, n - win_length]
+        first = max(0, pos - self.win_length - 1)
+        last = min(pos, self.lengths[line] - self.win_length)
+        delta = 0
+        for j in range(first, last + 1):
+            s = 2 * j
+            delta += table[(new >> s) & mask] - table[(code >> s) & mask]
+        return delta, new
+
+    def _set(self, x, y, value):
+        codes = self.codes
+        for line, pos in self.cells[x * self.size + y]:
+            delta, codes[line] = self._line_delta(line, pos, value)
+            self.score += delta
+
+    def place(self, x, y, sym):
+        self._set(x, y, CODE[sym])
+
+    def remove(self, x, y):
+        self._set(x, y, EMPTY)
+
+    def gain(self, x, y, sym):
+        """Điểm thay đổi (góc nhìn X) nếu `sym` đặt quân tại (x, y), không sửa thế cờ."""
+        value = CODE[sym]
+        return sum(self._line_delta(line, pos, value)[0]
+                   for line, pos in self.cells[x * self.size + y])
+
+    def threat(self, x, y):
+        """
+        gain(x, y, 'X') - gain(x, y, 'O') trong một lượt tra: ô này quan trọng
+        với cả hai bên bao nhiêu (dùng để sắp xếp nước đi).
+        """
+        table, mask, codes, lengths = self.table, self._mask, self.codes, self.lengths
+        k = self.win_length
+        total = 0
+        for line, pos in self.cells[x * self.size + y]:
+            code = codes[line]
+            shift = 2 * pos
+            base = code & ~(3 << shift)
+            with_x, with_o = base | (X << shift), base | (O << shift)
+            for j in range(max(0, pos - k - 1), min(pos, lengths[line] - k) + 1):
+                s = 2 * j
+                total += table[(with_x >> s) & mask] - table[(with_o >> s) & mask]
+        return total
+
+    @classmethod
+    def from_board(cls, board, win_length=WIN_LENGTH):
+        """Đánh giá một Board từ đầu."""
+        ev = cls(board.size, win_length)
+        size = board.size
+        for i, v in enumerate(board.cells):
+            if v != ord('.'):
+                ev.place(i // size, i % size, chr(v))
+        return ev
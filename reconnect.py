@@ -0,0 +1,54 @@
+# reconnect.py
+"""
+Quay lại ván đang chơi sau khi mất kết nối (dùng chung cho client.py và client_gui.py).
+
+Sau START server gửi `SESSION <token>`. Khi kết nối rớt giữa ván, server giữ
+chỗ một lúc (server.py --grace); client kết nối mới, gửi `RESUME <token>`
+thay cho PLAY và dựng lại bàn cờ từ dòng SYNC server gửi về:
+
+    SYNC <X|O> <n> <k> <bàn cờ: Board.pack() dạng base64>
+
+Server có thể chưa nhận ra kết nối cũ đã chết và trả `INVALID Unknown session`:
+client thử lại sau RECONNECT_DELAY giây cho tới hết RECONNECT_TIMEOUT.
+
+Client dùng giao thức nhị phân (wire.py) thương lượng lại trên kết nối mới:
+gửi HELLO trước RESUME; SYNC khi đó mang thẳng Board.pack(), không base64.
+"""
+import base64
+import socket
+import time
+
+import wire
+from game_logic import Board
+
+RECONNECT_TIMEOUT = 30.0
+RECONNECT_DELAY = 1.0
+UNKNOWN_SESSION = "INVALID Unknown session"
+
+
+def resume(host, port, token, deadline, binary=False):
+    """
+    Kết nối mới và gửi RESUME <token> (binary: kèm HELLO), thử lại tới
+    deadline (time.monotonic()); None nếu không được.
+    """
+    hello = wire.HELLO + "\n" if binary else ""
+    while True:
+        try:
+            s = socket.create_connection((host, port), timeout=RECONNECT_TIMEOUT)
+            s.settimeout(None)
+            s.sendall(f"{hello}RESUME {token}\n".encode())
+            return s
+        except OSError:
+            if time.monotonic() + RECONNECT_DELAY > deadline:
+                return None
+            time.sleep(RECONNECT_DELAY)
+
+
+def parse_sync(parts):
+    """Các phần của dòng SYNC -> (ký hiệu, n, k, bàn cờ dạng danh sách các hàng '.'/'X'/'O')."""
+    sym, size, win_length, packed = parts[1], int(parts[2]), int(parts[3]), parts[4]
+    if isinstance(packed, str):
+        packed = base64.b64decode(packed)  # khung nhị phân đã mang sẵn các byte
+    cells = Board.unpack(size, packed).cells
+    rows = [[chr(v) for v in cells[r * size:(r + 1) * size]] for r in range(size)]
+    return sym, size, win_length, rows
@@ -0,0 +1,173 @@
+# recovery.py
+"""
+Khôi phục các ván đang chơi dở sau khi server chết.
+
+Mỗi tiến trình ghi nhật ký (journal.Journal) định kỳ chụp ảnh các ván chưa
+kết thúc kèm vị trí trong nhật ký lúc chụp. Khi khởi động lại:
+
+1. đọc ảnh chụp mới nhất của từng tiến trình ghi,
+2. đọc phần đuôi nhật ký sau vị trí đó (tối đa SNAPSHOT_INTERVAL giây nước
+   đi) để áp các nước, ván mới và kết quả đến sau ảnh chụp,
+3. gộp lại thành danh sách ván dở, đưa vào sessions.registry để người chơi
+   gửi RESUME <token> quay lại.
+
+Thời gian khôi phục vì vậy chỉ phụ thuộc số ván đang dở và độ dài phần đuôi,
+không phụ thuộc tổng độ dài nhật ký. Đo với 10k trận:
+
+    python recovery.py --matches 10000
+"""
+import argparse
+import glob
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import journal
+import sessions
+
+RESUME_TTL = sessions.RESUME_TTL  # ảnh chụp gom các ván khôi phục hết hạn cùng lúc với chúng trong registry
+RECOVERY_BUDGET = 2.0  # mục tiêu (giây) cho 10k trận, in ra trong benchmark
+
+
+def _writers(directory):
+    """{tiền tố tiến trình ghi: (ảnh chụp hoặc None, [các đoạn])}, theo thứ tự thời gian."""
+    writers = {}
+    for path in glob.glob(os.path.join(directory, "*" + journal.SUFFIX)):
+        prefix = os.path.basename(path)[:-len(journal.SUFFIX)].rsplit("-", 1)[0]
+        writers.setdefault(prefix, [None, []])[1].append(path)
+    for path in glob.glob(os.path.join(directory, "*" + journal.SNAP_SUFFIX)):
+        prefix = os.path.basename(path)[:-len(journal.SNAP_SUFFIX)]
+        writers.setdefault(prefix, [None, []])[0] = path
+    return {prefix: (snap, sorted(segs)) for prefix, (snap, segs) in sorted(writers.items())}
+
+
+def _stones(cells):
+    return len(cells) - cells.count(0)
+
+
+def recover(directory):
+    """Các ván chưa kết thúc (sessions.GameState) từ ảnh chụp + đuôi nhật ký."""
+    games = {}  # mã ván -> [kích thước, số quân thắng, bytearray]
+    ended = set()
+    now = time.time()
+
+    for prefix, (snap, segs) in _writers(directory).items():
+        offset = 0
+        if snap is not None:
+            expires, segment, offset, snap_games = journal.read_snapshot(snap)
+            if not expires or expires > now:
+                for game_id, size, win_length, cells in snap_games:
+                    old = games.get(game_id)
+                    # Cùng một ván có thể nằm trong nhiều ảnh chụp (đã khôi phục một lần): lấy bản mới hơn
+                    if old is None or _stones(cells) >= _stones(old[2]):
+                        games[game_id] = [size, win_length, bytearray(cells)]
+            # Phần đuôi bắt đầu từ đoạn được ghi trong ảnh chụp
+            names = [os.path.basename(p) for p in segs]
+            segs = segs[names.index(segment):] if segment in names else []
+
+        for game_id, kind, a, b, c in journal.iter_records(segs, offset):
+            if kind == journal.MOVE or kind == journal.STONE:
+                game = games.get(game_id)
+                if game is not None:
+                    game[2][a * game[0] + b] = c
+            elif kind == journal.START or kind == journal.ADOPT:
+                # Ván đã có (từ nhật ký của worker nhận ván, đọc trước): giữ thế cờ
+                # nhiều quân hơn thay vì bắt đầu lại — START và ADOPT đều mở bàn trống
+                if game_id not in games:
+                    games[game_id] = [a, b, bytearray(a * a)]
+            elif kind == journal.END:
+                ended.add(game_id)
+
+    return [sessions.GameState(game_id, size, win_length, bytes(cells))
+            for game_id, (size, win_length, cells) in games.items()
+            if game_id not in ended]
+
+
+def seal(directory, games, ttl=RESUME_TTL):
+    """
+    Sau khi khôi phục: gom các ván vào một ảnh chụp mới (hết hạn sau ttl giây),
+    đánh dấu nhật ký cũ đã đọc xong, để lần khôi phục sau không đọc lại chúng.
+    """
+    writers = _writers(directory)
+    prefix = journal.writer_prefix()
+    journal.write_snapshot(os.path.join(directory, prefix + journal.SNAP_SUFFIX), "", 0,
+                           [(g.id, g.size, g.win_length, g.cells) for g in games],
+                           expires=time.time() + ttl)
+    for old, (snap, segs) in writers.items():
+        if segs:
+            last = segs[-1]
+            journal.write_snapshot(os.path.join(directory, old + journal.SNAP_SUFFIX),
+                                   os.path.basename(last), os.path.getsize(last), [])
+        elif snap is not None:
+            os.remove(snap)  # ảnh chụp gom từ lần khôi phục trước
+
+
+def restore(directory):
+    """Khôi phục khi server khởi động: nạp các ván vào sessions.registry; trả về (số ván, giây)."""
+    t0 = time.perf_counter()
+    games = recover(directory)
+    seal(directory, games)
+    sessions.registry.load(games, RESUME_TTL)
+    return len(games), time.perf_counter() - t0
+
+
+# --- Đo thời gian khôi phục ---
+
+def simulate(directory, matches, moves, tail_moves, seed=0):
+    """
+    Giả lập một server có `matches` trận đang chơi (mỗi trận `moves` nước) vừa
+    chụp ảnh, sau đó đi thêm `tail_moves` nước rồi chết (không đóng nhật ký).
+    """
+    rng = random.Random(seed)
+    size = 15
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    j = journal.Journal(directory, fsync_interval=3600, snapshot_interval=3600)
+    played = {}
+    for _ in range(matches):
+        game_id = sessions.new_game_id()
+        j.start_game(game_id, size, 5)
+        order = rng.sample(cells, moves + tail_moves)
+        for i, (x, y) in enumerate(order[:moves]):
+            j.move(game_id, x, y, 'XO'[i % 2])
+        played[game_id] = order
+    j.flush(snapshot=True)
+
+    names = list(played)
+    for n in range(tail_moves * matches):
+        game_id = names[n % matches]
+        i = moves + n // matches
+        x, y = played[game_id][i]
+        j.move(game_id, x, y, 'XO'[i % 2])
+    j.closed = True  # dừng luồng nền mà không ghi thêm ảnh chụp
+    j.flush()
+    return played
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure crash recovery time")
+    parser.add_argument("--matches", type=int, default=10_000)
+    parser.add_argument("--moves", type=int, default=30, help="moves per match before the snapshot")
+    parser.add_argument("--tail", type=int, default=2, help="moves per match after the snapshot")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="caro-recovery-")
+    try:
+        played = simulate(directory, args.matches, args.moves, args.tail)
+        t0 = time.perf_counter()
+        games = recover(directory)
+        elapsed = time.perf_counter() - t0
+
+        expected = args.moves + args.tail
+        assert len(games) == args.matches, (len(games), args.matches)
+        assert all(_stones(g.cells) == expected and g.id in played for g in games)
+        print(f"{args.matches} live matches, {args.moves} moves each + {args.tail} in the journal tail")
+        print(f"recovered in {elapsed:.3f}s ({args.matches / elapsed:.0f} matches/s), "
+              f"budget {RECOVERY_BUDGET:.1f}s: {'ok' if elapsed <= RECOVERY_BUDGET else 'OVER'}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
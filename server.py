@@ -1,151 +1,532 @@
+import selectors
+import signal
 import socket
 import threading
-import sys
-from game_logic import Board, apply_move, check_win, is_full
+import argparse
+import contextlib
+import time
+import ai
+import analysis
+import chat
+import journal
+import lobby
+import matchmaking
+import metrics
+import opening_book
+import outbox
+import recovery
+import sessions
+import spectators
+import timers
+import wire
+from framing import RECV_SIZE, LineReader
+from game_logic import DEFAULT_SIZE, WIN_LENGTH
+from handshake import HANDSHAKE_TIMEOUT, Handshake
+from match import Match
 
 # --- Cấu hình  ---
 HOST = '0.0.0.0'
 PORT = 12345
 
 clients_lock = threading.Lock()
-waiting = []
+waiting = {}  # (kích thước bàn, số quân thắng) -> matchmaking.Queue
+queued = selectors.DefaultSelector()  # kết nối đang chờ ghép, data = (hàng đợi, Entry)
+
+BOT_WAIT = 30.0  # chờ quá số giây này thì được ghép với máy (0 = tắt)
+BOT_POLL = 1.0
 
 # --- Gửi thông điệp từ server đến client ---
 
-def send(conn, msg):
+def send(conn, msg, encode=wire.encode_line):
+    """encode: wire.encoder(reader) của kết nối (dòng chữ, hoặc khung nhị phân sau HELLO)."""
     try:
-        conn.sendall((msg + "\n").encode())
+        conn.sendall(encode(msg))
     except:
         pass
 # --- Nhận thông điệp từ client đến server ---
-def recv(conn):
+def recv_into(conn, reader):
+    """Đọc một lần từ socket đã sẵn sàng vào reader; False khi mất kết nối."""
     try:
-        data = conn.recv(1024)
-        if not data: return None
-        return data.decode().strip()
+        data = conn.recv(RECV_SIZE)
+        if data:
+            reader.feed(data)
+            return True
+    except BlockingIOError:
+        return True  # socket của trận không chặn: báo sẵn sàng nhầm
     except:
+        pass
+    return False
+
+def dispatch(match, conn, reader, alive=True):
+    """
+    Đưa các dòng đang chờ trong reader cho trận (alive=False: sau đó là mất kết nối).
+    Trận đã xong thì để nguyên các dòng còn lại: người chơi có thể mang chúng sang
+    trận sau (RESUME).
+    """
+    lines = reader.lines
+    while lines and not match.finished:
+        match.handle(conn, lines.popleft())
+    if not alive and not match.finished:
+        match.handle(conn, None)
+
+# --- Gợi ý nước đi (HINT) ---
+
+def hint_requester(event):
+    """
+    Gửi thế cờ sang analysis; kết quả về trên luồng của process pool nên
+    done() được gọi trong event() của trận (giữ khóa rồi gửi gom; RLock: job
+    có sẵn trong bộ đệm xong ngay trong lúc handle() còn giữ khóa).
+    """
+    service = analysis.default_service()
+    if service is None:
         return None
 
+    def request(board, sym, win_length, done):
+        def deliver(future):
+            with event():
+                done(analysis.result_of(future))
+
+        future = service.submit(board, sym, win_length)
+        future.add_done_callback(deliver)
+        return future
+    return request
+
 # --- Xử lý kết nối giữa hai người chơi ---
 
-def handle_match(p1, p2):
-    conn1, addr1 = p1
-    conn2, addr2 = p2
-    
-    symbols = {conn1: 'X', conn2: 'O'}
-    rematch_status = {conn1: False, conn2: False}
+def handle_match(p1, p2, settings=(DEFAULT_SIZE, WIN_LENGTH), resume=None, suspend=None,
+                 names=(None, None), move_time=None):
+    """
+    Chạy một trận tới khi xong. Người chơi mất kết nối giữa ván thì ván được
+    giao cho suspend(ván, {ký hiệu: người còn lại}) (mặc định: suspend_match)
+    và luồng này kết thúc; ván chạy tiếp trên luồng mới khi họ quay lại (RESUME).
+    Hai người đều có tên (names, từ NAME) thì mỗi ván được tính hệ số.
+    move_time: số giây mỗi lượt của phòng (lobby.py); None: theo --move-time.
 
-    while True:
-        board = Board(size=15)
-        rematch_status[conn1] = False
-        rematch_status[conn2] = False
-        
-        send(conn1, "START X")
-        send(conn2, "START O")
-        
-        send(conn1, "RESET") 
-        send(conn2, "RESET")
-
-        current = conn1
-        other = conn2
-        send(current, "YOUR TURN")
-
-        game_active = True 
+    Luồng của trận chờ cả hai socket cùng lúc (selectors) nên chat, EXIT hay
+    mất kết nối của người không tới lượt được xử lý ngay. Đồng hồ của trận
+    nằm trên bánh xe chung (timers.py); đồng hồ kết thúc trận thì đánh thức
+    luồng qua cặp socket `wake`. Khán giả (WATCH) được luồng gửi chung
+    (spectators.Flusher) phục vụ, luồng của trận không bao giờ chờ họ.
+
+    Mọi thông điệp của một sự kiện (lệnh, đồng hồ, gợi ý) được gom vào bộ đệm
+    của từng người chơi (outbox.py) và gửi một lần, không chặn; người nhận
+    chậm quá HIGH_WATER thì tạm ngừng đọc lệnh của họ, quá MAX_BUFFER thì coi
+    như mất kết nối.
+    """
+    conn1, addr1, reader1 = p1
+    conn2, addr2, reader2 = p2
 
+    readers = {conn1: reader1, conn2: reader2}
+    boxes = {conn1: outbox.SocketOutbox(conn1, wire.encoder(reader1)),
+             conn2: outbox.SocketOutbox(conn2, wire.encoder(reader2))}
+    lock = threading.RLock()  # gợi ý và đồng hồ được gửi từ luồng khác
+    wake, waker = socket.socketpair()
+    wake.setblocking(False)
+    waker.setblocking(False)
+    wheel = timers.default_wheel()
+    interest = {conn1: selectors.EVENT_READ, conn2: selectors.EVENT_READ}
+    flusher = spectators.default_flusher()
+    published = []  # khán giả có dòng mới trong sự kiện đang xử lý (Channel.notify)
+
+    def wanted(conn):
+        """Sự kiện cần chờ trên socket: ngừng đọc khi người nhận chậm, chờ ghi khi bộ đệm gửi đầy."""
+        box = boxes[conn]
+        events = 0 if box.paused else selectors.EVENT_READ
+        if box.blocked:
+            events |= selectors.EVENT_WRITE
+        return events or selectors.EVENT_READ
+
+    def flush():
+        """Gửi gom sau mỗi sự kiện; kết nối ghi lỗi hoặc đọc quá chậm thì coi như mất kết nối."""
         while True:
-            data = recv(current)
-            if data is None:
-                send(other, "OPPONENT_LEFT")
-                return 
-
-            parts = data.split()
-            if not parts: continue
-            cmd = parts[0]
-
-            if cmd == "CHAT":
-                msg = " ".join(parts[1:])
-                send(other, f"CHAT {msg}")
-
-            elif cmd == "REMATCH":
-                if not game_active:
-                    rematch_status[current] = True
-                    # Notify opponent via chat
-                    send(other, "CHAT [System]: Opponent wants a rematch!")
-                    
-                    # Check if both accepted
-                    if rematch_status[conn1] and rematch_status[conn2]:
-                        break # Break Game Loop to restart Session Loop
-
-            # 3. Handle Move
-            elif cmd == "MOVE" and len(parts) == 3 and game_active:
+            for box in boxes.values():
+                box.flush()
+            lost = [conn for conn, box in boxes.items() if box.closed]
+            if not lost or match.finished:
+                break
+            match.handle(lost[0], None)
+        if match.finished or any(wanted(conn) != interest[conn] for conn in boxes):
+            try:
+                waker.send(b"\0")  # luồng của trận đổi sự kiện chờ (hoặc kết thúc)
+            except OSError:
+                pass
+
+    @contextlib.contextmanager
+    def event():
+        with lock:
+            yield
+            flush()
+            # Chỉ đánh thức luồng gửi cho khán giả sau khi người chơi đã nhận phần của
+            # mình: thức dậy giữa sự kiện, nó giành GIL của luồng trận hàng chục ms
+            if published:
+                published.clear()
+                flusher.notify(match.spectators)
+
+    def schedule(delay, callback):
+        def fire():
+            with event():
+                callback()
+        return wheel.schedule(delay, fire)
+
+    def send_to(conn, msg):
+        boxes[conn].put(msg)
+
+    default_time, idle_time = timers.limits()
+    if move_time is None:
+        move_time = default_time
+    match = Match(conn1, conn2, send_to, *settings, hints=hint_requester(event),
+                  journal=journal.default_journal(), grace=sessions.registry.grace,
+                  timers=schedule, move_time=move_time, idle_time=idle_time,
+                  rated=matchmaking.rater(*names),
+                  spectators=spectators.hub.open(published.append),
+                  chat=chat.new_room())
+    print(f"[*] Match {match.spectators.id} started")
+    sel = selectors.DefaultSelector()
+    sel.register(wake, selectors.EVENT_READ)
+    with event():
+        for conn in (conn1, conn2):
+            sel.register(conn, selectors.EVENT_READ)
+        if resume is not None:
+            match.resume(resume)
+        else:
+            match.start()
+        for conn in (conn1, conn2):
+            dispatch(match, conn, readers[conn])  # dòng gửi dính sau PLAY/RESUME
+
+    while not match.finished:
+        with lock:
+            for conn in boxes:
+                events = wanted(conn)
+                if events != interest[conn]:
+                    sel.modify(conn, events)
+                    interest[conn] = events
+        for key, events in sel.select():
+            conn = key.fileobj
+            if conn is wake:
                 try:
-                    x, y = int(parts[1]), int(parts[2])
-                except: continue
-
-                sym = symbols[current]
-                ok, reason = apply_move(board, x, y, sym)
-                
-                if not ok:
-                    send(current, f"INVALID {reason}")
-                    continue
-
-                send(other, f"OPPONENT {x} {y}")
-
-                if check_win(board, x, y):
-                    send(current, "WIN")
-                    send(other, "LOSE")
-                    game_active = False
-                elif is_full(board):
-                    send(current, "DRAW")
-                    send(other, "DRAW")
-                    game_active = False
-                else:
-                    send(other, "YOUR TURN")
-                    current, other = other, current
-            
-            # 4. Handle Exit
-            elif cmd == "EXIT":
-                send(other, "OPPONENT_LEFT")
-                return
-            
-            # Allow polling both clients when game is over
-            if not game_active:
-                current, other = other, current
+                    while wake.recv(4096):
+                        pass
+                except OSError:
+                    pass
+                continue
+            if match.finished:
+                continue
+            if events & selectors.EVENT_WRITE:
+                with event():
+                    boxes[conn].writable()
+            if events & selectors.EVENT_READ:
+                alive = recv_into(conn, readers[conn])
+                with event():
+                    dispatch(match, conn, readers[conn], alive)
+    sel.close()
+    wake.close()
+    with lock:
+        waker.close()
+    for box in boxes.values():
+        box.drain()  # dòng cuối (WIN, OPPONENT_LEFT...) còn kẹt trong bộ đệm
 
+    if match.absent is not None:
+        match.absent.close()
+        present = p2 if match.absent is conn1 else p1
+        (suspend or suspend_match)(match.snapshot(), {match.symbols[present[0]]: present})
+        return
     conn1.close()
     conn2.close()
 
 # --- Xử lý kết nối từ client ---
 
+def accepted(conn):
+    """
+    Kết nối vừa accept(): tắt Nagle như asyncio vẫn làm mặc định. Outbox đã
+    gom các dòng của một sự kiện thành một lần gửi; để kernel giữ lần gửi nhỏ
+    tiếp theo chờ ACK (trễ tới ~40 ms) chỉ làm chậm REMATCH, CHAT.
+    """
+    try:
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass  # kết nối đã bị đóng
+    return conn
+
+def wait_room(conn, rooms, room):
+    """
+    Chủ phòng chờ người vào phòng: True khi chủ phòng gửi thêm dòng (LIST,
+    LEAVE...), False khi đã có người ngồi vào. Người vào phòng đánh thức
+    luồng này qua một cặp socket như luồng của trận.
+    """
+    wake, waker = socket.socketpair()
+
+    def notify():
+        try:
+            waker.send(b"\0")
+        except OSError:
+            pass  # chủ phòng vừa thôi chờ
+    try:
+        if rooms.watch(room, notify):
+            return False
+        with selectors.DefaultSelector() as sel:
+            sel.register(conn, selectors.EVENT_READ)
+            sel.register(wake, selectors.EVENT_READ)
+            ready = {key.fileobj for key, _ in sel.select()}
+        return wake not in ready
+    finally:
+        rooms.watch(room, None)
+        wake.close()
+        waker.close()
+
+def handshake(conn):
+    """
+    Đọc các lệnh trước trận (SIZE, PLAY, sảnh...); trả về (reader, Handshake) hoặc None.
+    Chủ phòng (CREATE) ở lại đây tới khi có người vào phòng.
+    """
+    metrics.connections.inc()
+    reader = LineReader()
+    hs = Handshake(lobby.default_lobby())
+    conn.settimeout(HANDSHAKE_TIMEOUT)
+    try:
+        while not hs.done:
+            if hs.room is not None and not reader.lines and not wait_room(conn, hs.rooms, hs.room):
+                reply = hs.finish()  # có người vào phòng
+                if reply:
+                    send(conn, reply)
+                break
+            line = reader.readline(conn)
+            if line is None:
+                return close_room(hs)
+            reply = hs.handle(line)
+            if reply:
+                send(conn, reply)
+            if hs.in_lobby:
+                conn.settimeout(None)  # người dùng sảnh: không còn là client cũ
+    except socket.timeout:
+        pass  # client cũ: không gửi gì trước khi vào trận
+    except:
+        return close_room(hs)
+    conn.settimeout(None)
+    if hs.binary:
+        reader = wire.FrameReader.after(reader)
+    return reader, hs
+
 def client_thread(conn, addr):
     print(f"[+] Connected {addr}")
+    result = handshake(conn)
+    if result is None:
+        conn.close()
+        return
+    reader, hs = result
+    if hs.resume is not None:
+        resume_player(hs.resume, (conn, addr, reader))
+        return
+    if hs.watch is not None:
+        watch_match(conn, hs.watch)
+        return
+    if hs.joined is not None:
+        if not hs.rooms.seat(hs.joined, (conn, addr, reader), hs.name):
+            send(conn, "INVALID Room closed", wire.encoder(reader))
+            conn.close()
+        return  # luồng của chủ phòng chạy trận
+    if hs.room is not None:
+        room = hs.room
+        start_match((conn, addr, reader), room.guest, room.settings,
+                    names=(hs.name, room.guest_name), move_time=room.move_time)
+        return
+
+    rating = matchmaking.ratings.get(hs.name).value
     with clients_lock:
-        waiting.append((conn, addr))
-        if len(waiting) >= 2:
-            p1 = waiting.pop(0)
-            p2 = waiting.pop(0)
-            threading.Thread(target=handle_match, args=(p1, p2), daemon=True).start()
+        queue = waiting.setdefault(hs.settings, matchmaking.Queue())
+        entry = queue.add((conn, addr, reader), rating, hs.name)
+        queued.register(conn, selectors.EVENT_READ, (queue, entry))
+
+def start_match(p1, p2, settings, resume=None, names=(None, None), move_time=None):
+    threading.Thread(target=handle_match, args=(p1, p2, settings, resume, None, names, move_time),
+                     daemon=True).start()
+
+def close_room(hs):
+    """Chủ phòng mất kết nối trong lúc chờ: đóng phòng, báo người vừa vào (nếu có)."""
+    if hs.room is not None:
+        guest = hs.rooms.close(hs.room)
+        if guest is not None:
+            conn, _, reader = guest
+            send(conn, "INVALID Room closed", wire.encoder(reader))
+            conn.close()
+    return None
+
+def watch_match(conn, match_id):
+    """WATCH <mã>: thêm khán giả vào trận; luồng gửi chung lo phần còn lại."""
+    channel = spectators.hub.get(match_id)
+    if channel is None:
+        send(conn, "INVALID Unknown match")
+        conn.close()
+        return
+    spectators.default_flusher().add(spectators.Viewer(conn), channel)
+
+def suspend_match(game, players):
+    """Cất ván vào sessions.registry chờ người mất kết nối, rồi mới báo người còn lại."""
+    sessions.registry.suspend(game, players)
+    for conn, _, reader in players.values():
+        send(conn, sessions.registry.notice, wire.encoder(reader))
+
+def resume_player(token, player):
+    """RESUME <token>: chờ bên kia của ván đang chờ; đủ hai người thì chạy tiếp ván."""
+    try:
+        paired = sessions.registry.join(token, player)
+    except KeyError:
+        send(player[0], "INVALID Unknown session", wire.encoder(player[2]))
+        player[0].close()
+        return
+    if paired is not None:
+        game, px, po = paired
+        start_match(px, po, (game.size, game.win_length), game)
+
+def abandon_resumes():
+    """Bên kia không quay lại kịp: báo người đang chờ và ghi kết quả bỏ dở."""
+    j = journal.default_journal()
+    for game, players in sessions.registry.expired():
+        for conn, _, reader in players:
+            send(conn, "OPPONENT_LEFT", wire.encoder(reader))
+            conn.close()
+        if j is not None:
+            j.end_game(game.id, journal.ABANDONED)
+
+def resume_reaper():
+    while True:
+        time.sleep(BOT_POLL)
+        abandon_resumes()
+
+def bot_player(level):
+    bot = ai.start_bot(level, analysis.default_service(), opening_book.default_book())
+    return bot, ("bot", level), LineReader()
+
+def peer_closed(conn):
+    """
+    conn (socket hoặc fd) vừa báo đọc được: True nếu bên kia đã đóng (EOF, lỗi).
+    Chỉ xem trước (MSG_PEEK), dữ liệu nếu có vẫn để lại cho trận.
+    """
+    sock = conn if isinstance(conn, socket.socket) else socket.socket(fileno=conn)
+    try:
+        return not sock.recv(1, socket.MSG_PEEK)
+    except OSError:
+        return True
+    finally:
+        if sock is not conn:
+            sock.detach()
+
+def drop_departed(sel):
+    """
+    Trước mỗi lượt ghép: bỏ khỏi hàng những người chờ đã đóng kết nối, kẻo người
+    thật kế tiếp được ghép với họ rồi nhận ngay OPPONENT_LEFT. sel theo dõi các
+    kết nối đang chờ (data = (hàng đợi, Entry)); trả về các Entry vừa bỏ, người
+    gọi đóng kết nối của chúng.
+    """
+    dropped = []
+    for key, _ in sel.select(0):
+        queue, entry = key.data
+        if peer_closed(key.fileobj):
+            sel.unregister(key.fileobj)
+            queue.remove(entry)
+            dropped.append(entry)
+    return dropped
+
+def matchmaker(bot_wait, level):
+    """
+    Ghép cặp theo lô mỗi matchmaking.TICK giây. Người chờ quá bot_wait giây
+    (> 0) thì được ghép với máy, để giờ vắng không ai phải ngồi chờ mãi.
+    """
+    while True:
+        time.sleep(matchmaking.TICK)
+        now = time.monotonic()
+        with clients_lock:
+            for entry in drop_departed(queued):
+                entry.player[0].close()
+            for settings, queue in waiting.items():
+                for a, b in queue.pair(now):
+                    queued.unregister(a.player[0])
+                    queued.unregister(b.player[0])
+                    start_match(a.player, b.player, settings, names=(a.name, b.name))
+                if bot_wait > 0:
+                    for entry in queue.expired(bot_wait, now):
+                        queued.unregister(entry.player[0])
+                        start_match(entry.player, bot_player(level), settings, names=(entry.name, None))
 
 # --- Chương trình chính ---
 
-def main():
-    global HOST, PORT
-    if len(sys.argv) >= 2:
-        PORT = int(sys.argv[1])
-        
-    print(f"Starting server on {HOST}:{PORT}")
+def serve(host, port, bot_wait=BOT_WAIT, bot_level=ai.DEFAULT_LEVEL):
+    print(f"Starting server on {host}:{port}")
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.bind((HOST, PORT))
-    s.listen(5)
-    
+    # Khởi động lại ngay sau khi chết (để khôi phục trận) mà không chờ TIME_WAIT
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind((host, port))
+    s.listen(128)
+    metrics.watch_queues(waiting)
+    metrics.serve()
+
+    threading.Thread(target=matchmaker, args=(bot_wait, bot_level), daemon=True).start()
+    threading.Thread(target=resume_reaper, daemon=True).start()
+
     try:
         while True:
             conn, addr = s.accept()
-            threading.Thread(target=client_thread, args=(conn, addr), daemon=True).start()
+            threading.Thread(target=client_thread, args=(accepted(conn), addr), daemon=True).start()
     except KeyboardInterrupt:
         print("Shutting down server.")
+        print(f"Sent: {outbox.stats}")
     finally:
         s.close()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Caro game server")
+    parser.add_argument("port", nargs="?", type=int, default=PORT)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--mode", choices=("thread", "async"), default="thread",
+                        help="thread: một luồng mỗi kết nối; async: một event loop asyncio")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="số tiến trình worker dùng chung cổng (0 = một tiến trình)")
+    parser.add_argument("--bot-after", type=float, default=BOT_WAIT,
+                        help="ghép với máy khi chờ quá số giây này (0 = tắt)")
+    parser.add_argument("--bot-level", choices=sorted(ai.LEVELS), default=ai.DEFAULT_LEVEL)
+    parser.add_argument("--analysis-workers", type=int, default=None,
+                        help="số tiến trình tìm nước cho máy và HINT (mặc định: số CPU, 0 = tắt)")
+    parser.add_argument("--book", default=opening_book.DEFAULT_PATH,
+                        help="tệp sách khai cuộc (bỏ qua nếu không có; xem opening_book.py)")
+    parser.add_argument("--journal", metavar="DIR", default=None,
+                        help="ghi mọi ván vào nhật ký nhị phân trong thư mục này; "
+                             "khởi động lại sẽ khôi phục các ván đang dở (RESUME)")
+    parser.add_argument("--grace", type=float, default=sessions.GRACE_PERIOD,
+                        help="giữ ván cho người mất kết nối số giây này để quay lại (0 = tắt)")
+    parser.add_argument("--move-time", type=float, default=timers.MOVE_TIME,
+                        help="số giây cho mỗi lượt đi, hết giờ thì thua (0 = không giới hạn)")
+    parser.add_argument("--idle-timeout", type=float, default=timers.IDLE_TIMEOUT,
+                        help="đóng trận khi ván đã xong mà không ai gửi gì số giây này (0 = tắt)")
+    parser.add_argument("--chat-rate", type=float, default=chat.RATE,
+                        help="số dòng CHAT mỗi giây mỗi người chơi, dồn tối đa --chat-burst dòng (0 = không giới hạn)")
+    parser.add_argument("--chat-burst", type=int, default=chat.BURST)
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="xem số đo dạng Prometheus tại http://127.0.0.1:<cổng>/metrics (0 = tắt)")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    # SIGTERM thoát như Ctrl+C để nhật ký kịp ghi nốt
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    analysis.configure(args.analysis_workers)
+    opening_book.configure(args.book)
+    journal.configure(args.journal)
+    sessions.registry.grace = args.grace
+    timers.configure(args.move_time, args.idle_timeout)
+    chat.configure(args.chat_rate, args.chat_burst)
+    metrics.configure(args.metrics_port)
+    if args.journal:
+        sessions.configure(args.journal)
+        count, elapsed = recovery.restore(args.journal)
+        if count:
+            print(f"Recovered {count} unfinished matches in {elapsed:.3f}s")
+    if args.workers > 0:
+        import cluster
+        cluster.run(args.host, args.port, args.workers, args.mode, args.bot_after, args.bot_level)
+    elif args.mode == "async":
+        import server_async
+        server_async.main(args.host, args.port, args.bot_after, args.bot_level)
+    else:
+        serve(args.host, args.port, args.bot_after, args.bot_level)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
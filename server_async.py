@@ -0,0 +1,459 @@
+# server_async.py
+import asyncio
+import signal
+import time
+import ai
+import analysis
+import chat
+import journal
+import lobby
+import matchmaking
+import metrics
+import opening_book
+import outbox
+import sessions
+import spectators
+import timers
+import wire
+from framing import RECV_SIZE, LineReader
+from game_logic import DEFAULT_SIZE, WIN_LENGTH
+from handshake import HANDSHAKE_TIMEOUT, Handshake
+from match import Match
+
+# --- Cấu hình  ---
+HOST = '0.0.0.0'
+PORT = 12345
+
+waiting = {}  # (kích thước bàn, số quân thắng) -> matchmaking.Queue
+queued = {}   # Entry đang chờ ghép -> hàng đợi của nó
+matches = set()  # giữ tham chiếu tới task để không bị thu gom giữa chừng
+
+BOT_WAIT = 30.0  # chờ quá số giây này thì được ghép với máy (0 = tắt)
+BOT_POLL = 1.0
+
+# --- Gửi thông điệp từ server đến client ---
+
+def send(writer, msg, encode=wire.encode_line):
+    try:
+        writer.write(encode(msg))
+    except Exception:
+        pass  # không nuốt KeyboardInterrupt/SIGTERM đến giữa lúc đang gửi
+
+# --- Nhận thông điệp từ client đến server ---
+
+async def recv(reader, lines):
+    try:
+        return await lines.areadline(reader)
+    except Exception:
+        return None
+
+# --- Gợi ý nước đi (HINT) ---
+
+def hint_requester(after):
+    """
+    Gửi thế cờ sang analysis; kết quả từ luồng của process pool được đưa về
+    event loop, rồi gọi after() (gửi gom các thông điệp của trận).
+    """
+    service = analysis.default_service()
+    if service is None:
+        return None
+    loop = asyncio.get_running_loop()
+
+    def request(board, sym, win_length, done):
+        def complete(result):
+            done(result)
+            after()
+
+        def deliver(future):
+            try:
+                loop.call_soon_threadsafe(complete, analysis.result_of(future))
+            except RuntimeError:
+                pass  # event loop đã đóng
+
+        future = service.submit(board, sym, win_length)
+        future.add_done_callback(deliver)
+        return future
+    return request
+
+# --- Xử lý kết nối giữa hai người chơi ---
+
+async def handle_match(p1, p2, settings=(DEFAULT_SIZE, WIN_LENGTH), resume=None, suspend=None,
+                       names=(None, None), move_time=None):
+    """
+    Như server.handle_match: người mất kết nối giữa ván thì ván được giao cho suspend().
+    Mỗi người chơi luôn có một task đọc đang chờ; dòng của ai tới trước xử lý trước.
+    Đồng hồ trên bánh xe chung (timers.py) được đưa về event loop; đồng hồ kết
+    thúc trận thì hoàn thành future `wake`. Khán giả (WATCH) được gửi theo lô
+    sau mỗi lượt của event loop (wake_viewers), trận không bao giờ chờ họ.
+
+    Thông điệp của một sự kiện được gom và ghi một lần (outbox.StreamOutbox).
+    Người nhận chậm quá HIGH_WATER thì lệnh tiếp theo của họ chỉ được đọc sau
+    khi writer.drain() xong; quá MAX_BUFFER thì coi như mất kết nối.
+    """
+    reader1, writer1, lines1 = p1
+    reader2, writer2, lines2 = p2
+    readers = {writer1: (reader1, lines1), writer2: (reader2, lines2)}
+    boxes = {writer1: outbox.StreamOutbox(writer1, wire.encoder(lines1)),
+             writer2: outbox.StreamOutbox(writer2, wire.encoder(lines2))}
+    loop = asyncio.get_running_loop()
+    wake = loop.create_future()
+    wheel = timers.default_wheel()
+
+    def flush():
+        """Gửi gom sau mỗi sự kiện; kết nối ghi lỗi hoặc đọc quá chậm thì coi như mất kết nối."""
+        while True:
+            for box in boxes.values():
+                box.flush()
+            lost = [writer for writer, box in boxes.items() if box.closed]
+            if not lost or match.finished:
+                break
+            match.handle(lost[0], None)
+        if match.finished and not wake.done():
+            wake.set_result(None)
+
+    def schedule(delay, callback):
+        def fire():
+            callback()
+            flush()
+
+        def deliver():
+            try:
+                loop.call_soon_threadsafe(fire)
+            except RuntimeError:
+                pass  # event loop đã đóng
+        return wheel.schedule(delay, deliver)
+
+    def send_to(writer, msg):
+        boxes[writer].put(msg)
+
+    default_time, idle_time = timers.limits()
+    if move_time is None:
+        move_time = default_time
+    match = Match(writer1, writer2, send_to, *settings, hints=hint_requester(flush),
+                  journal=journal.default_journal(), grace=sessions.registry.grace,
+                  timers=schedule, move_time=move_time, idle_time=idle_time,
+                  rated=matchmaking.rater(*names),
+                  spectators=spectators.hub.open(wake_viewers), chat=chat.new_room())
+    print(f"[*] Match {match.spectators.id} started")
+    if resume is not None:
+        match.resume(resume)
+    else:
+        match.start()
+    flush()
+
+    async def receive(writer):
+        box = boxes[writer]
+        if box.paused:
+            # Người nhận chậm: chờ bộ đệm của họ xuống dưới LOW_WATER rồi mới đọc lệnh tiếp
+            try:
+                await writer.drain()
+            except Exception:
+                return None
+            box.watermarks()
+        return await recv(*readers[writer])
+
+    reads = {}  # task đọc -> người chơi
+
+    def read(writer):
+        reads[asyncio.ensure_future(receive(writer))] = writer
+
+    read(writer1)
+    read(writer2)
+    while not match.finished:
+        done, _ = await asyncio.wait([*reads, wake], return_when=asyncio.FIRST_COMPLETED)
+        for task in [t for t in reads if t in done]:
+            writer = reads.pop(task)
+            line = task.result()
+            if match.finished:
+                if line is not None:
+                    readers[writer][1].lines.appendleft(line)  # để dành cho trận sau (RESUME)
+                continue
+            match.handle(writer, line)
+            flush()
+            if not match.finished:
+                read(writer)
+    for task in reads:
+        task.cancel()
+    # Chờ các task đọc dừng hẳn: người còn lại có thể được đọc tiếp ở trận sau (RESUME)
+    await asyncio.gather(*reads, return_exceptions=True)
+
+    if match.absent is not None:
+        match.absent.close()
+        present = p2 if match.absent is writer1 else p1
+        (suspend or suspend_match)(match.snapshot(), {match.symbols[present[1]]: present})
+        return
+    writer1.close()
+    writer2.close()
+
+# --- Xử lý kết nối từ client ---
+
+ROOM_READY = object()  # wait_room(): đã có người vào phòng
+
+async def wait_room(reader, lines, rooms, room):
+    """Như server.wait_room: dòng tiếp theo của chủ phòng (None: mất kết nối), hoặc ROOM_READY."""
+    ready = asyncio.get_running_loop().create_future()
+
+    def notify():
+        if not ready.done():
+            ready.set_result(None)
+
+    if rooms.watch(room, notify):
+        return ROOM_READY
+    read = asyncio.ensure_future(lines.areadline(reader))
+    try:
+        await asyncio.wait([read, ready], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        rooms.watch(room, None)
+    if read.done():
+        return read.result()
+    read.cancel()
+    try:
+        line = await read
+    except asyncio.CancelledError:
+        return ROOM_READY
+    if line is not None:
+        lines.lines.appendleft(line)  # đọc xong đúng lúc người vào phòng: để dành cho trận
+    return ROOM_READY
+
+async def handshake(reader, writer):
+    """
+    Đọc các lệnh trước trận (SIZE, PLAY, sảnh...); trả về (LineReader, Handshake) hoặc None.
+    Chủ phòng (CREATE) ở lại đây tới khi có người vào phòng.
+    """
+    metrics.connections.inc()
+    lines = LineReader()
+    hs = Handshake(lobby.default_lobby())
+    try:
+        while not hs.done:
+            if hs.room is not None and not lines.lines:
+                line = await wait_room(reader, lines, hs.rooms, hs.room)
+                if line is ROOM_READY:
+                    reply = hs.finish()
+                    if reply:
+                        send(writer, reply)
+                    break
+            else:
+                timeout = None if hs.in_lobby else HANDSHAKE_TIMEOUT  # người dùng sảnh: không còn là client cũ
+                line = await asyncio.wait_for(lines.areadline(reader), timeout)
+            if line is None:
+                return close_room(hs)
+            reply = hs.handle(line)
+            if reply:
+                send(writer, reply)
+    except asyncio.TimeoutError:
+        pass  # client cũ: không gửi gì trước khi vào trận
+    except Exception:
+        return close_room(hs)
+    if hs.binary:
+        lines = wire.FrameReader.after(lines)
+    return lines, hs
+
+def start_match(p1, p2, settings, resume=None, names=(None, None), move_time=None):
+    task = asyncio.create_task(handle_match(p1, p2, settings, resume, None, names, move_time))
+    matches.add(task)
+    task.add_done_callback(matches.discard)
+
+def close_room(hs):
+    """Chủ phòng mất kết nối trong lúc chờ: đóng phòng, báo người vừa vào (nếu có)."""
+    if hs.room is not None:
+        guest = hs.rooms.close(hs.room)
+        if guest is not None:
+            _, writer, lines = guest
+            send(writer, "INVALID Room closed", wire.encoder(lines))
+            writer.close()
+    return None
+
+async def client_connected(reader, writer):
+    print(f"[+] Connected {writer.get_extra_info('peername')}")
+    try:
+        result = await handshake(reader, writer)
+    except asyncio.CancelledError:
+        result = None  # server đang tắt khi người này còn ở sảnh
+    if result is None:
+        writer.close()
+        return
+    lines, hs = result
+    if hs.resume is not None:
+        resume_player(hs.resume, (reader, writer, lines))
+        return
+    if hs.watch is not None:
+        await watch_match(reader, writer, hs.watch)
+        return
+    if hs.joined is not None:
+        if not hs.rooms.seat(hs.joined, (reader, writer, lines), hs.name):
+            send(writer, "INVALID Room closed", wire.encoder(lines))
+            writer.close()
+        return  # chủ phòng chạy trận
+    if hs.room is not None:
+        room = hs.room
+        start_match((reader, writer, lines), room.guest, room.settings,
+                    names=(hs.name, room.guest_name), move_time=room.move_time)
+        return
+
+    # Cả event loop chạy trên một luồng nên không cần khóa như server luồng.
+    queue = waiting.setdefault(hs.settings, matchmaking.Queue())
+    entry = queue.add((reader, writer, lines), matchmaking.ratings.get(hs.name).value, hs.name)
+    queued[entry] = queue
+
+# --- Khán giả (WATCH) ---
+
+VIEWER_BUFFER = 64 * 1024  # bộ đệm gửi của một khán giả vượt quá chừng này thì chờ drain()
+FLUSH_BATCH = 256  # số khán giả gửi trong một lượt của event loop: người chơi không phải chờ cả lô
+
+ready_channels = set()  # trận có dòng mới cho khán giả
+ready_viewers = set()   # khán giả có dữ liệu mới, gửi ở lượt sau của event loop
+
+def wake_viewers(channel):
+    """
+    notify của spectators.Channel: ghi nhận trận (một lần, không duyệt khán giả)
+    và gửi ở các lượt sau của event loop, sau các thông điệp của người chơi,
+    mỗi lượt FLUSH_BATCH người để event loop vẫn kịp đọc nước đi tiếp theo.
+    """
+    if not ready_channels and not ready_viewers:
+        asyncio.get_running_loop().call_soon(flush_viewers)
+    ready_channels.add(channel)
+
+def flush_viewers():
+    while ready_channels:
+        ready_viewers.update(ready_channels.pop().viewers)
+    for _ in range(min(FLUSH_BATCH, len(ready_viewers))):
+        flush_viewer(ready_viewers.pop())
+    if ready_viewers:
+        asyncio.get_running_loop().call_soon(flush_viewers)
+
+def flush_viewer(viewer):
+    """Ghi thẳng vào transport; chỉ khán giả có bộ đệm gửi đầy mới cần một task chờ drain()."""
+    writer, channel = viewer.conn, viewer.channel
+    if viewer.waiter is not None or writer.transport.is_closing():
+        return
+    data = channel.take(viewer)
+    if data:
+        writer.write(data)
+    if channel.done(viewer):
+        writer.close()
+    elif writer.transport.get_write_buffer_size() > VIEWER_BUFFER:
+        viewer.waiter = asyncio.ensure_future(drain_viewer(viewer))
+
+async def drain_viewer(viewer):
+    try:
+        await viewer.conn.drain()
+    except Exception:
+        viewer.conn.close()  # khán giả đã đóng kết nối
+        return
+    viewer.waiter = None
+    flush_viewer(viewer)  # những gì dồn lại trong lúc chờ (hoặc ảnh chụp mới)
+
+async def watch_match(reader, writer, match_id):
+    """WATCH <mã>: thêm khán giả vào trận; chờ tới khi trận xong hoặc khán giả đóng kết nối."""
+    channel = spectators.hub.get(match_id)
+    if channel is None:
+        send(writer, "INVALID Unknown match")
+        writer.close()
+        return
+    viewer = spectators.Viewer(writer)
+    if channel.add(viewer):
+        flush_viewer(viewer)  # ảnh chụp đầu tiên
+        try:
+            while await reader.read(RECV_SIZE):
+                pass  # khán giả không gửi gì; đọc chỉ để biết khi họ đóng kết nối
+        except Exception:
+            pass
+        channel.remove(viewer)
+        if viewer.waiter is not None:
+            viewer.waiter.cancel()
+    writer.close()
+
+def suspend_match(game, players):
+    """Cất ván vào sessions.registry chờ người mất kết nối, rồi mới báo người còn lại."""
+    sessions.registry.suspend(game, players)
+    for _, writer, lines in players.values():
+        send(writer, sessions.registry.notice, wire.encoder(lines))
+
+def resume_player(token, player):
+    """RESUME <token>: chờ bên kia của ván đang chờ; đủ hai người thì chạy tiếp ván."""
+    try:
+        paired = sessions.registry.join(token, player)
+    except KeyError:
+        send(player[1], "INVALID Unknown session", wire.encoder(player[2]))
+        player[1].close()
+        return
+    if paired is not None:
+        game, px, po = paired
+        start_match(px, po, (game.size, game.win_length), game)
+
+async def resume_reaper():
+    """Bên kia không quay lại kịp: báo người đang chờ và ghi kết quả bỏ dở."""
+    while True:
+        await asyncio.sleep(BOT_POLL)
+        j = journal.default_journal()
+        for game, players in sessions.registry.expired():
+            for _, writer, lines in players:
+                send(writer, "OPPONENT_LEFT", wire.encoder(lines))
+                writer.close()
+            if j is not None:
+                j.end_game(game.id, journal.ABANDONED)
+
+async def bot_player(level):
+    bot = ai.start_bot(level, analysis.default_service(), opening_book.default_book())
+    reader, writer = await asyncio.open_connection(sock=bot)
+    return reader, writer, LineReader()
+
+def drop_departed():
+    """
+    Như server.drop_departed: trước mỗi lượt ghép, bỏ khỏi hàng những người chờ
+    đã đóng kết nối. StreamReader nhận EOF (hoặc lỗi) ngay cả khi chưa ai đọc.
+    """
+    for entry, queue in list(queued.items()):
+        reader, writer, _ = entry.player
+        if not entry.waiting:
+            del queued[entry]  # đã được ghép ở lượt trước
+        elif reader.at_eof() or reader.exception() is not None:
+            del queued[entry]
+            queue.remove(entry)
+            writer.close()
+
+async def matchmaker(bot_wait, level):
+    """Như server.matchmaker: ghép cặp theo lô mỗi matchmaking.TICK giây, chờ quá bot_wait thì đấu với máy."""
+    while True:
+        await asyncio.sleep(matchmaking.TICK)
+        now = time.monotonic()
+        drop_departed()
+        for settings, queue in list(waiting.items()):
+            for a, b in queue.pair(now):
+                start_match(a.player, b.player, settings, names=(a.name, b.name))
+            if bot_wait > 0:
+                for entry in queue.expired(bot_wait, now):
+                    start_match(entry.player, await bot_player(level), settings, names=(entry.name, None))
+
+# --- Chương trình chính ---
+
+async def until_terminated():
+    """
+    Chờ SIGTERM ngay trên event loop: KeyboardInterrupt bắn ra giữa một callback
+    (khi có hàng nghìn kết nối) có thể làm một task không bao giờ được đánh
+    thức và asyncio.run() treo lúc tắt.
+    """
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+
+async def serve(host, port, bot_wait=BOT_WAIT, bot_level=ai.DEFAULT_LEVEL):
+    server = await asyncio.start_server(client_connected, host, port, backlog=128)
+    print(f"Starting async server on {host}:{port}")
+    metrics.watch_queues(waiting)
+    metrics.serve()
+    pairing = asyncio.create_task(matchmaker(bot_wait, bot_level))  # giữ tham chiếu tới task
+    reaper = asyncio.create_task(resume_reaper())
+    async with server:
+        await until_terminated()
+    print("Shutting down server.")
+
+def main(host=HOST, port=PORT, bot_wait=BOT_WAIT, bot_level=ai.DEFAULT_LEVEL):
+    try:
+        asyncio.run(serve(host, port, bot_wait, bot_level))
+    except KeyboardInterrupt:
+        print("Shutting down server.")
+    print(f"Sent: {outbox.stats}")
+
+if __name__ == "__main__":
+    main()
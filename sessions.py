@@ -0,0 +1,134 @@
+# sessions.py
+"""
+Mã phiên (session token) để người chơi quay lại đúng ván của mình.
+
+Mỗi ván có một mã ván 64 bit; token của một bên là HMAC(khóa bí mật, mã ván,
+ký hiệu), nên server không phải lưu token nào: khóa bí mật nằm trong thư mục
+nhật ký, sau khi khởi động lại vẫn tính ra đúng token cũ từ mã ván trong nhật
+ký. Server gửi token ngay sau START:
+
+    SESSION <token>
+
+Khi mất kết nối giữa ván (hoặc sau khi server khởi động lại), client kết nối
+mới và gửi `RESUME <token>` thay cho PLAY; khi cả hai bên đã có mặt, ván tiếp
+tục từ đúng thế cờ cũ:
+
+    SYNC <X|O> <n> <k> <bàn cờ: Board.pack() dạng base64>
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+SECRET_FILE = "session.key"
+RESUME_WAIT = 60.0   # ván khôi phục: người đã quay lại chờ đối thủ tối đa chừng này giây
+RESUME_TTL = 600.0   # ván khôi phục không ai quay lại sau chừng này giây thì bỏ
+GRACE_PERIOD = 30.0  # người mất kết nối giữa ván được giữ chỗ chừng này giây (0 = không giữ)
+
+SUSPEND_NOTICE = "CHAT [System]: Opponent disconnected, waiting %gs for them to reconnect"
+
+# Trạng thái gọn của một ván để tiếp tục về sau: ô mã 0 trống, 1 X, 2 O
+GameState = namedtuple("GameState", "id size win_length cells")
+
+_secret = secrets.token_bytes(32)
+
+
+def configure(directory):
+    """Dùng (hoặc tạo) khóa bí mật trong thư mục nhật ký để token còn đúng sau khi khởi động lại."""
+    global _secret
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, SECRET_FILE)
+    try:
+        with open(path, "rb") as f:
+            _secret = f.read()
+    except FileNotFoundError:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(_secret)
+
+
+def new_game_id():
+    return secrets.randbits(64)
+
+
+def token(game_id, sym):
+    msg = b"%016x:%s" % (game_id, sym.encode())
+    return hmac.new(_secret, msg, hashlib.sha256).hexdigest()[:32]
+
+
+class Registry:
+    """
+    Các ván đang chờ người chơi quay lại: ván khôi phục sau khi server chết
+    (load) hoặc ván có người vừa mất kết nối (suspend). Ván chờ chỉ là một
+    ảnh chụp gọn (GameState) cùng kết nối của người còn lại, không giữ luồng
+    hay task nào. join() ghép người quay lại, giống hàng đợi ghép cặp thường.
+    """
+
+    def __init__(self, grace=GRACE_PERIOD):
+        self.grace = grace
+        self.lock = threading.Lock()
+        self.tokens = {}   # token -> (mã ván, ký hiệu), mỗi token dùng được một lần
+        self.entries = {}  # mã ván -> [GameState, {ký hiệu: người chơi}, hạn chót (time.monotonic)]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, game, players, deadline):
+        self.entries[game.id] = [game, dict(players), deadline]
+        for sym in ('X', 'O'):
+            if sym not in players:
+                self.tokens[token(game.id, sym)] = (game.id, sym)
+
+    def load(self, games, ttl=RESUME_TTL):
+        """Ván khôi phục từ nhật ký: bỏ sau ttl giây nếu không ai quay lại."""
+        deadline = time.monotonic() + ttl
+        with self.lock:
+            for game in games:
+                self._add(game, {}, deadline)
+
+    def suspend(self, game, players):
+        """Giữ ván của người vừa mất kết nối trong `grace` giây; players: {ký hiệu: người còn lại}."""
+        with self.lock:
+            self._add(game, players, time.monotonic() + self.grace)
+
+    @property
+    def notice(self):
+        """Thông điệp báo người còn lại, gửi sau khi ván đã nằm trong registry."""
+        return SUSPEND_NOTICE % self.grace
+
+    def join(self, tok, player):
+        """
+        Người chơi gửi RESUME: trả về (ván, người X, người O) khi cả hai đã có
+        mặt, None nếu còn chờ bên kia. Token lạ hoặc đã dùng: KeyError.
+        """
+        with self.lock:
+            game_id, sym = self.tokens.pop(tok)
+            entry = self.entries[game_id]
+            game, players, deadline = entry
+            players[sym] = player
+            if len(players) < 2:
+                # Người đầu tiên quay lại chỉ chờ đối thủ RESUME_WAIT giây
+                entry[2] = min(deadline, time.monotonic() + RESUME_WAIT)
+                return None
+            del self.entries[game_id]
+            return game, players['X'], players['O']
+
+    def expired(self):
+        """Bỏ các ván quá hạn chờ; trả về [(ván, [những người đang chờ])]."""
+        now = time.monotonic()
+        dropped = []
+        with self.lock:
+            for game_id, (game, players, deadline) in list(self.entries.items()):
+                if now < deadline:
+                    continue
+                del self.entries[game_id]
+                for sym in ('X', 'O'):
+                    self.tokens.pop(token(game_id, sym), None)
+                dropped.append((game, list(players.values())))
+        return dropped
+
+
+registry = Registry()
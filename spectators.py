@@ -0,0 +1,366 @@
+# spectators.py
+"""
+Xem trực tiếp một trận (khán giả).
+
+Mỗi trận có một mã (gửi cho hai người chơi qua dòng `MATCH <mã>`). Khán giả
+kết nối và gửi `WATCH <mã>` thay cho PLAY; server trả về ảnh chụp gọn của ván
+rồi chỉ gửi từng thay đổi:
+
+    BOARD <mã> <n> <k> <X|O tới lượt> <bàn cờ: Board.pack() dạng base64>
+    PLACED <X|O> <x> <y>
+    RESULT <X_WIN|O_WIN|DRAW|ABANDONED|X_WIN_TIME|O_WIN_TIME>
+    CLOSED                      trận đã kết thúc, server đóng kết nối
+
+Ván mới (chơi lại) hay ván tiếp tục sau RESUME được gửi lại bằng một dòng BOARD.
+
+Match chỉ gọi Channel (new_game, move, result, close); Channel mã hóa mỗi dòng
+một lần và nối vào nhật ký chung của trận, không chờ mạng, không duyệt khán
+giả: mỗi khán giả chỉ giữ vị trí đã đọc tới (cursor) trong nhật ký đó. Nhật ký
+giữ MAX_BACKLOG dòng cuối: khán giả tụt lại xa hơn thì lần gửi sau là một ảnh
+chụp mới, nên một khán giả chậm không bao giờ làm chậm send() của người chơi
+hay tốn bộ nhớ không giới hạn.
+
+Việc ghi ra mạng do server đảm nhận: chế độ luồng dùng một luồng gửi chung
+(Flusher, socket không chặn), asyncio gửi theo lô sau mỗi lượt của event loop.
+
+Đo với 10k khán giả:
+
+    python bench_spectators.py --viewers 10000
+"""
+import base64
+import itertools
+import selectors
+import socket
+import threading
+from collections import deque
+
+import journal
+from game_logic import Board
+
+MAX_BACKLOG = 64  # số dòng giữ trong nhật ký của trận; khán giả tụt lại xa hơn nhận ảnh chụp mới
+
+RESULTS = {journal.X_WIN: "X_WIN", journal.O_WIN: "O_WIN", journal.DRAW: "DRAW",
+           journal.ABANDONED: "ABANDONED", journal.X_WIN_TIME: "X_WIN_TIME",
+           journal.O_WIN_TIME: "O_WIN_TIME"}
+CLOSED = b"CLOSED\n"
+
+
+class Viewer:
+    """Một khán giả: conn do server giữ (socket hoặc StreamWriter)."""
+    __slots__ = ("conn", "channel", "cursor", "resync", "out", "waiter")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.channel = None
+        self.cursor = 0         # số thứ tự dòng tiếp theo cần gửi trong nhật ký của trận
+        self.resync = True      # lần gửi tới là ảnh chụp (khán giả mới)
+        self.out = b""          # phần đã lấy ra nhưng chưa gửi hết (Flusher)
+        self.waiter = None      # task chờ bộ đệm gửi trống bớt (asyncio)
+
+
+class Channel:
+    """
+    Luồng sự kiện của một trận cho khán giả. Channel tự giữ một bàn cờ theo
+    các nước đi để dựng ảnh chụp mà không phải đọc bàn cờ của trận (khán giả
+    vào từ luồng khác với luồng của trận).
+
+    Mỗi dòng được nối một lần vào nhật ký `log` (dòng đầu có số thứ tự `base`,
+    dòng kế tiếp sẽ là `head`); khán giả đọc từ cursor của mình tới head.
+    notify(channel) được gọi một lần cho mỗi dòng mới, không phải một lần cho
+    mỗi khán giả (server đánh thức luồng gửi, hoặc hẹn một lượt gửi trên
+    event loop); khán giả của trận được duyệt ở phía gửi, ngoài luồng của trận.
+    """
+
+    def __init__(self, match_id, notify, hub=None):
+        self.id = match_id
+        self.notify = notify
+        self.hub = hub
+        self.lock = threading.Lock()
+        self.viewers = set()
+        self.log = deque()
+        self.base = 0
+        self.head = 0
+        self.board = None
+        self.win_length = 0
+        self.turn = 'X'
+        self.outcome = b""  # dòng RESULT của ván vừa xong (nằm trong ảnh chụp)
+        self.closed = False
+        self._snapshot = None
+
+    def __len__(self):
+        return len(self.viewers)
+
+    # --- Phía trận (Match) ---
+
+    def new_game(self, size, win_length, cells=None, turn='X'):
+        """
+        Ván mới hoặc ván tiếp tục (cells: Board.snapshot() của trận, chỉ đọc):
+        gửi ảnh chụp cho mọi khán giả. Channel sao chép các ô đúng một lần.
+        """
+        with self.lock:
+            self.board = Board(size) if cells is None else Board.from_bytes(size, cells)
+            self.win_length = win_length
+            self.turn = turn
+            self.outcome = b""
+            self._snapshot = None
+            data = self.snapshot()
+        self.publish(data)
+
+    def move(self, sym, x, y):
+        with self.lock:
+            self.board.cells[x * self.board.size + y] = ord(sym)
+            self.turn = 'O' if sym == 'X' else 'X'
+            self._snapshot = None
+        self.publish(f"PLACED {sym} {x} {y}")
+
+    def result(self, result):
+        data = b"RESULT %s\n" % RESULTS[result].encode()
+        with self.lock:
+            self.outcome = data
+            self._snapshot = None
+        self.publish(data)
+
+    def close(self):
+        """Trận kết thúc: khán giả nhận nốt CLOSED rồi bị đóng kết nối."""
+        if self.hub is not None:
+            self.hub.discard(self)
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.publish(CLOSED)
+
+    def publish(self, line):
+        """Nối một dòng vào nhật ký của trận (mã hóa một lần), báo phía gửi một lần."""
+        data = line if isinstance(line, bytes) else (line + "\n").encode()
+        with self.lock:
+            self.log.append(data)
+            self.head += 1
+            if len(self.log) > MAX_BACKLOG:
+                self.log.popleft()
+                self.base += 1
+            watched = bool(self.viewers)
+        if watched:
+            self.notify(self)
+
+    # --- Phía khán giả (server) ---
+
+    def add(self, viewer):
+        """
+        Thêm khán giả; False nếu trận đã kết thúc. Người gọi tự gửi lần đầu
+        (ảnh chụp) cho khán giả này, không đánh thức cả trận.
+        """
+        viewer.channel = self
+        with self.lock:
+            if self.closed:
+                return False
+            self.viewers.add(viewer)
+        return True
+
+    def remove(self, viewer):
+        with self.lock:
+            self.viewers.discard(viewer)
+
+    def members(self):
+        """Bản sao danh sách khán giả, cho phía gửi duyệt ngoài lock."""
+        with self.lock:
+            return list(self.viewers)
+
+    def snapshot(self):
+        """Dòng BOARD (kèm RESULT nếu ván đã xong), dựng một lần cho mọi khán giả cần; gọi khi giữ lock."""
+        if self._snapshot is None:
+            board = self.board
+            if board is None:
+                return b""  # trận chưa bắt đầu ván nào
+            packed = base64.b64encode(board.pack()).decode()
+            self._snapshot = (f"BOARD {self.id} {board.size} {self.win_length} "
+                              f"{self.turn} {packed}\n").encode() + self.outcome
+        return self._snapshot
+
+    def take(self, viewer):
+        """Lấy hết dữ liệu đang chờ của khán giả để gửi trong một lần ghi (b"" nếu không có)."""
+        with self.lock:
+            if viewer.resync or viewer.cursor < self.base:
+                # Khán giả mới, hoặc tụt lại quá MAX_BACKLOG dòng: ảnh chụp đã gồm mọi thay đổi
+                viewer.resync = False
+                viewer.cursor = self.head
+                data = self.snapshot()
+                return data + CLOSED if self.closed else data
+            if viewer.cursor == self.head:
+                return b""
+            data = b"".join(itertools.islice(self.log, viewer.cursor - self.base, None))
+            viewer.cursor = self.head
+            return data
+
+    def done(self, viewer):
+        """Trận đã kết thúc và khán giả đã lấy hết dữ liệu: server đóng kết nối của họ."""
+        return self.closed and not viewer.resync and viewer.cursor == self.head
+
+
+class Hub:
+    """Các trận đang có thể xem trong tiến trình này, theo mã trận."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.counter = itertools.count(1)
+        self.prefix = ""  # cluster: số thứ tự worker, để broker biết trận nằm ở đâu
+
+    def __len__(self):
+        return len(self.channels)
+
+    def open(self, notify):
+        with self.lock:
+            match_id = "%s%x" % (self.prefix, next(self.counter))
+            channel = Channel(match_id, notify, self)
+            self.channels[match_id] = channel
+        return channel
+
+    def discard(self, channel):
+        with self.lock:
+            self.channels.pop(channel.id, None)
+
+    def get(self, match_id):
+        with self.lock:
+            return self.channels.get(match_id)
+
+
+hub = Hub()
+
+
+def owner(match_id):
+    """Số thứ tự worker giữ trận (mã dạng '<worker>.<số>'); None nếu không phải mã của cluster."""
+    head, sep, _ = match_id.partition(".")
+    return int(head) if sep and head.isdigit() else None
+
+
+# --- Gửi cho khán giả bằng một luồng (server.py) ---
+
+class Flusher:
+    """
+    Một luồng ghi cho mọi khán giả của tiến trình: socket không chặn, chỉ chờ
+    ghi (EVENT_WRITE) khi bộ đệm gửi của khán giả đã đầy. Luồng của trận chỉ
+    báo trận có dòng mới (notify, một lần mỗi sự kiện) rồi đánh thức luồng
+    này; việc duyệt khán giả của trận nằm ở đây.
+    """
+
+    def __init__(self):
+        self.sel = selectors.DefaultSelector()
+        self.wake, self.waker = socket.socketpair()
+        self.wake.setblocking(False)
+        self.waker.setblocking(False)
+        self.sel.register(self.wake, selectors.EVENT_READ)
+        self.lock = threading.Lock()
+        self.ready = set()   # trận có dòng mới cho khán giả
+        self.joined = []     # khán giả mới, chờ đăng ký vào selector
+        self.live = set()    # khán giả đã đăng ký
+        self.blocked = set() # khán giả đang chờ bộ đệm gửi trống bớt
+
+    def __len__(self):
+        return len(self.live)
+
+    def add(self, viewer, channel):
+        viewer.conn.setblocking(False)
+        # Vào channel trước khi đăng ký: ảnh chụp đầu tiên gồm mọi thay đổi từ lúc này
+        channel.add(viewer)
+        with self.lock:
+            self.joined.append(viewer)
+        self.signal()
+
+    def notify(self, channel):
+        with self.lock:
+            first = not self.ready
+            self.ready.add(channel)
+        if first:
+            self.signal()
+
+    def signal(self):
+        try:
+            self.waker.send(b"\0")
+        except OSError:
+            pass  # bộ đệm đầy: luồng gửi chắc chắn sẽ thức dậy
+
+    def drop(self, viewer):
+        viewer.channel.remove(viewer)
+        self.live.discard(viewer)
+        self.blocked.discard(viewer)
+        self.sel.unregister(viewer.conn)
+        viewer.conn.close()
+
+    def flush(self, viewer):
+        """Gửi hết những gì đang chờ của khán giả, tới khi bộ đệm gửi đầy."""
+        conn, channel = viewer.conn, viewer.channel
+        while True:
+            if not viewer.out:
+                viewer.out = channel.take(viewer)
+                if not viewer.out:
+                    break
+            try:
+                sent = conn.send(viewer.out)
+            except BlockingIOError:
+                if viewer not in self.blocked:
+                    self.blocked.add(viewer)
+                    self.sel.modify(conn, selectors.EVENT_READ | selectors.EVENT_WRITE, viewer)
+                return
+            except OSError:
+                self.drop(viewer)
+                return
+            viewer.out = viewer.out[sent:]
+        if viewer in self.blocked:
+            self.blocked.discard(viewer)
+            self.sel.modify(conn, selectors.EVENT_READ, viewer)
+        if channel.done(viewer):
+            self.drop(viewer)
+
+    def closed_by_peer(self, viewer):
+        """Khán giả không gửi gì; đọc chỉ để biết khi họ đóng kết nối."""
+        try:
+            while viewer.conn.recv(4096):
+                pass
+        except BlockingIOError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    def run(self):
+        while True:
+            for key, events in self.sel.select():
+                viewer = key.data
+                if viewer is None:
+                    try:
+                        while self.wake.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif events & selectors.EVENT_READ and self.closed_by_peer(viewer):
+                    self.drop(viewer)
+                elif events & selectors.EVENT_WRITE:
+                    self.flush(viewer)
+
+            with self.lock:
+                joined, self.joined = self.joined, []
+                channels, self.ready = self.ready, set()
+            ready = set()
+            for channel in channels:
+                ready.update(channel.members())
+            for viewer in joined:
+                self.sel.register(viewer.conn, selectors.EVENT_READ, viewer)
+                self.live.add(viewer)
+                ready.add(viewer)  # ảnh chụp đầu tiên (hoặc CLOSED nếu trận vừa kết thúc)
+            for viewer in ready:
+                if viewer in self.live and viewer not in self.blocked:
+                    self.flush(viewer)
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def default_flusher():
+    """Luồng gửi của tiến trình hiện tại, tạo khi cần lần đầu (sau khi cluster đã fork worker)."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = Flusher()
+            threading.Thread(target=_flusher.run, daemon=True).start()
+        return _flusher
@@ -0,0 +1,5 @@
+# Các module nằm phẳng ở thư mục gốc của dự án
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+# tests/test_ai.py
+import socket
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import ai
+from framing import LineReader
+
+FAST = ai.Level(depth=1, time_limit=0.05, width=4)
+
+
+class Pool:
+    """Thay cho analysis.AnalysisService: giữ các Future, test tự quyết khi nào xong."""
+
+    def __init__(self):
+        self.futures = []
+        self.submitted = threading.Event()
+
+    def submit(self, board, sym, win_length, level, deadline=None):
+        future = Future()
+        self.futures.append(future)
+        self.submitted.set()
+        return future
+
+
+def start(monkeypatch, slack):
+    """Máy chơi với pool giả, vừa nhận lượt đi; trả về (socket phía server, pool, luồng của máy)."""
+    monkeypatch.setattr(ai, "POOL_SLACK", slack)
+    server, bot_side = socket.socketpair()
+    server.settimeout(5)
+    pool = Pool()
+    thread = threading.Thread(target=ai.BotClient(bot_side, FAST, pool).run, daemon=True)
+    thread.start()
+    server.sendall(b"START X 15 5\nYOUR TURN\n")
+    assert pool.submitted.wait(5)
+    return server, pool, thread
+
+
+def test_pool_result_is_played(monkeypatch):
+    server, pool, _ = start(monkeypatch, 5.0)
+    pool.futures[0].set_result((7, 7))
+    assert LineReader().readline(server) == "MOVE 7 7"
+    server.close()
+
+
+def test_slow_pool_falls_back_to_engine(monkeypatch):
+    server, pool, _ = start(monkeypatch, 0.05)
+    assert LineReader().readline(server).startswith("MOVE ")
+    assert pool.futures[0].cancelled()
+    server.close()
+
+
+@pytest.mark.parametrize("end", [b"OPPONENT_LEFT\n", b"LOSE\n", None])
+def test_game_over_cancels_search(monkeypatch, end):
+    server, pool, thread = start(monkeypatch, 5.0)  # pool không quá hạn: chỉ ván kết thúc mới dừng được
+    if end is None:
+        server.shutdown(socket.SHUT_WR)  # mất kết nối
+    else:
+        server.sendall(b"CHAT [System]: hi\n" + end)
+    reply = LineReader().readline(server)
+    # Không có MOVE: sau LOSE máy xin REMATCH, sau OPPONENT_LEFT hay EOF thì đóng kết nối
+    assert reply == ("REMATCH" if end == b"LOSE\n" else None)
+    assert pool.futures[0].cancelled()
+    server.close()
+    thread.join(5)
+    assert not thread.is_alive()
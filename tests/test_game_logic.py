@@ -0,0 +1,83 @@
+# tests/test_game_logic.py
+import random
+
+import pytest
+
+from game_logic import Board, BitBoard, apply_move, check_win, is_full
+
+
+@pytest.mark.parametrize("size", [15, 16, 17, 32, 33, 64, 65, 99])
+def test_bitboard_masks_fit_every_size(size):
+    bits = BitBoard(size, 5)
+    last = size - 1
+    for i in range(5):
+        assert bits.apply_move(last - i, last - i, 'O') == (True, None)
+    assert bits.check_win(last, last)
+    assert bits.get(last, last) == 'O' and bits.get(0, 0) == '.'
+    bits.remove(last, last)
+    assert bits.get(last, last) == '.' and not bits.check_win(last - 1, last - 1)
+    bits.reset()
+    assert bits.moves == 0 and not any(bits.masks)
+
+
+def test_bitboard_reset_keeps_boards_independent():
+    a, b = BitBoard(15), BitBoard(15)
+    a.apply_move(7, 7, 'X')
+    assert b.get(7, 7) == '.'
+    a.reset()
+    assert a.get(7, 7) == '.' and a.apply_move(7, 7, 'O') == (True, None)
+    assert BitBoard(15).get(7, 7) == '.'
+
+
+# --- BitBoard so với check_win/is_full trên Board ---
+
+def random_game(rng, size):
+    """Dãy (x, y, symbol) phủ một phần ngẫu nhiên của bàn; thỉnh thoảng cùng một bên đánh hai lần liền."""
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    rng.shuffle(cells)
+    n = rng.randint(1, len(cells))
+    return [(x, y, 'XO'[i % 2] if rng.random() < 0.8 else rng.choice('XO'))
+            for i, (x, y) in enumerate(cells[:n])]
+
+
+@pytest.mark.parametrize("size, win_length, games", [
+    (5, 3, 200), (5, 4, 200), (5, 5, 300), (6, 6, 300), (7, 3, 100), (7, 7, 200),
+    (15, 5, 100), (15, 15, 30), (16, 5, 30), (17, 6, 30), (19, 5, 30),
+    (32, 5, 5), (33, 33, 5), (64, 5, 2), (65, 5, 2), (99, 5, 1), (99, 99, 1),
+])
+def test_bitboard_matches_check_win(size, win_length, games):
+    rng = random.Random(size * 1000 + win_length)
+    for _ in range(games):
+        moves = random_game(rng, size)
+        board = Board(size)
+        bits = BitBoard(size, win_length)
+        for x, y, sym in moves:
+            apply_move(board, x, y, sym)
+            bits.apply_move(x, y, sym)
+            assert bits.check_win(x, y) == check_win(board, x, y, win_length), (x, y, sym)
+            assert bits.is_full() == is_full(board)
+        for x in range(size):
+            for y in range(size):
+                assert bits.check_win(x, y) == check_win(board, x, y, win_length), (x, y)
+
+
+@pytest.mark.parametrize("size", [5, 6, 15])
+def test_full_length_lines_touching_edges(size):
+    """k == size: chỉ các đường đủ dài (hàng, cột, hai đường chéo lớn) thắng được, hai đầu đều là mép bàn."""
+    lines = [[(0, y) for y in range(size)], [(x, size - 1) for x in range(size)],
+             [(i, i) for i in range(size)], [(i, size - 1 - i) for i in range(size)]]
+    for line in lines:
+        board, bits = Board(size), BitBoard(size, size)
+        for x, y in line:
+            apply_move(board, x, y, 'X')
+            bits.apply_move(x, y, 'X')
+        for x, y in line:
+            assert check_win(board, x, y, size) and bits.check_win(x, y)
+        # Bỏ một quân ở đầu đường: không còn đủ size quân
+        bits.remove(*line[0])
+        assert not bits.check_win(*line[-1])
+    # Chéo ngắn hơn size không bao giờ đủ
+    bits = BitBoard(size, size)
+    for i in range(size - 1):
+        bits.apply_move(i, i + 1, 'O')
+    assert not bits.check_win(0, 1)
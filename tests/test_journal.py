@@ -0,0 +1,126 @@
+# tests/test_journal.py
+import argparse
+
+import pytest
+
+import journal
+import recovery
+from match import Match
+
+
+def run_match(directory, moves, time_up=False):
+    """Một ván ghi nhật ký: p1 (X) và p2 (O) đi lần lượt `moves`, rồi (tùy chọn) người tới lượt hết giờ."""
+    sent = []
+    j = journal.Journal(directory)
+    m = Match("p1", "p2", lambda peer, msg: sent.append((peer, msg)), journal=j)
+    m.start()
+    for i, (x, y) in enumerate(moves):
+        m.handle("p1" if i % 2 == 0 else "p2", f"MOVE {x} {y}")
+    if time_up:
+        m.time_up()
+    j.close()
+    return sent
+
+
+def games(directory):
+    return list(journal.iter_games(journal.segments(str(directory))))
+
+
+def test_timeout_win_replays(tmp_path, capsys):
+    # X đi một nước rồi O hết giờ: X thắng mà không có hàng nào
+    sent = run_match(tmp_path, [(7, 7)], time_up=True)
+    assert ("p1", "WIN") in sent and ("p2", "LOSE") in sent
+    [game] = games(tmp_path)
+    assert game.result == journal.X_WIN_TIME
+    assert journal.replay_result(game) == journal.X_WIN_TIME
+
+    journal.replay(argparse.Namespace(path=str(tmp_path)))
+    assert "1 games, 1 moves, 0 mismatches" in capsys.readouterr().out
+
+
+def test_timeout_of_x(tmp_path):
+    run_match(tmp_path, [(7, 7), (0, 0)], time_up=True)
+    [game] = games(tmp_path)
+    assert game.result == journal.O_WIN_TIME
+    assert journal.replay_result(game) == journal.O_WIN_TIME
+
+
+def test_timeout_claimed_for_wrong_side(tmp_path):
+    # Bên vừa đi không thể thua vì hết giờ: replay không nhận kết quả này
+    j = journal.Journal(tmp_path)
+    j.start_game(1, 15, 5)
+    j.move(1, 7, 7, 'X')
+    j.end_game(1, journal.O_WIN_TIME)
+    j.close()
+    [game] = games(tmp_path)
+    assert journal.replay_result(game) == journal.ABANDONED
+
+
+def test_line_win_replays(tmp_path):
+    run_match(tmp_path, [(7, 3), (0, 0), (7, 4), (0, 2), (7, 5), (0, 4), (7, 6), (0, 6), (7, 7)])
+    [game] = games(tmp_path)
+    assert game.result == journal.X_WIN
+    assert journal.replay_result(game) == journal.X_WIN
+
+
+def test_move_after_win_rejected(tmp_path):
+    j = journal.Journal(tmp_path)
+    j.start_game(1, 15, 5)
+    moves = [(7, 3), (0, 0), (7, 4), (0, 2), (7, 5), (0, 4), (7, 6), (0, 6), (7, 7), (0, 8)]
+    for i, (x, y) in enumerate(moves):
+        j.move(1, x, y, 'XO'[i % 2])
+    j.end_game(1, journal.X_WIN)
+    j.close()
+    [game] = games(tmp_path)
+    assert journal.replay_result(game) is None
+
+
+def test_unfinished_board_is_not_a_draw(tmp_path):
+    run_match(tmp_path, [(7, 7), (0, 0)])
+    [game] = journal.iter_games(journal.segments(str(tmp_path)), include_open=True)
+    assert journal.replay_result(game._replace(result=journal.DRAW)) == journal.ABANDONED
+
+
+def adopted_game(directory, adopter_first, finish):
+    """
+    Một ván bắt đầu ở một nhật ký, người chơi quay lại ở worker khác nên ván được
+    nhận (adopt) sang nhật ký thứ hai cùng thư mục; `adopter_first`: đoạn của nhật ký
+    nhận ván đứng trước khi sắp theo tên.
+    """
+    first = journal.Journal(directory)
+    second = journal.Journal(directory)
+    origin, adopter = (second, first) if adopter_first else (first, second)
+    moves = [(7, 3), (0, 0), (7, 4), (0, 2), (7, 5), (0, 4), (7, 6), (0, 6), (7, 7)]
+    origin.start_game(1, 15, 5)
+    cells = bytearray(15 * 15)
+    for i, (x, y) in enumerate(moves[:4]):
+        origin.move(1, x, y, 'XO'[i % 2])
+        cells[x * 15 + y] = i % 2 + 1
+    adopter.adopt(1, 15, 5, cells)
+    origin.release(1)  # broker báo worker cũ khi ván tiếp tục ở worker khác
+    for i, (x, y) in enumerate(moves[4:finish], 4):
+        adopter.move(1, x, y, 'XO'[i % 2])
+    if finish == len(moves):
+        adopter.end_game(1, journal.X_WIN)
+    origin.close()
+    adopter.close()
+    return moves[:finish]
+
+
+@pytest.mark.parametrize("adopter_first", [True, False])
+def test_adopted_game_recovers_across_journals(tmp_path, adopter_first):
+    moves = adopted_game(tmp_path, adopter_first, finish=7)
+    [state] = recovery.recover(str(tmp_path))
+    assert sorted(c for c, v in enumerate(state.cells) if v) == sorted(x * 15 + y for x, y in moves)
+    [game] = journal.iter_games(journal.segments(str(tmp_path)), include_open=True)
+    assert sorted(m[:2] for m in game.moves) == sorted(moves)
+
+
+@pytest.mark.parametrize("adopter_first", [True, False])
+def test_adopted_game_replays_across_journals(tmp_path, adopter_first):
+    moves = adopted_game(tmp_path, adopter_first, finish=9)
+    assert recovery.recover(str(tmp_path)) == []
+    # Nước cũ của nhật ký gốc đọc sau không tạo ra một ván mở thứ hai
+    [game] = journal.iter_games(journal.segments(str(tmp_path)), include_open=True)
+    assert len(game.moves) == len(moves)
+    assert journal.replay_result(game) == journal.X_WIN
@@ -0,0 +1,52 @@
+# tests/test_match.py
+import journal
+import sessions
+from match import Match, resume_error
+
+
+def state(size, stones, win_length=5, game_id=1):
+    """GameState với các quân {(x, y): 'X' | 'O'}."""
+    cells = bytearray(size * size)
+    for (x, y), sym in stones.items():
+        cells[x * size + y] = 1 if sym == 'X' else 2
+    return sessions.GameState(game_id, size, win_length, bytes(cells))
+
+
+def test_resume_error_accepts_game_in_progress():
+    assert resume_error(state(15, {(7, 7): 'X', (7, 8): 'O', (8, 8): 'X'})) is None
+
+
+def test_resume_error_rejects_bad_positions():
+    assert resume_error(state(15, {(7, 7): 'O'})) == "bad stone count"
+    assert resume_error(state(15, {(0, 0): 'X', (0, 1): 'X', (0, 2): 'X'})) == "bad stone count"
+    five = {(7, y): 'X' for y in range(3, 8)}
+    five.update({(0, y): 'O' for y in range(0, 8, 2)})
+    assert resume_error(state(15, five)) == "game already won"
+    bad = state(15, {})._replace(cells=b"\3" + bytes(15 * 15 - 1))
+    assert resume_error(bad) == "bad cell"
+    assert resume_error(state(15, {})._replace(win_length=20)) == "bad board settings"
+
+
+def test_resume_rejects_won_position(tmp_path):
+    five = {(7, y): 'X' for y in range(3, 8)}
+    five.update({(0, y): 'O' for y in range(0, 8, 2)})
+    game = state(15, five, game_id=42)
+    sent = []
+    j = journal.Journal(tmp_path)
+    j.start_game(42, 15, 5)
+    m = Match("p1", "p2", lambda peer, msg: sent.append((peer, msg)), journal=j)
+    m.resume(game)
+    j.close()
+    assert m.finished and not m.game_active
+    assert ("p1", "OPPONENT_LEFT") in sent and ("p2", "OPPONENT_LEFT") in sent
+    assert not any(msg.startswith("SYNC") for _, msg in sent)
+    [recorded] = journal.iter_games(journal.segments(str(tmp_path)))
+    assert recorded.result == journal.ABANDONED
+
+
+def test_resume_continues_valid_position():
+    sent = []
+    m = Match("p1", "p2", lambda peer, msg: sent.append((peer, msg)))
+    m.resume(state(15, {(7, 7): 'X'}))
+    assert m.game_active and m.current == "p2"
+    assert ("p2", "YOUR TURN") in sent
@@ -0,0 +1,50 @@
+# tests/test_server.py
+import asyncio
+import selectors
+import socket
+
+import matchmaking
+import server
+import server_async
+
+
+def test_departed_player_leaves_queue():
+    queue = matchmaking.Queue()
+    sel = selectors.DefaultSelector()
+    pairs = [socket.socketpair() for _ in range(3)]
+    entries = []
+    for conn, _ in pairs:
+        entry = queue.add(conn, 1500.0)
+        sel.register(conn, selectors.EVENT_READ, (queue, entry))
+        entries.append(entry)
+    pairs[0][1].close()              # người chờ đầu tiên bỏ đi
+    pairs[1][1].sendall(b"CHAT hi\n")  # người thứ hai gửi dữ liệu: vẫn chờ, dữ liệu còn nguyên
+
+    assert server.drop_departed(sel) == [entries[0]]
+    assert len(queue) == 2
+    [(a, b)] = queue.pair()
+    assert (a, b) == (entries[1], entries[2])
+    assert pairs[1][0].recv(64) == b"CHAT hi\n"
+    for conn, peer in pairs:
+        conn.close()
+        peer.close()
+
+
+def test_departed_player_leaves_async_queue():
+    async def run():
+        queue = matchmaking.Queue()
+        pairs = [socket.socketpair() for _ in range(2)]
+        for conn, _ in pairs:
+            reader, writer = await asyncio.open_connection(sock=conn)
+            entry = queue.add((reader, writer, None), 1500.0)
+            server_async.queued[entry] = queue
+        pairs[0][1].close()
+        await asyncio.sleep(0.05)  # event loop nhận EOF
+        server_async.drop_departed()
+        assert len(queue) == 1 and len(server_async.queued) == 1
+        [(entry, _)] = server_async.queued.items()
+        assert entry.player[1] is writer  # người còn kết nối
+        server_async.queued.clear()
+        writer.close()
+        pairs[1][1].close()
+    asyncio.run(run())
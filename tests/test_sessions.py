@@ -0,0 +1,48 @@
+# tests/test_sessions.py
+import sessions
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def game(game_id):
+    return sessions.GameState(game_id, 15, 5, bytes(15 * 15))
+
+
+def test_recovered_game_expires(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    registry = sessions.Registry()
+    registry.load([game(1), game(2)], ttl=600)
+    assert registry.expired() == [] and len(registry) == 2
+
+    clock.now += 601
+    dropped = registry.expired()
+    assert sorted(g.id for g, players in dropped) == [1, 2]
+    assert all(players == [] for _, players in dropped)
+    assert len(registry) == 0 and not registry.tokens
+
+
+def test_first_player_back_waits_resume_wait(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    registry = sessions.Registry()
+    registry.load([game(1)], ttl=600)
+    assert registry.join(sessions.token(1, 'X'), "px") is None
+
+    clock.now += sessions.RESUME_WAIT + 1
+    [(g, players)] = registry.expired()
+    assert g.id == 1 and players == ["px"]
+
+
+def test_both_players_back_resume():
+    registry = sessions.Registry()
+    registry.load([game(1)])
+    assert registry.join(sessions.token(1, 'O'), "po") is None
+    assert registry.join(sessions.token(1, 'X'), "px") == (game(1), "px", "po")
+    assert len(registry) == 0
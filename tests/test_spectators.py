@@ -0,0 +1,59 @@
+# tests/test_spectators.py
+import spectators
+from game_logic import Board, apply_move
+
+
+def open_channel():
+    woken = []
+    channel = spectators.Channel("1", woken.append)
+    channel.new_game(15, 5)
+    return channel, woken
+
+
+def test_publish_wakes_once_per_line():
+    channel, woken = open_channel()
+    viewers = [spectators.Viewer(None) for _ in range(100)]
+    for v in viewers:
+        assert channel.add(v)
+        assert channel.take(v).startswith(b"BOARD 1 15 5 X ")
+    channel.move('X', 7, 7)
+    channel.move('O', 0, 0)
+    assert woken == [channel, channel]
+    for v in viewers:
+        assert channel.take(v) == b"PLACED X 7 7\nPLACED O 0 0\n"
+        assert channel.take(v) == b""
+
+
+def test_lagging_viewer_gets_snapshot():
+    channel, _ = open_channel()
+    fast, slow = spectators.Viewer(None), spectators.Viewer(None)
+    for v in (fast, slow):
+        channel.add(v)
+        channel.take(v)
+    for i in range(spectators.MAX_BACKLOG + 1):
+        channel.move('XO'[i % 2], i // 15, i % 15)
+        assert channel.take(fast).startswith(b"PLACED")
+    data = channel.take(slow)
+    assert data.startswith(b"BOARD") and b"PLACED" not in data
+    assert channel.take(slow) == b""
+
+
+def test_done_after_closed_drained():
+    channel, _ = open_channel()
+    viewer = spectators.Viewer(None)
+    channel.add(viewer)
+    channel.take(viewer)
+    channel.close()
+    assert not channel.done(viewer)
+    assert channel.take(viewer) == spectators.CLOSED
+    assert channel.done(viewer)
+
+
+def test_new_game_copies_board_snapshot_once():
+    board = Board(15)
+    apply_move(board, 7, 7, 'X')
+    channel = spectators.Channel("1", lambda channel: None)
+    channel.new_game(15, 5, board.snapshot(), 'O')
+    apply_move(board, 0, 0, 'O')  # trận đi tiếp: bàn của Channel chỉ đổi qua move()
+    assert channel.board.get(7, 7) == 'X' and channel.board.get(0, 0) == '.'
+    assert channel.board.cells is not board.cells
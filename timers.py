@@ -0,0 +1,158 @@
+# timers.py
+"""
+Đồng hồ của các trận: thời gian mỗi lượt đi và thời gian chờ khi không ai làm gì.
+
+Mỗi trận có vài đồng hồ bị đặt lại liên tục (sau mỗi nước đi, mỗi dòng chat
+lúc chờ chơi lại), gần như không bao giờ tới hạn. Thay vì một luồng (hay
+threading.Timer) cho mỗi trận, cả tiến trình dùng chung một bánh xe thời gian
+(hashed timing wheel): SLOTS ô, mỗi ô ứng với một nhịp TICK giây, đồng hồ hạn
+ở nhịp t nằm trong ô t % SLOTS. Đặt và hủy đồng hồ là O(1); mỗi nhịp chỉ xem
+đúng một ô. Một luồng nền duy nhất quay bánh xe và gọi các đồng hồ tới hạn.
+
+Callback chạy trên luồng của bánh xe: server tự đưa nó về đúng ngữ cảnh của
+trận (giữ khóa của trận, hoặc call_soon_threadsafe về event loop).
+
+Đo chi phí với 10k trận:
+
+    python timers.py --matches 10000
+"""
+import argparse
+import math
+import random
+import threading
+import time
+import traceback
+
+TICK = 0.1
+SLOTS = 512
+MOVE_TIME = 120.0    # mỗi lượt được chừng này giây, hết giờ thì thua (0 = không giới hạn)
+IDLE_TIMEOUT = 60.0  # ván đã xong mà không ai gửi gì chừng này giây thì đóng trận (0 = không đóng)
+
+
+class Timer:
+    __slots__ = ("expires", "callback")
+
+    def __init__(self, expires, callback):
+        self.expires = expires  # số nhịp tính từ lúc tạo bánh xe
+        self.callback = callback
+
+    def cancel(self):
+        """Hủy đồng hồ; nó được bỏ khỏi ô khi bánh xe quay tới."""
+        self.callback = None
+
+
+class TimerWheel:
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.ticks = 0  # nhịp đã xử lý xong
+        self.origin = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(1 for slot in self.slots for t in slot if t.callback is not None)
+
+    def schedule(self, delay, callback):
+        """Gọi callback() sau delay giây (làm tròn lên theo nhịp); trả về Timer để hủy."""
+        with self.lock:
+            expires = self.ticks + max(1, math.ceil(delay / self.tick))
+            timer = Timer(expires, callback)
+            self.slots[expires % len(self.slots)].append(timer)
+        return timer
+
+    def advance(self, now=None):
+        """Quay bánh xe tới thời điểm now (time.monotonic()); gọi các đồng hồ tới hạn."""
+        if now is None:
+            now = time.monotonic()
+        target = int((now - self.origin) / self.tick)
+        due = []
+        with self.lock:
+            slots = self.slots
+            while self.ticks < target:
+                self.ticks += 1
+                slot = slots[self.ticks % len(slots)]
+                if not slot:
+                    continue
+                keep = []
+                for t in slot:
+                    if t.callback is None:
+                        continue
+                    if t.expires <= self.ticks:
+                        due.append(t.callback)
+                    else:
+                        keep.append(t)  # còn phải đi thêm vài vòng
+                slot[:] = keep
+        for callback in due:
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()  # một trận lỗi không được làm dừng đồng hồ của các trận khác
+        return len(due)
+
+    def run(self):
+        while True:
+            time.sleep(self.tick)
+            self.advance()
+
+
+# --- Bánh xe dùng chung của tiến trình ---
+
+_limits = (MOVE_TIME, IDLE_TIMEOUT)
+_wheel = None
+_wheel_lock = threading.Lock()
+
+def configure(move_time, idle_timeout):
+    """Thời gian mỗi lượt và thời gian chờ khi không ai làm gì (giây, 0 = tắt)."""
+    global _limits
+    _limits = (move_time, idle_timeout)
+
+def limits():
+    """(thời gian mỗi lượt, thời gian chờ) đang dùng cho các trận mới."""
+    return _limits
+
+def default_wheel():
+    """Bánh xe của tiến trình hiện tại, tạo và cho quay khi cần lần đầu (sau khi cluster đã fork worker)."""
+    global _wheel
+    with _wheel_lock:
+        if _wheel is None:
+            _wheel = TimerWheel()
+            threading.Thread(target=_wheel.run, daemon=True).start()
+        return _wheel
+
+
+# --- Đo chi phí ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure timer wheel cost for many matches")
+    parser.add_argument("--matches", type=int, default=10_000)
+    parser.add_argument("--moves", type=int, default=40, help="clock resets per match")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    wheel = TimerWheel()
+    def ring():
+        pass
+    clocks = [wheel.schedule(MOVE_TIME, ring) for _ in range(args.matches)]
+
+    # Mỗi nước đi: hủy đồng hồ cũ, đặt đồng hồ mới cho người kia
+    t0 = time.perf_counter()
+    for _ in range(args.moves):
+        for i in range(args.matches):
+            clocks[i].cancel()
+            clocks[i] = wheel.schedule(rng.uniform(1, MOVE_TIME), ring)
+    resets = args.matches * args.moves
+    elapsed = time.perf_counter() - t0
+    print(f"{resets} clock resets in {elapsed:.3f}s ({elapsed / resets * 1e6:.2f} us each)")
+
+    # Một vòng bánh xe: dọn các đồng hồ đã hủy, gọi các đồng hồ tới hạn
+    origin = wheel.origin
+    t0 = time.perf_counter()
+    count = wheel.advance(origin + MOVE_TIME + wheel.tick)
+    elapsed = time.perf_counter() - t0
+    ticks = wheel.ticks
+    print(f"{ticks} ticks, {count} timers fired in {elapsed:.3f}s "
+          f"({elapsed / ticks * 1e6:.1f} us per tick, one thread for all {args.matches} matches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+# tournament.py
+"""
+Giải đấu giữa các máy và chạy hàng loạt ván tự đấu (self-play), không cần
+socket: trọng tài là game_logic (apply_move, check_win, is_full), mỗi bên là
+một ai.Engine. Các ván được chia cho một process pool, mỗi tiến trình con
+giữ sẵn Engine của mình giữa các ván (như analysis.py).
+
+Người chơi:
+
+    easy, normal, hard    các mức của ai.LEVELS
+    d<độ sâu>w<độ rộng>   Engine với độ sâu/độ rộng tùy ý (vd. d3w8)
+    random                đánh ngẫu nhiên một ô cạnh quân đã có
+
+Thể thức (--format):
+
+    roundrobin  mỗi cặp đánh --games ván, đổi màu xen kẽ
+    swiss       --rounds vòng; mỗi vòng ghép người cùng điểm chưa gặp nhau,
+                số người lẻ thì người điểm thấp nhất (chưa được miễn) được
+                miễn đấu, tính như thắng cả --games ván
+    selfplay    người chơi đầu tiên tự đánh với mình --games ván
+
+Mỗi ván mở đầu bằng --opening nước ngẫu nhiên gần tâm để các ván không giống
+hệt nhau. Ván xong được ghi ngay vào nhật ký (journal.py, 12 byte mỗi nước)
+trong --out; mã ván là (số của lần chạy << 32) | số thứ tự ván, kiểm tra lại
+bằng `python journal.py replay DIR`.
+
+--seed N: chạy lặp lại được. Nước khai cuộc lấy từ random.Random theo
+(seed, số ván), máy tìm theo độ sâu không giới hạn thời gian, bảng chuyển vị
+được xóa đầu mỗi ván, và kết quả được ghi theo thứ tự lịch đấu: cùng seed,
+cùng người chơi thì nhật ký giống nhau từng byte, bất kể số tiến trình.
+
+Cuối cùng in bảng xếp hạng và số ván/giây trên mỗi lõi (--json ghi thêm một
+dòng kết quả):
+
+    python tournament.py easy normal random --games 4
+    python tournament.py easy d3w8 normal d2w4 random --format swiss --rounds 4
+    python tournament.py normal --format selfplay --games 1000 --out selfplay/ --seed 7
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ai import LEVELS, Engine
+from game_logic import DEFAULT_SIZE, EMPTY, WIN_LENGTH, Board, apply_move, check_win, is_full, valid_settings
+from journal import ABANDONED, DRAW, O_WIN, X_WIN, Journal
+
+FORMATS = ("roundrobin", "swiss", "selfplay")
+RANDOM = "random"
+OPENING_PLIES = 2
+OPENING_RADIUS = 2  # nước khai cuộc ngẫu nhiên cách tâm tối đa chừng này ô
+CHUNK = 4           # số ván gửi sang tiến trình con mỗi lần
+SCORES = {X_WIN: "1-0", O_WIN: "0-1", DRAW: "1/2"}
+
+_SPEC = re.compile(r"d(\d+)w(\d+)$")
+
+
+def level_of(spec):
+    """Level của một người chơi (None với random); ValueError nếu tên lạ."""
+    if spec == RANDOM:
+        return None
+    if spec in LEVELS:
+        return LEVELS[spec]
+    m = _SPEC.match(spec)
+    if m is None or int(m.group(1)) < 1 or int(m.group(2)) < 1:
+        raise ValueError(f"unknown player {spec!r}")
+    return LEVELS["normal"]._replace(depth=int(m.group(1)), width=int(m.group(2)))
+
+
+def player_names(specs):
+    """Tên hiển thị; người chơi trùng tên được đánh số (normal, normal#2)."""
+    names, seen = [], {}
+    for spec in specs:
+        seen[spec] = seen.get(spec, 0) + 1
+        names.append(spec if seen[spec] == 1 else f"{spec}#{seen[spec]}")
+    return names
+
+
+# --- Phía tiến trình con ---
+
+_ENGINES = {}  # mỗi tiến trình con giữ một Engine cho mỗi (luật, bên)
+
+def engine_for(size, win_length, sym):
+    engine = _ENGINES.get((size, win_length, sym))
+    if engine is None:
+        engine = _ENGINES[size, win_length, sym] = Engine(size, win_length)
+    return engine
+
+
+def random_move(board, rng, radius):
+    """Một ô trống ngẫu nhiên trong bán kính `radius` quanh quân đã đánh (bàn trống: quanh tâm)."""
+    size, cells = board.size, board.cells
+    stones = [c for c, v in enumerate(cells) if v != EMPTY]
+    centers = stones or [(size // 2) * size + size // 2]
+    options = set()
+    for c in centers:
+        cx, cy = divmod(c, size)
+        for x in range(max(0, cx - radius), min(size, cx + radius + 1)):
+            for y in range(max(0, cy - radius), min(size, cy + radius + 1)):
+                if cells[x * size + y] == EMPTY:
+                    options.add(x * size + y)
+    return divmod(rng.choice(sorted(options)), size)
+
+
+def play_game(job):
+    """
+    Chạy trong tiến trình con: job = (số ván, spec X, spec O, n, k, số nước
+    khai cuộc, số nước tối đa, seed hoặc None). Trả về (số ván, kết quả,
+    các ô đã đánh theo thứ tự (x * n + y), thời gian CPU).
+    """
+    number, x_spec, o_spec, size, win_length, opening, max_moves, seed = job
+    cpu0 = time.process_time()
+    rng = random.Random(f"{seed}:{number}") if seed is not None else random.Random()
+    deterministic = seed is not None
+
+    players = {}
+    for sym, spec in (('X', x_spec), ('O', o_spec)):
+        level = level_of(spec)
+        engine = None
+        if level is not None:
+            engine = engine_for(size, win_length, sym)
+            engine.reset()
+            if deterministic:
+                engine.tt.clear()
+                level = level._replace(time_limit=float("inf"))
+        players[sym] = (engine, level)
+
+    board = Board(size)
+    moves = []
+    result = DRAW
+    sym = 'X'
+    while len(moves) < max_moves:
+        engine, level = players[sym]
+        if engine is None or len(moves) < opening:
+            x, y = random_move(board, rng, OPENING_RADIUS if len(moves) < opening else 1)
+        else:
+            x, y = engine.best_move(sym, level)
+        ok, reason = apply_move(board, x, y, sym)
+        if not ok:
+            raise RuntimeError(f"game {number}: {sym} played ({x}, {y}): {reason}")
+        for e, _ in players.values():
+            if e is not None:
+                e.place(x, y, sym)
+        moves.append(x * size + y)
+        if check_win(board, x, y, win_length):
+            result = X_WIN if sym == 'X' else O_WIN
+            break
+        if is_full(board):
+            break
+        sym = 'O' if sym == 'X' else 'X'
+    return number, result, moves, time.process_time() - cpu0
+
+
+# --- Lịch đấu ---
+
+def round_robin(players, games):
+    """Mọi cặp (i, j), mỗi cặp `games` ván, đổi màu xen kẽ: [(X, O), ...]."""
+    pairs = []
+    for i in range(len(players)):
+        for j in range(i + 1, len(players)):
+            for g in range(games):
+                pairs.append((i, j) if g % 2 == 0 else (j, i))
+    return pairs
+
+
+class Standings:
+    """Điểm (thắng 1, hòa 0.5), các đối thủ đã gặp và số ván cầm X của mỗi người."""
+
+    def __init__(self, names):
+        self.names = names
+        self.score = [0.0] * len(names)
+        self.wins = [0] * len(names)
+        self.draws = [0] * len(names)
+        self.losses = [0] * len(names)
+        self.as_x = [0] * len(names)
+        self.met = [set() for _ in names]
+        self.byes = set()
+
+    def record(self, x, o, result):
+        self.met[x].add(o)
+        self.met[o].add(x)
+        self.as_x[x] += 1
+        if result == DRAW:
+            for p in (x, o):
+                self.score[p] += 0.5
+                self.draws[p] += 1
+        else:
+            winner, loser = (x, o) if result == X_WIN else (o, x)
+            self.score[winner] += 1
+            self.wins[winner] += 1
+            self.losses[loser] += 1
+
+    def bye(self, p, points):
+        self.byes.add(p)
+        self.score[p] += points
+
+    def ranking(self):
+        return sorted(range(len(self.names)), key=lambda p: (-self.score[p], -self.wins[p], p))
+
+    def swiss_round(self, games):
+        """Cặp đấu của vòng tiếp theo: ghép từ trên xuống, tránh gặp lại; trả về (cặp, người miễn đấu)."""
+        order = self.ranking()
+        bye = None
+        if len(order) % 2:
+            bye = next((p for p in reversed(order) if p not in self.byes), order[-1])
+            order.remove(bye)
+        pairs = []
+        while order:
+            a = order.pop(0)
+            i = next((i for i, b in enumerate(order) if b not in self.met[a]), 0)
+            b = order.pop(i)
+            # Người cầm X ít hơn được cầm X ván đầu
+            if self.as_x[b] < self.as_x[a]:
+                a, b = b, a
+            for g in range(games):
+                pairs.append((a, b) if g % 2 == 0 else (b, a))
+        return pairs, bye
+
+    def table(self):
+        lines = [f"{'#':>3} {'player':<12} {'score':>6} {'W':>5} {'D':>5} {'L':>5}"]
+        for rank, p in enumerate(self.ranking(), 1):
+            lines.append(f"{rank:>3} {self.names[p]:<12} {self.score[p]:>6g} "
+                         f"{self.wins[p]:>5} {self.draws[p]:>5} {self.losses[p]:>5}")
+        return "\n".join(lines)
+
+
+# --- Chạy ---
+
+class Runner:
+    """Gửi từng lô ván sang process pool; ghi kết quả theo thứ tự lịch đấu khi ván xong."""
+
+    def __init__(self, args, specs, standings):
+        self.args = args
+        self.specs = specs
+        self.standings = standings
+        self.journal = Journal(args.out) if args.out else None
+        run = args.seed if args.seed is not None else random.getrandbits(31)
+        self.base = (run & 0xFFFFFFFF) << 32
+        self.number = 0
+        self.games = self.moves = self.cpu = 0
+        self.results = {X_WIN: 0, O_WIN: 0, DRAW: 0}
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+        self.pool = ProcessPoolExecutor(args.workers, mp_context=context)
+
+    def play(self, pairs):
+        """Đánh một loạt ván [(X, O), ...]; trả về sau khi mọi ván đã xong và được ghi."""
+        a = self.args
+        max_moves = a.max_moves or a.size * a.size
+        jobs = []
+        for x, o in pairs:
+            jobs.append((self.number, self.specs[x], self.specs[o], a.size, a.win,
+                         a.opening, max_moves, a.seed))
+            self.number += 1
+        # map() trả kết quả theo thứ tự job, nên ghi theo thứ tự lịch đấu dù ván xong lệch nhau
+        for (x, o), (number, result, moves, cpu) in zip(pairs, self.pool.map(play_game, jobs, chunksize=a.chunk)):
+            self.record(number, x, o, result, moves, cpu)
+
+    def record(self, number, x, o, result, moves, cpu):
+        self.standings.record(x, o, result)
+        self.games += 1
+        self.moves += len(moves)
+        self.cpu += cpu
+        self.results[result] += 1
+        if self.journal is not None:
+            game_id, size = self.base | number, self.args.size
+            self.journal.start_game(game_id, size, self.args.win)
+            sym = 'X'
+            for c in moves:
+                self.journal.move(game_id, c // size, c % size, sym)
+                sym = 'O' if sym == 'X' else 'X'
+            # Ván dừng ở --max-moves tính hòa nhưng ghi là bỏ dở: bàn chưa kín nên replay không ra hòa
+            cut = result == DRAW and len(moves) < size * size
+            self.journal.end_game(game_id, ABANDONED if cut else result)
+        if self.args.verbose:
+            names = self.standings.names
+            print(f"game {number}: {names[x]} (X) vs {names[o]} (O): {SCORES[result]} in {len(moves)} moves")
+
+    def close(self):
+        self.pool.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine tournaments and self-play batches")
+    parser.add_argument("players", nargs="+", help="easy|normal|hard|random|d<depth>w<width>")
+    parser.add_argument("--format", choices=FORMATS, default="roundrobin")
+    parser.add_argument("--games", type=int, default=2, help="ván mỗi cặp (selfplay: tổng số ván)")
+    parser.add_argument("--rounds", type=int, default=5, help="số vòng của swiss")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--win", type=int, default=WIN_LENGTH)
+    parser.add_argument("--opening", type=int, default=OPENING_PLIES, help="số nước khai cuộc ngẫu nhiên")
+    parser.add_argument("--max-moves", type=int, default=0, help="ván dài hơn tính hòa, nhật ký ghi là bỏ dở (0 = tới khi kín bàn)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="số ván mỗi lần gửi sang tiến trình con")
+    parser.add_argument("--seed", type=int, default=None, help="chạy lặp lại được (tìm theo độ sâu, không giới hạn thời gian)")
+    parser.add_argument("--out", metavar="DIR", default=None, help="ghi các ván vào nhật ký (journal.py)")
+    parser.add_argument("--json", metavar="FILE", default=None, help="ghi thêm một dòng JSON kết quả")
+    parser.add_argument("-v", "--verbose", action="store_true", help="in từng ván")
+    args = parser.parse_args(argv)
+
+    if not valid_settings(args.size, args.win):
+        parser.error(f"invalid board settings {args.size}x{args.size}, {args.win} in a row")
+    try:
+        for spec in args.players:
+            level_of(spec)
+    except ValueError as e:
+        parser.error(str(e))
+    specs = args.players[:1] * 2 if args.format == "selfplay" else args.players
+    if len(specs) < 2:
+        parser.error(f"{args.format} needs at least two players")
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    standings = Standings(player_names(specs))
+    runner = Runner(args, specs, standings)
+    t0 = time.perf_counter()
+    try:
+        if args.format == "selfplay":
+            runner.play([(0, 1)] * args.games)
+        elif args.format == "roundrobin":
+            runner.play(round_robin(specs, args.games))
+        else:
+            for r in range(1, args.rounds + 1):
+                pairs, bye = standings.swiss_round(args.games)
+                if bye is not None:
+                    standings.bye(bye, args.games)
+                runner.play(pairs)
+                print(f"round {r}: {len(pairs)} games"
+                      + (f", bye {standings.names[bye]}" if bye is not None else ""))
+    finally:
+        runner.close()
+    dt = time.perf_counter() - t0
+
+    if args.format != "selfplay":
+        print(standings.table())
+    games = runner.games
+    rate = games / dt if dt else 0.0
+    print(f"{games} games, {runner.moves} moves in {dt:.2f}s: X {runner.results[X_WIN]}, "
+          f"O {runner.results[O_WIN]}, draw {runner.results[DRAW]}")
+    print(f"{rate:.2f} games/s, {rate / args.workers:.2f} games/s per core ({args.workers} workers), "
+          f"CPU use {runner.cpu / (dt * args.workers) if dt else 0:.0%}")
+    if args.json:
+        result = {"format": args.format, "players": specs, "games": games, "moves": runner.moves,
+                  "seconds": round(dt, 3), "games_per_s": round(rate, 3),
+                  "games_per_s_per_core": round(rate / args.workers, 3), "workers": args.workers,
+                  "seed": args.seed, "x_wins": runner.results[X_WIN], "o_wins": runner.results[O_WIN],
+                  "draws": runner.results[DRAW], "standings": dict(zip(standings.names, standings.score))}
+        with open(args.json, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
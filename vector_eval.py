@@ -0,0 +1,174 @@
+# vector_eval.py
+"""
+Tìm mọi đường thắng trên cả bàn cờ trong một lượt tính toán theo lô (NumPy).
+
+check_win chỉ xét các đường đi qua một ô, phù hợp khi kiểm tra từng nước đi.
+Khi cần kiểm tra cả một thế cờ (khôi phục trận, phát lại ván đã ghi) thì quét
+từng ô rất chậm; ở đây mỗi hướng chỉ là vài phép cộng/AND trên cả mảng:
+
+- tích chập cửa sổ win_length ô theo hướng đó để tìm các đoạn đủ quân,
+- lần theo các đoạn đó tới hết chuỗi để biết hai đầu có bị đối thủ chặn không
+  (ô ngoài bàn không tính là chặn, giống check_win).
+
+NumPy là phụ thuộc tùy chọn: không có NumPy thì dùng bản quét thuần Python
+cho cùng kết quả.
+
+    python vector_eval.py --positions 2000 --size 19
+"""
+import argparse
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy là tùy chọn
+    np = None
+
+from game_logic import WIN_LENGTH, Board, apply_move, check_win
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def winning_lines(board, win_length=WIN_LENGTH):
+    """
+    Danh sách các chuỗi thắng (symbol, x, y, dx, dy, length): chuỗi bắt đầu ở
+    (x, y), đi theo hướng (dx, dy), dài `length` >= win_length và không bị
+    chặn cả 2 đầu. Sắp xếp theo (symbol, x, y, dx, dy).
+    """
+    if np is None:
+        return _winning_lines_py(board, win_length)
+    return _winning_lines_np(board, win_length)
+
+
+def winners(board, win_length=WIN_LENGTH):
+    """Tập các ký hiệu ('X', 'O') đang có ít nhất một chuỗi thắng."""
+    return {line[0] for line in winning_lines(board, win_length)}
+
+
+def _winning_lines_np(board, win_length):
+    size = board.size
+    cells = np.frombuffer(board.cells, dtype=np.uint8).reshape(size, size)
+    pad = size  # đủ rộng để dịch mảng tới hết một đường mà không tràn
+    found = []
+
+    for sym, opp in (('X', 'O'), ('O', 'X')):
+        own = np.pad(cells == ord(sym), pad)
+        theirs = np.pad(cells == ord(opp), pad)
+
+        def shifted(a, k, dx, dy):
+            """Giá trị của a tại ô (x + k*dx, y + k*dy) cho mọi ô (x, y) trên bàn."""
+            x0, y0 = pad + k * dx, pad + k * dy
+            return a[x0:x0 + size, y0:y0 + size]
+
+        for dx, dy in DIRECTIONS:
+            # Tích chập: số quân trong cửa sổ win_length ô bắt đầu tại mỗi ô
+            window = np.zeros((size, size), dtype=np.int16)
+            for k in range(win_length):
+                window += shifted(own, k, dx, dy)
+            # Chỉ giữ các cửa sổ nằm ở đầu chuỗi để mỗi chuỗi được tính một lần
+            starts = (window == win_length) & ~shifted(own, -1, dx, dy)
+            if not starts.any():
+                continue
+
+            blocked_before = shifted(theirs, -1, dx, dy) & starts
+            length = np.full((size, size), win_length, dtype=np.int16)
+            alive = starts.copy()
+            blocked_after = np.zeros((size, size), dtype=bool)
+            k = win_length
+            # Lần theo các chuỗi cùng lúc cho tới khi chuỗi nào cũng đã hết
+            while alive.any():
+                cont = alive & shifted(own, k, dx, dy)
+                ended = alive & ~cont
+                blocked_after |= ended & shifted(theirs, k, dx, dy)
+                length += cont
+                alive = cont
+                k += 1
+
+            ok = starts & ~(blocked_before & blocked_after)
+            for x, y in zip(*np.nonzero(ok)):
+                found.append((sym, int(x), int(y), dx, dy, int(length[x, y])))
+
+    found.sort()
+    return found
+
+
+def _winning_lines_py(board, win_length):
+    size = board.size
+    cells = board.cells
+    found = []
+
+    def at(x, y):
+        if 0 <= x < size and 0 <= y < size:
+            return cells[x * size + y]
+        return None
+
+    for x in range(size):
+        for y in range(size):
+            sym = cells[x * size + y]
+            if sym == ord('.'):
+                continue
+            for dx, dy in DIRECTIONS:
+                if at(x - dx, y - dy) == sym:
+                    continue  # không phải đầu chuỗi
+                length = 1
+                while at(x + length * dx, y + length * dy) == sym:
+                    length += 1
+                if length < win_length:
+                    continue
+                before = at(x - dx, y - dy)
+                after = at(x + length * dx, y + length * dy)
+                blocked = (before not in (None, ord('.'), sym) and
+                           after not in (None, ord('.'), sym))
+                if not blocked:
+                    found.append((chr(sym), x, y, dx, dy, length))
+
+    found.sort()
+    return found
+
+
+# --- Kiểm chứng và đo tốc độ ---
+
+def random_position(rng, size, stones):
+    board = Board(size)
+    cells = rng.sample(range(size * size), stones)
+    for i, c in enumerate(cells):
+        apply_move(board, c // size, c % size, 'XO'[i % 2])
+    return board
+
+
+def scan_winners(board, win_length):
+    """Cách cũ: gọi check_win trên từng ô."""
+    size = board.size
+    return {board.get(x, y) for x in range(size) for y in range(size)
+            if check_win(board, x, y, win_length)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=19)
+    parser.add_argument("--win", type=int, default=WIN_LENGTH)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    size = args.size
+    boards = [random_position(rng, size, rng.randint(size, size * size * 2 // 3))
+              for _ in range(args.positions)]
+
+    t0 = time.perf_counter()
+    expected = [scan_winners(b, args.win) for b in boards]
+    scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    got = [winners(b, args.win) for b in boards]
+    batched = time.perf_counter() - t0
+
+    assert got == expected, "winning_lines disagrees with check_win"
+    backend = "numpy" if np is not None else "pure python (numpy not installed)"
+    print(f"{args.positions} positions {size}x{size}, {args.win} in a row: results match")
+    print(f"check_win on every cell: {args.positions / scan:10.0f} positions/s")
+    print(f"winning_lines [{backend}]: {args.positions / batched:10.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# wire.py
+"""
+Giao thức nhị phân gọn (tùy chọn), thương lượng bằng HELLO lúc bắt tay.
+
+Client muốn dùng thì gửi `HELLO BIN1` cùng các lệnh bắt tay, trước PLAY hoặc
+RESUME. Bắt tay xong, server trả lời một dòng chữ:
+
+    HELLO BIN1    đồng ý: sau dòng này server chỉ gửi khung nhị phân
+    HELLO TEXT    không đồng ý (khán giả WATCH luôn nhận dạng chữ)
+
+Client chỉ gửi khung nhị phân sau khi đã nhận HELLO BIN1; server đọc khung
+nhị phân ngay sau dòng PLAY/RESUME. Client không gửi HELLO (client.py, client
+cũ) thì mọi thứ vẫn là dòng chữ như trước.
+
+Mỗi khung là 1 byte mã lệnh, theo sau là phần dữ liệu có dạng cố định theo mã:
+
+    (không có)          RESET, YOUR TURN, WIN, LOSE, DRAW, OPPONENT_LEFT, REMATCH, EXIT, HINT (xin gợi ý)
+    hàng, cột           MOVE, OPPONENT, HINT (gợi ý của server): mỗi số 1 byte
+    ký hiệu, n, k       START: mỗi trường 1 byte
+    ký hiệu, n, k, bàn  SYNC: như START, rồi Board.pack() nguyên dạng (không base64)
+    độ dài, UTF-8       CHAT, INVALID, SESSION, MATCH: độ dài 2 byte (big-endian)
+
+Dòng nào chưa có mã riêng được gửi nguyên văn trong khung LINE (độ dài + UTF-8).
+
+Phía nhận, FrameReader đưa ra mỗi lệnh dưới dạng tuple giống kết quả
+line.split() của dòng chữ tương ứng, nhưng số đã là int và phần chữ của
+CHAT/INVALID giữ nguyên một chuỗi: ("OPPONENT", 7, 8), ("CHAT", "hi there").
+Code dùng chung cho cả hai dạng gọi split(line).
+
+Đo số byte và chi phí mã hóa/giải mã so với dạng chữ:
+
+    python bench_wire.py
+"""
+import base64
+import struct
+
+from framing import MAX_LINE, LineReader
+
+VERSION = "BIN1"
+HELLO = "HELLO " + VERSION
+HELLO_TEXT = "HELLO TEXT"
+
+# Trạng thái của FrameReader
+WAITING, TEXT, BINARY = range(3)
+
+# Dạng phần dữ liệu theo sau mã lệnh
+NONE, XY, START, SYNC, STRING = range(5)
+
+_STRING = struct.Struct(">BH")  # mã lệnh, độ dài phần chữ
+
+# mã lệnh -> (lệnh, dạng dữ liệu)
+OPCODES = {
+    0x01: ("MOVE", XY),
+    0x02: ("CHAT", STRING),
+    0x03: ("REMATCH", NONE),
+    0x04: ("HINT", NONE),        # client xin gợi ý
+    0x05: ("EXIT", NONE),
+    0x10: ("START", START),
+    0x11: ("RESET", NONE),
+    0x12: ("YOUR TURN", NONE),
+    0x13: ("OPPONENT", XY),
+    0x14: ("HINT", XY),          # server trả gợi ý
+    0x15: ("INVALID", STRING),
+    0x16: ("WIN", NONE),
+    0x17: ("LOSE", NONE),
+    0x18: ("DRAW", NONE),
+    0x19: ("OPPONENT_LEFT", NONE),
+    0x1A: ("SESSION", STRING),
+    0x1B: ("MATCH", STRING),
+    0x1C: ("SYNC", SYNC),
+}
+LINE = 0x7F  # một dòng chữ bất kỳ chưa có mã riêng
+
+MAX_CACHED = 1 << 14  # số khung của lệnh tọa độ/START được nhớ sẵn (theo dòng chữ)
+
+_FIXED = {}     # dòng -> khung: lệnh không có tham số, và các lệnh tọa độ/START đã gặp
+_WITH_ARGS = {}  # lệnh có tham số -> (mã lệnh, dạng dữ liệu)
+_DECODE = [None] * 256  # mã lệnh -> (dạng dữ liệu, phần đầu của tuple kết quả)
+for _op, (_name, _kind) in OPCODES.items():
+    if _kind == NONE:
+        _FIXED[_name] = bytes((_op,))
+    else:
+        _WITH_ARGS[_name] = (_op, _kind)
+    _DECODE[_op] = (_kind, tuple(_name.split()))
+_DECODE[LINE] = (STRING, None)
+
+
+# --- Mã hóa ---
+
+def encode_line(msg):
+    """Dạng chữ: một dòng kết thúc bằng '\\n'."""
+    return (msg + "\n").encode()
+
+
+def _string(op, text):
+    data = text.encode()[:MAX_LINE]
+    return _STRING.pack(op, len(data)) + data
+
+
+def encode(msg):
+    """Một dòng lệnh dạng chữ (không có '\\n') -> một khung nhị phân."""
+    frame = _FIXED.get(msg)
+    if frame is not None:
+        return frame
+    cmd, _, rest = msg.partition(" ")
+    op, kind = _WITH_ARGS.get(cmd, (LINE, None))
+    try:
+        if kind == STRING:
+            return _string(op, rest)
+        if kind == SYNC:
+            sym, size, win_length, packed = rest.split()
+            return bytes((op, ord(sym), int(size), int(win_length))) + base64.b64decode(packed)
+        if kind == XY:
+            x, y = rest.split()
+            frame = bytes((op, int(x), int(y)))
+        elif kind == START:
+            sym, size, win_length = rest.split()
+            frame = bytes((op, ord(sym), int(size), int(win_length)))
+    except (ValueError, TypeError):
+        pass  # tham số không vừa khung: gửi nguyên dòng
+    if frame is None:
+        return _string(LINE, msg)
+    # Tọa độ chỉ có n*n giá trị: lần sau cùng dòng này chỉ còn một lần tra dict
+    if len(_FIXED) < MAX_CACHED:
+        _FIXED[msg] = frame
+    return frame
+
+
+def is_binary(reader):
+    return isinstance(reader, FrameReader) and reader.mode == BINARY
+
+
+def encoder(reader):
+    """Hàm mã hóa các dòng gửi đi trên kết nối có bộ đọc `reader`."""
+    return encode if is_binary(reader) else encode_line
+
+
+def reader(binary):
+    """Bộ đọc cho một kết nối đã thương lượng xong (cluster chuyển fd giữa các tiến trình)."""
+    return FrameReader() if binary else LineReader()
+
+
+def split(line):
+    """Các phần của một lệnh: dòng chữ thì tách theo khoảng trắng, khung nhị phân đã tách sẵn."""
+    return line.split() if isinstance(line, str) else line
+
+
+def text(line):
+    """Dạng chữ của một lệnh (để so sánh, ghi log)."""
+    return line if isinstance(line, str) else " ".join(map(str, line))
+
+
+# --- Giải mã ---
+
+class FrameReader(LineReader):
+    """
+    Như LineReader nhưng đọc khung nhị phân; `lines` chứa các tuple lệnh.
+
+    mode WAITING (client vừa gửi HELLO): đọc từng dòng chữ tới dòng HELLO của
+    server (dòng này cũng được trả ra), phần còn lại đọc theo câu trả lời.
+    Server không hiểu HELLO (gửi thẳng dòng của trận) thì kết nối ở lại dạng
+    chữ (TEXT).
+    """
+    __slots__ = ("mode",)
+
+    def __init__(self, max_line=MAX_LINE, mode=BINARY):
+        LineReader.__init__(self, max_line)
+        self.mode = mode
+
+    @classmethod
+    def after(cls, reader):
+        """Chuyển sang khung nhị phân sau khi bắt tay bằng `reader` (LineReader) đã xong."""
+        new = cls(reader.max_line)
+        # Client đúng luật không gửi gì trước khi nhận HELLO: thường không còn gì
+        leftover = b"".join(line.encode() + b"\n" for line in reader.lines) + bytes(reader.buf)
+        if leftover:
+            new.feed(leftover)
+        return new
+
+    def feed(self, data):
+        if self.mode == BINARY:
+            return self._frames(data)
+        if self.mode == TEXT:
+            return LineReader.feed(self, data)
+        buf = self.buf
+        buf += data
+        while self.mode == WAITING:
+            end = buf.find(b"\n")
+            if end < 0:
+                if len(buf) > self.max_line:
+                    del buf[:]
+                    raise ValueError("line too long")
+                return len(self.lines)
+            line = buf[:end].decode(errors="replace").rstrip("\r")
+            del buf[:end + 1]
+            self.lines.append(line)  # kể cả dòng HELLO: client biết lúc đã thương lượng xong
+            if line == HELLO:
+                self.mode = BINARY
+            elif not line.startswith("INVALID"):
+                self.mode = TEXT  # HELLO TEXT, hoặc server không thương lượng (gửi thẳng dòng của trận)
+        rest = bytes(buf)
+        del buf[:]
+        return self.feed(rest) if rest else len(self.lines)
+
+    def _frames(self, data):
+        buf = self.buf
+        buf += data
+        lines = self.lines
+        append = lines.append
+        decode = _DECODE
+        end = len(buf)
+        pos = 0
+        while pos < end:
+            op = buf[pos]
+            spec = decode[op]
+            if spec is None:
+                del buf[:]
+                raise ValueError("bad opcode %d" % op)
+            kind, head = spec
+            if kind == NONE:
+                append(head)
+                pos += 1
+            elif kind == XY:
+                if pos + 3 > end:
+                    break
+                append(head + (buf[pos + 1], buf[pos + 2]))
+                pos += 3
+            elif kind == STRING:
+                if pos + 3 > end:
+                    break
+                size = (buf[pos + 1] << 8) | buf[pos + 2]
+                if size > self.max_line:
+                    del buf[:]
+                    raise ValueError("line too long")
+                stop = pos + 3 + size
+                if stop > end:
+                    break
+                text = buf[pos + 3:stop].decode(errors="replace")
+                append(head + (text,) if head is not None else tuple(text.split()))
+                pos = stop
+            else:
+                if pos + 4 > end:
+                    break
+                sym, size, win_length = chr(buf[pos + 1]), buf[pos + 2], buf[pos + 3]
+                if kind == START:
+                    append(head + (sym, size, win_length))
+                    pos += 4
+                    continue
+                stop = pos + 4 + (size * size + 3) // 4
+                if stop > end:
+                    break
+                append(head + (sym, size, win_length, bytes(buf[pos + 4:stop])))
+                pos = stop
+        del buf[:pos]
+        return len(lines)